@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Measure memory taken by idle device handles: instances that were created but never connected, as in registry of
+known devices.
+
+    PYTHONPATH=. python benchmarks/idle_memory.py --devices 10000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+
+from tion_btle.lite import TionLite
+from tion_btle.s3 import TionS3
+from tion_btle.s4 import TionS4
+
+
+def measure(model: type, count: int) -> float:
+    macs = [f"AA:BB:{i >> 16 & 0xFF:02X}:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}:00" for i in range(count)]
+    model(macs[0])
+    gc.collect()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    devices = [model(mac) for mac in macs]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(devices) == count
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=5000)
+    args = parser.parse_args()
+
+    for model in (TionS3, TionLite, TionS4):
+        print(f"{model.__name__:10s} {measure(model, args.devices):8.0f} bytes per idle device")
+
+
+if __name__ == "__main__":
+    main()
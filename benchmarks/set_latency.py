@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compare number of writes and set() latency for Lite family breezers with default 20-byte packets, with packets
+that fit into negotiated MTU and with sequential or pipelined writes of multi-packet requests.
+
+Breezer is emulated, so results show protocol overhead only:
+    PYTHONPATH=. python benchmarks/set_latency.py --write-latency 0.0075 --mtu 247 --runs 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Callable, Type
+
+from tion_btle.light_family import TionLiteFamily
+from tion_btle.lite import TionLite
+from tion_btle.s4 import TionS4
+
+
+class FakeClient:
+    """Emulates BleakClient connected to Lite family breezer"""
+    def __init__(self, tion: TionLiteFamily, write_latency: float, mtu_size: int):
+        self._tion = tion
+        self._write_latency = write_latency
+        self._callback: Callable | None = None
+        self._request = bytearray()
+        self.mtu_size = mtu_size
+        self.is_connected = False
+        self.writes = 0
+
+    async def connect(self):
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        self.is_connected = False
+        return True
+
+    async def subscribe(self, uuid: str, callback: Callable):
+        self._callback = callback
+
+    async def write(self, uuid: str, data: bytearray, response: bool = False):
+        # packet goes to the radio queue right away, caller waits for write confirmation
+        self.writes += 1
+        packet_id = data[0]
+        if packet_id in (TionLiteFamily.SINGLE_PACKET_ID, TionLiteFamily.FIRST_PACKET_ID):
+            self._request = bytearray(data)
+        else:
+            self._request += data[1:]
+
+        await asyncio.sleep(self._write_latency)
+
+        if packet_id in (TionLiteFamily.SINGLE_PACKET_ID, TionLiteFamily.END_PACKET_ID):
+            self._respond()
+
+    def _respond(self):
+        packages = [bytearray(p) for p in self._tion._packages]
+        # breezer echoes request id of the request in the response header
+        packages[0][7:11] = self._request[7:11]
+        for p in packages:
+            self._callback(0, p)
+
+
+async def measure(model: Type[TionLiteFamily], max_packet_size: int, pipelined: bool, args) -> tuple[int, list[float]]:
+    tion = model(mac="bench")
+    tion.max_packet_size = max_packet_size
+    tion.pipelined_writes = pipelined
+    client = FakeClient(tion, args.write_latency, args.mtu)
+    tion._btle = client
+
+    latencies = []
+    for i in range(args.runs):
+        start = time.perf_counter()
+        await tion.set({"fan_speed": 1 + i % 6, "heater_temp": 20, "heater": "on"})
+        latencies.append(time.perf_counter() - start)
+
+    return client.writes // args.runs, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--write-latency", type=float, default=0.0075, help="seconds per single write")
+    parser.add_argument("--mtu", type=int, default=247, help="negotiated MTU")
+    parser.add_argument("--runs", type=int, default=20, help="number of set() calls for each path")
+    args = parser.parse_args()
+
+    paths = (
+        ("20-byte", TionLiteFamily.DEFAULT_PACKET_SIZE, False),
+        ("20-byte/pipe", TionLiteFamily.DEFAULT_PACKET_SIZE, True),
+        ("mtu", args.mtu - 3, False),
+    )
+
+    print(f"{'model':<10}{'path':<14}{'writes/set':>12}{'mean, ms':>12}{'p95, ms':>12}")
+    for model in (TionLite, TionS4):
+        for path, max_packet_size, pipelined in paths:
+            writes, latencies = await measure(model, max_packet_size, pipelined, args)
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{model.__name__:<10}{path:<14}{writes:>12}{statistics.mean(latencies) * 1000:>12.1f}"
+                  f"{p95 * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main())
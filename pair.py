@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import sys
-from tion_btle.s3 import S3 as s3device
+from tion_btle.s3 import TionS3
+from tion_btle.sync import SyncTion
 
-s3 = s3device(sys.argv[1])
+s3 = SyncTion(TionS3, sys.argv[1])
 s3.pair()
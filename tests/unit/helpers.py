@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from bleak.backends.scanner import AdvertisementData
+
+from tion_btle.tion import TionException
+
+
+def advertisement(rssi: int = -60, name: str | None = None, uuids: list | None = None) -> AdvertisementData:
+    return AdvertisementData(
+        local_name=name, manufacturer_data={}, service_data={}, service_uuids=uuids or [], tx_power=None, rssi=rssi,
+        platform_data=()
+    )
+
+
+class FakeTion:
+    mac = "AA:BB:CC:DD:EE:FF"
+
+    def __init__(self, state: dict, fail_writes: int = 0):
+        self.state = state
+        self.fail_writes = fail_writes
+        self.writes = []
+
+    async def get(self, priority=None, timeout=None) -> dict:
+        return dict(self.state)
+
+    async def set(self, settings: dict, priority=None, timeout=None):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise TionException("set", "Could not write")
+        self.writes.append(settings)
+        self.state.update(settings)
+
+
+STATE = {"state": "on", "fan_speed": 2, "heater": "on", "heater_temp": 20, "mode": "outside"}
@@ -0,0 +1,93 @@
+import unittest.mock as mock
+
+import pytest
+from bleak.backends.device import BLEDevice
+
+from tion_btle.adapters import AdapterPool
+from tion_btle.lite import TionLite
+from tion_btle.registry import DeviceRegistry
+from tion_btle.tion import TionException
+from tests.unit.helpers import advertisement
+
+
+def _tion(i: int) -> TionLite:
+    return TionLite(f"AA:BB:CC:DD:EE:{i:02X}")
+
+
+def test_assign_by_rssi():
+    pool = AdapterPool(["hci0", "hci1"])
+    tion = _tion(1)
+    pool.report_rssi("hci0", tion.mac, -90)
+    pool.report_rssi("hci1", tion.mac, -60)
+
+    assert pool.assign(tion) == "hci1"
+    assert tion.adapter == "hci1"
+
+
+def test_assign_by_load():
+    pool = AdapterPool(["hci0", "hci1"], capacity=2, rssi_margin=10)
+    tions = [_tion(i) for i in range(4)]
+    for tion in tions:
+        pool.report_rssi("hci0", tion.mac, -60)
+        pool.report_rssi("hci1", tion.mac, -65)
+
+    assert [pool.assign(t) for t in tions] == ["hci0", "hci1", "hci0", "hci1"]
+    # both adapters are full: still placed
+    assert pool.assign(_tion(5)) in ("hci0", "hci1")
+    assert pool.utilization()["hci0"]["utilization"] >= 1.0
+
+
+def test_rssi_from_registries():
+    registries = {"hci0": DeviceRegistry(), "hci1": DeviceRegistry()}
+    pool = AdapterPool(["hci0", "hci1"], registries=registries)
+    tion = _tion(1)
+    device = BLEDevice(tion.mac, "Breezer", {"path": "/org/bluez/hci1/dev_AA"})
+    registries["hci0"].update(device, advertisement(-95))
+    registries["hci1"].update(device, advertisement(-50))
+
+    assert pool.assign(tion) == "hci1"
+    assert pool.utilization()["hci1"]["mean_rssi"] == -50
+
+
+@pytest.mark.asyncio
+async def test_move_after_failures():
+    pool = AdapterPool(["hci0", "hci1"], max_failures=2)
+    tion = _tion(1)
+    pool.report_rssi("hci0", tion.mac, -50)
+    pool.report_rssi("hci1", tion.mac, -80)
+
+    async def fail():
+        raise TionException("get", "Could not get breezer state")
+
+    async def ok():
+        return 1
+
+    for _ in range(2):
+        with pytest.raises(TionException):
+            await pool.run(tion, fail())
+    assert tion.adapter == "hci1"
+    assert pool.moves == 1
+    assert await pool.run(tion, ok()) == 1
+
+    report = pool.utilization()
+    assert report["hci0"]["failures"] == 2
+    assert report["hci1"]["devices"] == 1
+
+    # rebalance keeps device away from the adapter where it failed
+    assert pool.rebalance() == 0
+
+
+def test_client_uses_adapter():
+    with mock.patch("tion_btle.transport.BleakClient") as client:
+        tion = TionLite("AA:BB:CC:DD:EE:FF", adapter="hci1")
+        # client is created on the first use
+        client.assert_not_called()
+        assert tion._btle is tion._btle
+        client.assert_called_once_with("AA:BB:CC:DD:EE:FF", adapter="hci1")
+
+        tion.adapter = "hci0"
+        other = BLEDevice("AA:BB:CC:DD:EE:FF", "Breezer", {"path": "/org/bluez/hci1/dev_AA_BB"})
+        tion.update_btle_device(other)
+        tion.set_new_btle_device()
+        tion._btle
+        client.assert_called_with("AA:BB:CC:DD:EE:FF", adapter="hci0")
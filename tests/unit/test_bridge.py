@@ -0,0 +1,105 @@
+import asyncio
+import socket
+from typing import List
+
+import pytest
+from bleak import exc
+
+from tion_btle import clock
+from tion_btle.bridge import BridgeClient, ProxyServer
+from tion_btle.clock import run_virtual
+from tion_btle.lite import TionLite
+from tion_btle.transport import FakeTransport, LiteResponder
+
+MACS = ["AA:BB:CC:DD:EE:01", "AA:BB:CC:DD:EE:02"]
+
+
+class BrokenTransport(FakeTransport):
+    async def connect(self) -> bool:
+        raise OSError("adapter is down")
+
+
+@pytest.fixture
+async def proxy():
+    transports: List[FakeTransport] = []
+
+    def create(mac: str) -> FakeTransport:
+        transport_class = BrokenTransport if mac == "AA:BB:CC:DD:EE:FF" else FakeTransport
+        transports.append(transport_class(mac, LiteResponder(), mtu_size=247))
+        return transports[-1]
+
+    server = ProxyServer(create)
+    await server.start(port=0)
+    server.transports = transports
+    yield server
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_get_through_proxy(proxy):
+    async with BridgeClient(*proxy.address[:2]) as client:
+        tions = [TionLite(mac, transport=client.transport) for mac in MACS]
+        states = await asyncio.gather(*(tion.get() for tion in tions))
+
+    assert [s["fan_speed"] for s in states] == [4, 4]
+    # single client connection, transport per device on the proxy
+    assert sorted(t.device for t in proxy.transports) == MACS
+    assert all(t.writes for t in proxy.transports)
+    assert not any(t.is_connected for t in proxy.transports)
+
+
+@pytest.mark.asyncio
+async def test_mtu_from_proxy(proxy):
+    async with BridgeClient(*proxy.address[:2]) as client:
+        transport = client.transport(MACS[0])
+        await transport.connect()
+        assert transport.mtu_size == 247
+        assert transport.is_connected
+        await transport.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_remote_error(proxy):
+    async with BridgeClient(*proxy.address[:2]) as client:
+        with pytest.raises(exc.BleakError, match="adapter is down"):
+            await client.transport("AA:BB:CC:DD:EE:FF").connect()
+
+
+@pytest.mark.asyncio
+async def test_lost_proxy(proxy):
+    client = BridgeClient(*proxy.address[:2])
+    transport = client.transport(MACS[0])
+    await transport.connect()
+    client._writer.transport.abort()
+    await asyncio.sleep(0.01)
+
+    assert not transport.is_connected
+    assert not client.connected
+    # next request opens new connection
+    await transport.connect()
+    assert transport.is_connected
+    await client.close()
+
+
+def test_unreachable_proxy_is_retried():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = BridgeClient("127.0.0.1", port)
+    attempts = []
+    connect = client.connect
+
+    async def counting_connect():
+        attempts.append(clock.monotonic())
+        await connect()
+
+    client.connect = counting_connect
+
+    async def main():
+        with pytest.raises(exc.BleakError, match="Could not connect to proxy"):
+            await client.transport(MACS[0]).connect()
+        with pytest.raises(Exception):
+            await TionLite(MACS[0], transport=client.transport).get()
+
+    run_virtual(main())
+    assert len(attempts) > 2
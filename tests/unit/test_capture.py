@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from tion_btle.capture import CaptureReader, CaptureWriter, MAGIC, replay, replay_notifications
+from tion_btle.lite import TionLite
+from tion_btle.recorder import FlightRecorder
+from tion_btle.s4 import TionS4
+from tion_btle.tion import TionException
+
+MAC = "AA:BB:CC:DD:EE:FF"
+
+
+def _capture_session(path, tion, sessions: int = 3):
+    with CaptureWriter(path) as writer:
+        for i in range(sessions):
+            request = tion.command_getStatus
+            writer.write(FlightRecorder.WRITE, MAC, tion.model, request, timestamp=100 + i)
+            packages = [bytearray(p) for p in tion._packages]
+            packages[0][7:11] = request[7:11]
+            for j, p in enumerate(packages):
+                writer.write(FlightRecorder.NOTIFY, MAC, tion.model, p, timestamp=100 + i + j * 0.01)
+
+
+def test_write_and_read(tmp_path):
+    path = tmp_path / "session.cap"
+    with CaptureWriter(path) as writer:
+        writer.write(FlightRecorder.WRITE, MAC.lower(), "Lite", b"\x01\x02", timestamp=1.5)
+    with CaptureWriter(path) as writer:
+        writer.write(FlightRecorder.NOTIFY, "11:22:33:44:55:66", "S4", bytearray(b"\x03"), timestamp=2.5)
+
+    assert path.read_bytes().startswith(MAGIC)
+    with CaptureReader(path) as reader:
+        records = [(r.timestamp, r.kind, r.mac, r.model, bytes(r.data)) for r in reader]
+
+    assert records == [
+        (1.5, FlightRecorder.WRITE, MAC, "Lite", b"\x01\x02"),
+        (2.5, FlightRecorder.NOTIFY, "11:22:33:44:55:66", "S4", b"\x03"),
+    ]
+
+
+def test_not_a_capture(tmp_path):
+    path = tmp_path / "session.cap"
+    path.write_bytes(b"something else")
+    with pytest.raises(TionException):
+        CaptureReader(path)
+
+
+def test_truncated_capture(tmp_path):
+    path = tmp_path / "session.cap"
+    with CaptureWriter(path) as writer:
+        writer.write(FlightRecorder.NOTIFY, MAC, "Lite", b"\x01\x02\x03")
+    path.write_bytes(path.read_bytes()[:-1])
+
+    with CaptureReader(path) as reader:
+        assert list(reader) == []
+
+
+@pytest.mark.parametrize("model", [TionLite, TionS4])
+def test_replay(tmp_path, model):
+    path = tmp_path / "session.cap"
+    _capture_session(path, model(mac=""))
+
+    tion = model(mac="")
+    with CaptureReader(path) as reader:
+        stats = replay(reader, tion, mac=MAC)
+
+    assert stats.messages == 3
+    assert stats.errors == 0
+    assert tion.fan_speed == 4
+
+
+def test_writer_attached_to_tion(tmp_path):
+    path = tmp_path / "session.cap"
+    tion = TionLite(mac=MAC)
+    with CaptureWriter(path) as writer:
+        writer.attach(tion)
+        tion.flight_recorder.record(FlightRecorder.WRITE, b"\x80\x01")
+        tion._delegation.handleNotification(0, bytearray(b"\x80\x02"))
+
+    with CaptureReader(path) as reader:
+        assert [(r.kind, r.model, bytes(r.data)) for r in reader] == [
+            (FlightRecorder.WRITE, "Lite", b"\x80\x01"),
+            (FlightRecorder.NOTIFY, "Lite", b"\x80\x02"),
+        ]
+
+
+@pytest.mark.asyncio
+async def test_replay_notifications_timing(tmp_path):
+    path = tmp_path / "session.cap"
+    _capture_session(path, TionLite(mac=""), sessions=2)
+    received = []
+
+    with CaptureReader(path) as reader:
+        start = time.monotonic()
+        count = await replay_notifications(reader, lambda h, d: received.append(d), speed=10)
+        elapsed = time.monotonic() - start
+
+    assert count == len(received) == 8
+    assert 0.1 <= elapsed < 0.5
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+from bleak import exc
+
+from tion_btle import clock
+from tion_btle.clock import Clock, run_virtual, set_clock
+from tion_btle.latency import LatencyTracker
+from tion_btle.lite import TionLite
+from tion_btle.reconcile import Reconciler
+from tion_btle.tion import TionException, TionTimeoutError, retry
+from tion_btle.transport import FakeTransport, LiteResponder
+from tests.unit.helpers import STATE, FakeTion
+
+MAC = "AA:BB:CC:DD:EE:01"
+
+
+@pytest.fixture
+def real_time():
+    start = time.monotonic()
+    yield
+    assert time.monotonic() - start < 1
+
+
+def test_sleep_is_instant(real_time):
+    async def main():
+        start = clock.monotonic()
+        await asyncio.gather(clock.sleep(3600), asyncio.sleep(7200))
+        return clock.monotonic() - start
+
+    assert run_virtual(main()) == pytest.approx(7200)
+
+
+def test_response_timeouts(real_time):
+    async def main():
+        tion = TionLite(MAC, transport=FakeTransport)
+        tion._latency = LatencyTracker(initial_timeout=10, max_timeout=10)
+        start = clock.monotonic()
+        with pytest.raises(TionException):
+            await tion.get()
+        return clock.monotonic() - start, tion.latency_stats
+
+    elapsed, latency = run_virtual(main())
+    # request and two resends, each waits for the full response timeout
+    assert elapsed == pytest.approx(30)
+    assert latency["timeouts"] == 3
+
+
+def test_deadline(real_time):
+    async def main():
+        tion = TionLite(MAC, transport=FakeTransport)
+        start = clock.monotonic()
+        with pytest.raises(TionTimeoutError):
+            await tion.get(timeout=4)
+        return clock.monotonic() - start
+
+    assert run_virtual(main()) == pytest.approx(4)
+
+
+def test_connect_retry_delay(real_time):
+    class FlakyTransport(FakeTransport):
+        failures = 1
+
+        async def connect(self) -> bool:
+            if FlakyTransport.failures:
+                FlakyTransport.failures -= 1
+                raise exc.BleakError("Device not found")
+            return await super().connect()
+
+    async def main():
+        tion = TionLite(MAC, transport=lambda device: FlakyTransport(device, LiteResponder()))
+        start = clock.monotonic()
+        state = await tion.get()
+        return clock.monotonic() - start, state
+
+    elapsed, state = run_virtual(main())
+    assert elapsed >= 2
+    assert state["fan_speed"] == 4
+
+
+def test_day_of_reconciling(real_time):
+    tion = FakeTion(dict(STATE))
+
+    async def main():
+        reconciler = Reconciler(tion, {"fan_speed": 4}, interval=60)
+        reconciler.start()
+        for hour in range(24):
+            await asyncio.sleep(3600)
+            # remote control changes speed every hour
+            tion.state["fan_speed"] = hour % 3 + 1
+        await reconciler.stop()
+        return reconciler.stats
+
+    stats = run_virtual(main())
+    assert 1440 <= stats.checks <= 1500
+    assert stats.writes >= 16
+
+
+@pytest.mark.asyncio
+async def test_custom_clock():
+    slept = []
+
+    class RecordingClock(Clock):
+        async def sleep(self, delay: float) -> None:
+            slept.append(delay)
+
+    @retry(retries=2, delay=5)
+    async def failing():
+        raise exc.BleakError
+
+    previous = set_clock(RecordingClock())
+    try:
+        with pytest.raises(Exception):
+            await failing()
+    finally:
+        set_clock(previous)
+    assert slept == [5, 5, 5]
+
+
+def test_virtual_loop_does_io():
+    async def main():
+        server = await asyncio.start_server(lambda r, w: w.write(b"pong\n"), "127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        # nothing waits for timers, so loop blocks on real I/O
+        line = await reader.readline()
+        writer.close()
+        server.close()
+        return line
+
+    assert run_virtual(main()) == b"pong\n"
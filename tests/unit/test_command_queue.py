@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from tion_btle.command_queue import Command, CommandQueue, Priority
+from tion_btle.tion import Deadline
+
+
+class Executor:
+    def __init__(self):
+        self.executed: List[tuple] = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, kind: str, payload: dict | None, deadline: Deadline | None):
+        await self.release.wait()
+        self.executed.append((kind, payload))
+        return kind, payload
+
+
+async def _start(queue: CommandQueue, kind: str, priority: Priority, payload: dict | None = None) -> asyncio.Task:
+    task = asyncio.create_task(queue.submit(kind, priority, payload))
+    await asyncio.sleep(0)
+    return task
+
+
+@pytest.mark.asyncio
+async def test_priority_order():
+    executor = Executor()
+    queue = CommandQueue(executor)
+
+    first = await _start(queue, Command.GET, Priority.POLL)
+    poll = await _start(queue, Command.GET, Priority.POLL)
+    scheduled = await _start(queue, Command.SET, Priority.SCHEDULED, {"fan_speed": 2})
+    interactive = await _start(queue, Command.SET, Priority.INTERACTIVE, {"fan_speed": 3})
+    executor.release.set()
+    await asyncio.gather(first, poll, scheduled, interactive)
+
+    assert executor.executed == [
+        (Command.GET, None),
+        (Command.SET, {"fan_speed": 3}),
+        (Command.GET, None),
+    ]
+    assert queue.stats.merged == 1
+
+
+@pytest.mark.asyncio
+async def test_get_requests_are_shared():
+    executor = Executor()
+    queue = CommandQueue(executor)
+
+    running = await _start(queue, Command.GET, Priority.POLL)
+    waiting = [await _start(queue, Command.GET, Priority.POLL) for _ in range(3)]
+    executor.release.set()
+
+    assert await running == (Command.GET, None)
+    assert all(r == (Command.GET, None) for r in await asyncio.gather(*waiting))
+    assert len(executor.executed) == 2
+    assert queue.stats.executed[Priority.POLL] == 2
+
+
+@pytest.mark.asyncio
+async def test_set_merged_with_newer_values():
+    executor = Executor()
+    queue = CommandQueue(executor)
+
+    running = await _start(queue, Command.GET, Priority.POLL)
+    scheduled = await _start(queue, Command.SET, Priority.SCHEDULED, {"fan_speed": 2, "heater": "on"})
+    interactive = await _start(queue, Command.SET, Priority.INTERACTIVE, {"fan_speed": 4})
+    poll = await _start(queue, Command.GET, Priority.POLL)
+    executor.release.set()
+    await asyncio.gather(running, scheduled, interactive, poll)
+
+    assert executor.executed == [
+        (Command.GET, None),
+        (Command.SET, {"fan_speed": 4, "heater": "on"}),
+        (Command.GET, None),
+    ]
+    assert queue.stats.executed[Priority.INTERACTIVE] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_command_is_dropped():
+    executor = Executor()
+    queue = CommandQueue(executor)
+
+    running = await _start(queue, Command.GET, Priority.POLL)
+    dropped = await _start(queue, Command.SET, Priority.SCHEDULED, {"fan_speed": 2})
+    dropped.cancel()
+    await asyncio.sleep(0)
+    executor.release.set()
+    await running
+
+    assert executor.executed == [(Command.GET, None)]
+    assert queue.stats.dropped == 1
+    assert queue.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_exception_is_passed_to_caller():
+    async def executor(kind: str, payload: dict | None, deadline: Deadline | None):
+        raise ValueError(kind)
+
+    queue = CommandQueue(executor)
+    with pytest.raises(ValueError):
+        await queue.submit(Command.GET)
+
+
+@pytest.mark.asyncio
+async def test_wait_time_is_measured():
+    executor = Executor()
+    queue = CommandQueue(executor)
+
+    running = await _start(queue, Command.GET, Priority.POLL)
+    waiting = await _start(queue, Command.SET, Priority.INTERACTIVE, {"fan_speed": 1})
+    await asyncio.sleep(0.05)
+    executor.release.set()
+    await asyncio.gather(running, waiting)
+
+    stats = queue.stats.as_dict()
+    assert stats["interactive"]["executed"] == 1
+    assert stats["interactive"]["max_wait"] >= 0.05
+    assert stats["last_wait"] == stats["interactive"]["max_wait"]
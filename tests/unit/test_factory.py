@@ -0,0 +1,94 @@
+import unittest.mock as mock
+
+import pytest
+from bleak.backends.device import BLEDevice
+
+from tion_btle import TionLite, TionS3, TionS4
+from tion_btle.factory import ModelCache, create_tion, detect_model, model_from_advertisement
+from tion_btle.light_family import TionLiteFamily
+from tion_btle.registry import DeviceRegistry
+from tion_btle.tion import TionException
+from tests.unit.helpers import advertisement
+
+MAC = "AA:BB:CC:DD:EE:FF"
+
+
+@pytest.mark.parametrize(
+    "name, uuids, expected",
+    [
+        pytest.param(None, [TionS3.uuid], "S3", id="S3 by uuid"),
+        pytest.param("Tion Breezer 3S", [], "S3", id="S3 by name"),
+        pytest.param("Tion Breezer Lite", [TionLiteFamily.uuid], "Lite", id="Lite"),
+        pytest.param("Breezer 4S", [TionLiteFamily.uuid], "S4", id="S4"),
+        pytest.param(None, [TionLiteFamily.uuid], None, id="Lite family without name"),
+        pytest.param("Something else", [], None, id="unknown"),
+    ]
+)
+def test_model_from_advertisement(name, uuids, expected):
+    assert model_from_advertisement(name, uuids) == expected
+
+
+def test_cache(tmp_path):
+    path = tmp_path / "models.json"
+    cache = ModelCache(path)
+    assert cache.get(MAC) is None
+
+    cache.set(MAC.lower(), "S4")
+    assert ModelCache(path).get(MAC) == "S4"
+
+
+def test_broken_cache(tmp_path):
+    path = tmp_path / "models.json"
+    path.write_text("{broken")
+    assert ModelCache(path).get(MAC) is None
+
+
+@pytest.mark.asyncio
+async def test_detect_model_uses_cache(tmp_path):
+    cache = ModelCache(tmp_path / "models.json")
+    cache.set(MAC, "Lite")
+
+    with mock.patch("tion_btle.factory.probe_model") as probe:
+        assert await detect_model(MAC, cache=cache) == "Lite"
+        probe.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_detect_model_probes_once(tmp_path):
+    cache = ModelCache(tmp_path / "models.json")
+
+    with mock.patch("tion_btle.factory.probe_model", new=mock.AsyncMock(return_value="S4")) as probe:
+        assert await detect_model(MAC, advertisement(uuids=[TionLiteFamily.uuid]), cache) == "S4"
+        assert await detect_model(MAC, advertisement(uuids=[TionLiteFamily.uuid]), cache) == "S4"
+        probe.assert_awaited_once()
+
+    assert ModelCache(tmp_path / "models.json").get(MAC) == "S4"
+
+
+@pytest.mark.asyncio
+async def test_detect_model_failed():
+    with mock.patch("tion_btle.factory.probe_model", new=mock.AsyncMock(return_value=None)):
+        with pytest.raises(TionException):
+            await detect_model(MAC)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ["Tion Breezer 3S", TionS3],
+        ["Tion Breezer Lite", TionLite],
+        ["Breezer 4S", TionS4],
+    ]
+)
+async def test_create_tion_from_registry(name, expected):
+    registry = DeviceRegistry()
+    device = BLEDevice(MAC, name, None)
+    registry.update(device, advertisement(name=name))
+
+    with mock.patch("tion_btle.transport.BleakClient"):
+        tion = await create_tion(MAC, registry=registry, probe=False)
+
+    assert type(tion) is expected
+    assert tion.mac == MAC
+    assert tion._registry is registry
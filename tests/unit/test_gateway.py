@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+from tion_btle.__main__ import create_devices
+from tion_btle.gateway import Gateway
+from tion_btle.lite import TionLite
+from tion_btle.transport import FakeTransport, LiteResponder
+from tests.unit.helpers import STATE, FakeTion
+
+
+class GatewayTion(FakeTion):
+    model = "S4"
+
+    def __init__(self, mac: str):
+        super().__init__(dict(STATE))
+        self.mac = mac
+        self.reads = 0
+
+    async def get(self, priority=None, timeout=None) -> dict:
+        self.reads += 1
+        return await super().get(priority, timeout)
+
+
+MAC = "AA:BB:CC:DD:EE:01"
+
+
+@pytest.fixture
+async def gateway():
+    gateway = Gateway([GatewayTion(MAC), GatewayTion("AA:BB:CC:DD:EE:02")], poll_interval=3600)
+    await gateway.start(host="127.0.0.1", port=0)
+    await asyncio.sleep(0.01)
+    yield gateway
+    await gateway.stop()
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.id = 0
+
+    @classmethod
+    async def connect(cls, gateway: Gateway):
+        return cls(*await asyncio.open_connection(*gateway.address[:2]))
+
+    async def send(self, **request) -> dict:
+        self.id += 1
+        self.writer.write(json.dumps({"id": self.id, **request}).encode() + b"\n")
+        return await self.receive()
+
+    async def receive(self) -> dict:
+        return json.loads(await asyncio.wait_for(self.reader.readline(), 1))
+
+    def close(self):
+        self.writer.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_from_cache(gateway):
+    clients = [await Client.connect(gateway) for _ in range(5)]
+    for client in clients:
+        response = await client.send(cmd="get", mac=MAC.lower())
+        assert response["ok"]
+        assert response["result"]["fan_speed"] == STATE["fan_speed"]
+        client.close()
+
+    assert gateway.devices[MAC].reads == 1
+
+
+@pytest.mark.asyncio
+async def test_set_pushes_event(gateway):
+    watcher = await Client.connect(gateway)
+    assert (await watcher.send(cmd="watch"))["ok"]
+
+    client = await Client.connect(gateway)
+    response = await client.send(cmd="set", mac=MAC, settings={"fan_speed": 5})
+    assert response == {"id": 1, "ok": True, "result": None}
+    assert gateway.devices[MAC].writes == [{"fan_speed": 5}]
+
+    event = await watcher.receive()
+    assert event["event"] == "state"
+    assert event["mac"] == MAC
+    assert event["changed"] == {"fan_speed": 5}
+    assert (await client.send(cmd="get", mac=MAC))["result"]["fan_speed"] == 5
+    watcher.close()
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_errors(gateway):
+    client = await Client.connect(gateway)
+    response = await client.send(cmd="get", mac="11:22:33:44:55:66")
+    assert not response["ok"] and "Unknown device" in response["error"]
+    assert not (await client.send(cmd="reboot"))["ok"]
+    assert not (await client.send(cmd="set", mac=MAC, settings=[]))["ok"]
+
+    client.writer.write(b"not json\n")
+    assert (await client.receive())["error"].startswith("Bad request")
+    assert len((await client.send(cmd="list"))["result"]) == 2
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_unix_socket(tmp_path):
+    path = str(tmp_path / "tion.sock")
+    async with Gateway([GatewayTion(MAC)]) as gateway:
+        await gateway.start(path=path)
+        reader, writer = await asyncio.open_unix_connection(path)
+        client = Client(reader, writer)
+        assert (await client.send(cmd="get", mac=MAC))["ok"]
+        client.close()
+
+
+@pytest.mark.asyncio
+async def test_create_devices():
+    devices = await create_devices([f"{MAC}=Lite"])
+    assert isinstance(devices[0], TionLite)
+    with pytest.raises(SystemExit):
+        await create_devices([f"{MAC}=S5"])
+
+
+@pytest.mark.asyncio
+async def test_bad_settings_are_answered():
+    tion = TionLite(MAC, transport=lambda device: FakeTransport(device, LiteResponder()))
+    async with Gateway([tion], poll_interval=3600) as gateway:
+        await gateway.start(host="127.0.0.1", port=0)
+        client = await Client.connect(gateway)
+        response = await client.send(cmd="set", mac=MAC, settings={"heater_temp": "abc"})
+        assert response["id"] == 1 and not response["ok"]
+        assert response["error"].startswith("ValueError")
+        assert (await client.send(cmd="get", mac=MAC))["ok"]
+        client.close()
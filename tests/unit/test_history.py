@@ -0,0 +1,108 @@
+import math
+from array import array
+import time
+import unittest.mock as mock
+
+import pytest
+
+from tion_btle.history import HistoryStore
+from tion_btle.s3 import TionS3
+from tests.unit.test_snapshot import MAC, S3_RESPONSE
+from tests.unit.test_tion import _mock_btle
+
+START = 1_599_998_400
+
+
+def _fill(store: HistoryStore, count: int, mac: str = MAC, step: float = 60):
+    for i in range(count):
+        store.record(mac, {"out_temp": i % 30 - 10, "fan_speed": i % 6 + 1, "state": "on"}, timestamp=START + i * step)
+
+
+def test_query(tmp_path):
+    store = HistoryStore(tmp_path, chunk_size=16)
+    _fill(store, 100)
+
+    assert store.fields(MAC) == ["out_temp", "fan_speed"]
+    times, values = store.query(MAC, "out_temp", START + 10 * 60, START + 40 * 60)
+    assert list(times) == [START + i * 60 for i in range(10, 40)]
+    assert list(values) == [i % 30 - 10 for i in range(10, 40)]
+    assert values.typecode == "f"
+    assert store.query(MAC, "fan_speed")[1].typecode == "B"
+
+
+def test_persistence(tmp_path):
+    with HistoryStore(tmp_path, chunk_size=16) as store:
+        _fill(store, 50)
+
+    store = HistoryStore(tmp_path, chunk_size=16)
+    assert store.count(MAC.lower()) == 50
+    _fill(store, 10)
+    assert store.count(MAC) == 50
+    store.record(MAC, {"out_temp": 5, "fan_speed": 1}, timestamp=START + 3600)
+    assert list(store.query(MAC, "out_temp", START + 3000)[1]) == [5]
+
+
+def test_interrupted_flush(tmp_path):
+    with HistoryStore(tmp_path, chunk_size=16) as store:
+        _fill(store, 20)
+    column = tmp_path / MAC.replace(":", "") / "out_temp.f"
+    column.write_bytes(column.read_bytes()[:-6])
+
+    store = HistoryStore(tmp_path)
+    assert store.count(MAC) == 18
+    assert len(store.query(MAC, "fan_speed")[1]) == 18
+
+
+def test_rollup(tmp_path):
+    store = HistoryStore(tmp_path, chunk_size=16)
+    _fill(store, 120)
+    store.record(MAC, {"fan_speed": 1}, timestamp=START + 120 * 60)
+
+    buckets = store.rollup(MAC, "out_temp", bucket=1800, start=START)
+    assert [b.count for b in buckets] == [30, 30, 30, 30]
+    assert buckets[1].min == -10 and buckets[1].max == 19 and buckets[1].mean == 4.5
+    assert math.isnan(store.query(MAC, "out_temp")[1][-1])
+
+
+def test_unknown_device(tmp_path):
+    store = HistoryStore(tmp_path)
+    assert store.count(MAC) == 0
+    assert len(store.query(MAC, "out_temp")[0]) == 0
+    assert store.rollup(MAC, "out_temp", 60) == []
+
+
+def test_query_speed(tmp_path):
+    """Month of minute samples for 50 devices"""
+    samples = 30 * 24 * 60
+    times = array("d", (START + i * 60 for i in range(samples)))
+    values = array("f", (i % 40 for i in range(samples)))
+    macs = [f"AA:BB:CC:DD:EE:{i:02X}" for i in range(50)]
+    with HistoryStore(tmp_path) as store:
+        for mac in macs:
+            store.record(mac, {"out_temp": 0}, timestamp=START - 60)
+    for mac in macs:
+        directory = tmp_path / mac.replace(":", "")
+        with open(directory / "time.d", "ab") as f:
+            times.tofile(f)
+        with open(directory / "out_temp.f", "ab") as f:
+            values.tofile(f)
+
+    store = HistoryStore(tmp_path)
+    begin = time.perf_counter()
+    total = sum(len(store.query(mac, "out_temp", START + 24 * 3600)[1]) for mac in macs)
+    assert time.perf_counter() - begin < 0.5
+    assert total == 50 * 29 * 24 * 60
+
+
+@pytest.mark.asyncio
+async def test_tion_records_history(tmp_path):
+    history = HistoryStore(tmp_path)
+    tion = TionS3(MAC, history=history)
+    _mock_btle(tion)
+    with mock.patch.object(tion, "_get_data_from_breezer", return_value=S3_RESPONSE):
+        await tion.get()
+        await tion.get()
+
+    assert history.count(MAC) == 2
+    assert "productivity" in history.fields(MAC)
+    assert list(history.query(MAC, "fan_speed")[1]) == [tion.fan_speed] * 2
@@ -0,0 +1,78 @@
+import pytest
+
+from tion_btle.latency import LatencyTracker
+
+
+def test_initial_timeout():
+    tracker = LatencyTracker(initial_timeout=10, min_samples=5)
+    for _ in range(4):
+        tracker.add(0.05)
+    assert tracker.timeout == 10
+
+    tracker.add(0.05)
+    assert tracker.timeout == pytest.approx(0.2)
+
+
+@pytest.mark.parametrize(
+    "samples, expected",
+    [
+        pytest.param([0.1] * 10, 0.3, id="fast device"),
+        pytest.param([1.0] * 10, 3.0, id="slow device"),
+        pytest.param([0.01] * 10, 0.2, id="clamped to min"),
+        pytest.param([5.0] * 10, 10.0, id="clamped to max"),
+        pytest.param([0.1] * 98 + [0.5] * 2, 1.5, id="follows p99"),
+    ]
+)
+def test_timeout(samples, expected):
+    tracker = LatencyTracker(min_timeout=0.2, max_timeout=10, factor=3, window=100)
+    for s in samples:
+        tracker.add(s)
+    assert tracker.timeout == pytest.approx(expected)
+
+
+def test_window():
+    tracker = LatencyTracker(window=10)
+    for _ in range(10):
+        tracker.add(2.0)
+    for _ in range(10):
+        tracker.add(0.1)
+
+    assert tracker.percentile(99) == pytest.approx(0.1)
+    assert tracker.count == 20
+
+
+def test_stats():
+    tracker = LatencyTracker(alpha=0.5)
+    assert tracker.as_dict()["p50"] is None
+
+    tracker.add(1.0)
+    tracker.add(2.0)
+    tracker.add_timeout()
+
+    stats = tracker.as_dict()
+    assert stats["ewma"] == pytest.approx(1.5)
+    assert stats["timeouts"] == 1
+    assert stats["count"] == 2
+
+
+def test_timeouts_back_off():
+    tracker = LatencyTracker(min_timeout=0.2, max_timeout=10, factor=3)
+    for _ in range(10):
+        tracker.add(0.05)
+    assert tracker.timeout == pytest.approx(0.2)
+
+    # device became slower than its learned timeout
+    timeouts = []
+    while tracker.timeout < 1.0:
+        tracker.add_timeout()
+        timeouts.append(tracker.timeout)
+    assert timeouts == pytest.approx([0.4, 0.8, 1.6])
+    for _ in range(10):
+        tracker.add_timeout()
+    assert tracker.timeout == 10
+
+    # response received with the longer timeout is learned
+    for _ in range(64):
+        tracker.add(1.0)
+    assert tracker.consecutive_timeouts == 0
+    assert tracker.timeout == pytest.approx(3.0)
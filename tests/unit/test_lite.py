@@ -1,7 +1,13 @@
 from random import randrange
 import pytest
+import unittest.mock as mock
 
-from tion_btle.light_family import TionLiteFamily
+from bleak import exc
+
+from tion_btle.light_family import RandomPool, TionLiteFamily
+from tion_btle.lite import TionLite
+from tion_btle.s4 import TionS4
+from tion_btle.tion import MaxTriesExceededError
 
 
 def generator(_len: int) -> bytearray:
@@ -51,3 +57,180 @@ def test_split_command(command: bytearray):
     assert command[1:] == joined
 
 
+
+@pytest.mark.parametrize(
+    "command, packet_size, expected_packets",
+    [
+        pytest.param(generator(30), 20, 2, id="len=30,size=20"),
+        pytest.param(generator(30), 64, 1, id="len=30,size=64"),
+        pytest.param(generator(90), 20, 5, id="len=90,size=20"),
+        pytest.param(generator(90), 64, 2, id="len=90,size=64"),
+        pytest.param(generator(300), 128, 3, id="len=300,size=128"),
+    ]
+)
+def test_split_command_packet_size(command: bytearray, packet_size: int, expected_packets: int):
+    tion = TionLiteFamily(mac="")
+    splitted = tion.split_command(request=command.copy(), packet_size=packet_size)
+
+    assert len(splitted) == expected_packets
+    assert all(len(p) <= packet_size for p in splitted)
+    assert command[1:] == b"".join(p[1:] for p in splitted)
+
+
+@pytest.mark.parametrize(
+    "max_packet_size, connected, mtu_size, mtu_rejected, expected",
+    [
+        pytest.param(20, True, 247, False, 20, id="model does not allow big packets"),
+        pytest.param(244, False, 247, False, 20, id="not connected"),
+        pytest.param(244, True, 23, False, 20, id="default MTU"),
+        pytest.param(244, True, 100, False, 97, id="negotiated MTU"),
+        pytest.param(128, True, 247, False, 128, id="limited by model"),
+        pytest.param(244, True, 247, True, 20, id="big packets were rejected"),
+    ]
+)
+def test_packet_size(max_packet_size: int, connected: bool, mtu_size: int, mtu_rejected: bool, expected: int):
+    tion = TionLiteFamily(mac="")
+    tion.max_packet_size = max_packet_size
+    tion._mtu_rejected = mtu_rejected
+    with mock.patch.object(type(tion._btle), "is_connected", new_callable=mock.PropertyMock) as is_connected, \
+            mock.patch.object(type(tion._btle), "mtu_size", new_callable=mock.PropertyMock) as mtu:
+        is_connected.return_value = connected
+        mtu.return_value = mtu_size
+        assert tion.packet_size == expected
+
+
+@pytest.mark.asyncio
+async def test_send_request_falls_back_to_default_packets():
+    tion = TionLiteFamily(mac="")
+    tion.max_packet_size = 244
+    written = []
+
+    async def _write(packets):
+        if len(packets[0]) > TionLiteFamily.DEFAULT_PACKET_SIZE:
+            raise MaxTriesExceededError
+        written.extend(packets)
+
+    with mock.patch.object(TionLiteFamily, "packet_size", new_callable=mock.PropertyMock) as packet_size, \
+            mock.patch.object(tion, "_write_packets", side_effect=_write):
+        packet_size.return_value = 244
+        await tion._send_request(generator(60))
+
+    assert tion._mtu_rejected
+    assert len(written) == 4
+
+
+@pytest.mark.asyncio
+async def test_write_frame_resends_whole_request():
+    tion = TionLiteFamily(mac="")
+    tion._btle = mock.MagicMock()
+    tion._btle.write = mock.AsyncMock(side_effect=[None, exc.BleakError, None, None, None, None])
+
+    packets = tion.split_command(generator(50), packet_size=20)
+    await tion._write_packets(packets)
+
+    written = [c.args[1] for c in tion._btle.write.call_args_list]
+    assert len(written) == 2 * len(packets)
+    assert written[len(packets):] == packets
+    assert written[len(packets)][0] == TionLiteFamily.FIRST_PACKET_ID
+
+
+@pytest.mark.asyncio
+async def test_write_packets_sequential():
+    tion = TionLiteFamily(mac="")
+    tion.pipelined_writes = False
+    tion._btle = mock.MagicMock()
+    tion._btle.write = mock.AsyncMock(side_effect=[None, exc.BleakError, None, None])
+
+    packets = tion.split_command(generator(50), packet_size=20)
+    await tion._write_packets(packets)
+
+    written = [c.args[1] for c in tion._btle.write.call_args_list]
+    assert written == [packets[0], packets[1], packets[1], packets[2]]
+
+
+@pytest.mark.parametrize("instance", [TionLite, TionS4])
+def test_request_ids_are_unique(instance):
+    tion = instance(mac="")
+    ids = {bytes(tion.command_getStatus[7:11]) for _ in range(5)}
+    ids |= {bytes(tion._encode_request(
+        {"state": "on", "sound": "on", "light": "on", "heater": "on", "mode": "outside", "heater_temp": 20,
+         "fan_speed": 2})[7:11]) for _ in range(5)}
+    assert len(ids) == 10
+
+
+@pytest.mark.parametrize("instance", [TionLite, TionS4])
+def test_collect_message_matches_request_id(instance):
+    tion = instance(mac="")
+    request = tion.command_getStatus
+    packages = [bytearray(p) for p in tion._packages]
+    packages[0][7:11] = request[7:11]
+
+    assert [tion._collect_message(p) for p in packages] == [False] * (len(packages) - 1) + [True]
+    assert tion._request_id == request[7:11]
+    assert tion.unmatched_responses == 0
+
+    # same response again is late now
+    assert [tion._collect_message(bytearray(p)) for p in packages] == [False] * len(packages)
+    assert tion.unmatched_responses == 1
+
+
+@pytest.mark.parametrize("instance", [TionLite, TionS4])
+def test_collect_message_drops_unknown_request_id(instance):
+    tion = instance(mac="")
+    tion.command_getStatus  # noqa
+
+    assert not any(tion._collect_message(bytearray(p)) for p in tion._packages)
+    assert tion.unmatched_responses == 1
+
+
+def test_pending_requests_are_limited():
+    tion = TionLite(mac="")
+    first = tion.command_getStatus[7:11]
+    for _ in range(TionLite.MAX_PENDING_REQUESTS):
+        tion.command_getStatus  # noqa
+
+    packages = [bytearray(p) for p in tion._packages]
+    packages[0][7:11] = first
+    assert not any(tion._collect_message(p) for p in packages)
+    assert tion.unmatched_responses == 1
+
+
+class FixedPool:
+    def take(self, n: int) -> bytes:
+        return b"\x77" * n
+
+
+SET_REQUESTS = [
+    dict(state="on", sound="off", light="on", heater="on", heater_temp=21, fan_speed=3, mode="outside"),
+    dict(state="off", sound="on", light="off", heater="off", heater_temp=251, fan_speed=6, mode="recirculation"),
+]
+
+
+@pytest.mark.parametrize("instance, status, commands", [
+    pytest.param(TionLite, "8010003a0232127800000048d3c31abbaa", [
+        "001e003a773012790000007777777715000215030a1419020406600000bbaa",
+        "001e003a7730127a00000077777777020001fb060a1419020406600000bbaa",
+    ], id="Lite"),
+    pytest.param(TionS4, "8010003aa132327800000077777777bbaa", [
+        "0017003a77303279000000777777771500001503b500bbaa",
+        "0017003a7730327a000000777777771a0001fb06b500bbaa",
+    ], id="S4"),
+])
+def test_encoded_commands(instance, status, commands):
+    tion = instance(mac="")
+    tion._last_request_id = 0x77
+    with mock.patch("tion_btle.light_family._random_pool", FixedPool()):
+        assert bytes(tion.command_getStatus).hex() == status
+        for request, expected in zip(SET_REQUESTS, commands):
+            tion._fan_speed = request["fan_speed"] if request["state"] == "on" else 0
+            tion._heater_temp = 20 if request["state"] == "on" else 0
+            assert bytes(tion._encode_request(request)).hex() == expected
+    # commands do not share buffers
+    assert tion.command_getStatus is not tion.command_getStatus
+
+
+def test_random_pool():
+    pool = RandomPool(size=16)
+    chunks = [pool.take(5) for _ in range(10)]
+    assert all(len(c) == 5 for c in chunks)
+    assert len(pool.take(40)) == 40
@@ -0,0 +1,115 @@
+import asyncio
+import io
+import json
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from tion_btle.__main__ import read_specs
+from tion_btle.bridge import ProxyServer
+from tion_btle.clock import run_virtual
+from tion_btle.latency import LatencyTracker
+from tion_btle.lite import TionLite
+from tion_btle.monitor import Monitor
+from tion_btle.transport import FakeTransport, LiteResponder
+
+MAC = "AA:BB:CC:DD:EE:01"
+ROOT = Path(__file__).parents[2]
+
+
+def _monitor(macs, **kwargs) -> Monitor:
+    monitor = Monitor([], output=io.StringIO(), **kwargs)
+    monitor.devices = [TionLite(mac, transport=lambda device: FakeTransport(device, LiteResponder()),
+                                tracer=monitor.tracer) for mac in macs]
+    return monitor
+
+
+def _lines(monitor: Monitor) -> list:
+    return [json.loads(line) for line in monitor.output.getvalue().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_reports_changes_only():
+    monitor = _monitor([MAC])
+    tion = monitor.devices[0]
+
+    first = await monitor.poll(tion)
+    assert first["mac"] == MAC and first["model"] == "Lite" and first["op"] == "get"
+    assert first["retries"] == 0 and first["latency"] >= 0
+    assert first["changed"]["fan_speed"] == tion.fan_speed
+    assert await monitor.poll(tion) is None
+
+    monitor._states[MAC]["fan_speed"] = -1
+    assert (await monitor.poll(tion))["changed"] == {"fan_speed": tion.fan_speed}
+    assert len(_lines(monitor)) == 2
+
+    monitor.every = True
+    assert (await monitor.poll(tion))["changed"] == {}
+
+
+def test_reports_errors_with_retries():
+    async def main():
+        monitor = Monitor([], output=io.StringIO(), interval=5)
+        broken = TionLite(MAC, transport=lambda device: FakeTransport(device), tracer=monitor.tracer)
+        broken._latency = LatencyTracker(initial_timeout=0.5, max_timeout=0.5)
+        broken.response_retries = 1
+        monitor.devices = [broken]
+        await monitor.run(rounds=2)
+        return _lines(monitor)
+
+    lines = run_virtual(main())
+    assert len(lines) == 2
+    assert all("error" in line and "changed" not in line for line in lines)
+    assert lines[0]["error"] == "Could not get breezer state"
+    assert [line["retries"] for line in lines] == [1, 1]
+    assert lines[1]["ts"] >= lines[0]["ts"]
+
+
+@pytest.mark.asyncio
+async def test_bench():
+    monitor = _monitor([MAC, "AA:BB:CC:DD:EE:02"], concurrency=1)
+    summaries = await monitor.bench(3)
+
+    assert summaries == _lines(monitor)
+    assert [(s["mac"], s["op"]) for s in summaries] == [
+        (MAC, "get"), (MAC, "set"), ("AA:BB:CC:DD:EE:02", "get"), ("AA:BB:CC:DD:EE:02", "set"), ("*", "get"),
+        ("*", "set")]
+    assert [s["count"] for s in summaries] == [3, 3, 3, 3, 6, 6]
+    assert all(s["errors"] == 0 and s["p50"] <= s["p90"] <= s["p99"] <= s["max"] for s in summaries)
+
+
+def test_read_specs(tmp_path):
+    path = tmp_path / "devices.json"
+    path.write_text(json.dumps([MAC, "AA:BB:CC:DD:EE:02=S4", {"mac": "AA:BB:CC:DD:EE:03", "model": "S3"}]))
+    assert read_specs(str(path)) == [MAC, "AA:BB:CC:DD:EE:02=S4", "AA:BB:CC:DD:EE:03=S3"]
+
+    path.write_text(json.dumps({"devices": {MAC: "Lite", "AA:BB:CC:DD:EE:02": None}}))
+    assert read_specs(str(path)) == [f"{MAC}=Lite", "AA:BB:CC:DD:EE:02"]
+
+
+async def _run_cli(*args: str) -> Tuple[int, bytes, bytes]:
+    server = ProxyServer(lambda mac: FakeTransport(mac, LiteResponder()))
+    await server.start(port=0)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "tion_btle", *args, "monitor", "--rounds", "1",
+            "--proxy", "{}:{}".format(*server.address[:2]), f"{MAC}=Lite",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=ROOT)
+        stdout, stderr = await asyncio.wait_for(process.communicate(), 30)
+    finally:
+        await server.stop()
+    return process.returncode, stdout, stderr
+
+
+@pytest.mark.asyncio
+async def test_cli_is_quiet_by_default():
+    code, stdout, stderr = await _run_cli()
+    assert code == 0, stderr
+    [line] = stdout.splitlines()
+    assert json.loads(line)["mac"] == MAC
+    assert b"DEBUG" not in stderr
+
+    code, _, stderr = await _run_cli("-vv")
+    assert code == 0 and b"DEBUG" in stderr
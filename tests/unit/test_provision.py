@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from bleak import exc
+
+from tion_btle.lite import TionLite
+from tion_btle.provision import FAILED, PAIRED, Manifest, Provisioner
+from tion_btle.transport import FakeTransport
+
+
+class PairingModeTransport(FakeTransport):
+    """Device that enters pairing mode after several attempts"""
+
+    def __init__(self, device, failures: int, active: list):
+        super().__init__(device)
+        self.failures = failures
+        self.active = active
+
+    async def pair(self) -> bool:
+        self.active.append(self.device)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures > 0:
+                self.failures -= 1
+                raise exc.BleakError("Authentication failed")
+            return True
+        finally:
+            self.active.remove(self.device)
+
+
+MACS = [f"AA:BB:CC:DD:EE:{i:02X}" for i in range(6)]
+
+
+def _provisioner(tmp_path, failures: dict, **kwargs):
+    active = []
+    peak = [0]
+    transports = {}
+
+    def transport(device):
+        if device not in transports:
+            transports[device] = PairingModeTransport(device, failures.get(device, 0), active)
+        return transports[device]
+
+    async def factory(mac):
+        return TionLite(mac, transport=transport)
+
+    async def watch():
+        while True:
+            peak[0] = max(peak[0], len(active))
+            await asyncio.sleep(0.001)
+
+    provisioner = Provisioner(tmp_path / "manifest.json", factory=factory, retry_delay=0.01, **kwargs)
+    return provisioner, peak, watch
+
+
+@pytest.mark.asyncio
+async def test_retries_and_manifest(tmp_path):
+    failures = {MACS[0]: 2, MACS[1]: 10}
+    provisioner, peak, watch = _provisioner(tmp_path, failures, concurrency=2, attempts=3)
+
+    watcher = asyncio.create_task(watch())
+    results = {r.mac: r for r in await provisioner.run(MACS + [MACS[0]])}
+    watcher.cancel()
+    assert len(results) == len(MACS)
+    assert results[MACS[0]].status == PAIRED and results[MACS[0]].attempts == 3
+    assert results[MACS[1]].status == FAILED and "Authentication failed" in results[MACS[1]].error
+    assert all(results[m].status == PAIRED and results[m].attempts == 1 for m in MACS[2:])
+    assert results[MACS[2]].model == "Lite"
+    assert 0 < peak[0] <= 2
+    assert provisioner.summary()["failed"] == 1
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert set(manifest) == set(MACS)
+    assert manifest[MACS[1]]["status"] == FAILED
+    assert {"mac", "model", "time", "error"} <= set(manifest[MACS[1]])
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_paired(tmp_path):
+    provisioner, _, _ = _provisioner(tmp_path, {MACS[1]: 1}, attempts=1)
+    await provisioner.run(MACS[:3])
+
+    provisioner, _, _ = _provisioner(tmp_path, {}, attempts=1)
+    results = await provisioner.run(MACS[:3])
+    assert [r.mac for r in results] == [MACS[1]]
+    assert Manifest(tmp_path / "manifest.json").paired(MACS[1])
+
+
+@pytest.mark.asyncio
+async def test_stream(tmp_path):
+    provisioner, _, _ = _provisioner(tmp_path, {})
+
+    async def stream():
+        for mac in MACS[:2] + MACS[:2]:
+            await asyncio.sleep(0)
+            yield mac
+
+    results = await provisioner.run(stream())
+    assert sorted(r.mac for r in results) == MACS[:2]
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from tion_btle.reconcile import Reconciler, drift
+from tests.unit.helpers import STATE, FakeTion
+
+
+@pytest.mark.parametrize("desired, expected", [
+    ({"fan_speed": 2, "heater_temp": 20}, {}),
+    ({"fan_speed": 4, "heater_temp": 20}, {"fan_speed": 4}),
+    ({"fan_speed": 0}, {"state": "off"}),
+])
+def test_drift(desired, expected):
+    assert drift(desired, STATE) == expected
+
+
+@pytest.mark.asyncio
+async def test_writes_only_drifted_fields():
+    tion = FakeTion(dict(STATE))
+    reconciler = Reconciler(tion, {"fan_speed": 4, "heater_temp": 20, "mode": "outside"})
+
+    assert await reconciler.check() == {"fan_speed": 4}
+    assert not reconciler.converged
+    assert await reconciler.check() == {}
+    assert reconciler.converged
+    assert tion.writes == [{"fan_speed": 4}]
+
+    stats = reconciler.stats.as_dict()
+    assert stats["checks"] == 2
+    assert stats["writes"] == 1
+    assert stats["fields_written"] == 1
+    assert stats["convergences"] == 1
+
+
+@pytest.mark.asyncio
+async def test_backoff():
+    reconciler = Reconciler(FakeTion(dict(STATE), fail_writes=10), {"fan_speed": 4}, min_backoff=1, max_backoff=5)
+    reconciler.start()
+    await asyncio.sleep(0.01)
+    assert reconciler.stats.failures == 1
+    assert reconciler.next_delay == 1
+
+    reconciler._failures = 4
+    assert reconciler.next_delay == 5
+    await reconciler.stop()
+    assert not reconciler.running
+
+
+@pytest.mark.asyncio
+async def test_background_loop():
+    tion = FakeTion(dict(STATE), fail_writes=1)
+    reconciler = Reconciler(tion, {"fan_speed": 4}, interval=10, min_backoff=0.01)
+    reconciler.start()
+    await asyncio.sleep(0.1)
+    assert reconciler.converged
+    assert tion.writes == [{"fan_speed": 4}]
+
+    # manual change from remote control is fixed on the next check
+    tion.state["fan_speed"] = 1
+    reconciler.update({"heater": "off"})
+    await asyncio.sleep(0.1)
+    assert tion.writes[1:] == [{"fan_speed": 4, "heater": "off"}]
+    assert reconciler.stats.convergences == 2
+    await reconciler.stop()
+
+
+class BrokenTion(FakeTion):
+    broken = True
+
+    async def get(self, priority=None, timeout=None) -> dict:
+        if self.broken:
+            self.broken = False
+            raise ValueError("Unexpected response")
+        return await super().get(priority, timeout)
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_does_not_stop_loop():
+    tion = BrokenTion(dict(STATE))
+    reconciler = Reconciler(tion, {"fan_speed": 4}, min_backoff=0.01)
+    reconciler.start()
+    await asyncio.sleep(0.1)
+    assert reconciler.running
+    assert reconciler.stats.failures == 1
+    assert reconciler.converged
+    assert tion.writes == [{"fan_speed": 4}]
+    await reconciler.stop()
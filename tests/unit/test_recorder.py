@@ -0,0 +1,55 @@
+import pytest
+
+from tion_btle.recorder import FlightRecorder
+from tion_btle.s3 import TionS3
+from tion_btle.tion import TionException
+from tests.unit.test_tion import _mock_btle
+
+
+def test_record_and_dump():
+    recorder = FlightRecorder(size=4, slot_size=4)
+    recorder.record(FlightRecorder.WRITE, bytearray([1, 2]))
+    recorder.record(FlightRecorder.NOTIFY, bytes([3, 4, 5, 6, 7, 8]))
+
+    frames = recorder.dump()
+
+    assert [f["kind"] for f in frames] == ["write", "notify"]
+    assert [f["data"] for f in frames] == ["0102", "03040506"]
+    assert frames[1]["length"] == 6
+    assert frames[0]["time"] <= frames[1]["time"]
+
+
+def test_ring_is_bounded():
+    recorder = FlightRecorder(size=3, slot_size=1)
+    for i in range(5):
+        recorder.record(FlightRecorder.WRITE, bytes([i]))
+
+    assert len(recorder) == 3
+    assert recorder.total == 5
+    assert [f["data"] for f in recorder.dump()] == ["02", "03", "04"]
+
+    recorder.clear()
+    assert recorder.dump() == []
+    assert recorder.format() == "no frames"
+
+
+def test_format():
+    recorder = FlightRecorder(size=2, slot_size=2)
+    recorder.record(FlightRecorder.WRITE, bytes([0xab, 0xcd, 0xef]))
+
+    assert recorder.format().endswith("write  abcd...")
+
+
+@pytest.mark.asyncio
+async def test_tion_dumps_record_on_failure():
+    tion = TionS3(mac="")
+    tion._latency.initial_timeout = 0.01
+    btle = _mock_btle(tion)
+    btle.write.side_effect = lambda *args: tion._delegation.handleNotification(0, bytearray([0xb3]))
+
+    with pytest.raises(TionException) as e:
+        await tion.get()
+
+    kinds = [f["kind"] for f in e.value.flight_record]
+    assert kinds[:2] == ["write", "notify"]
+    assert e.value.flight_record[0]["data"] == bytes(tion.command_getStatus).hex()
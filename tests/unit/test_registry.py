@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import unittest.mock as mock
+
+import pytest
+from bleak.backends.device import BLEDevice
+
+from tion_btle.registry import DeviceRegistry
+from tion_btle.lite import TionLite
+from tion_btle.s3 import TionS3
+from tion_btle.transport import FakeTransport, LiteResponder
+from tests.unit.helpers import advertisement
+
+MAC = "AA:BB:CC:DD:EE:FF"
+
+
+def test_update_and_get():
+    registry = DeviceRegistry()
+    device = BLEDevice(MAC.lower(), "breezer", None)
+    registry.update(device, advertisement(rssi=-42))
+
+    assert registry.get(MAC) is device
+    assert registry.rssi(MAC) == -42
+    assert MAC in registry
+
+
+def test_only_watched_devices_are_kept():
+    registry = DeviceRegistry(macs=[MAC])
+    registry.update(BLEDevice("11:22:33:44:55:66", "other", None), advertisement())
+    registry.update(BLEDevice(MAC, "breezer", None), advertisement())
+
+    assert len(registry) == 1
+    assert registry.get("11:22:33:44:55:66") is None
+
+
+def test_old_devices_are_ignored():
+    registry = DeviceRegistry(max_age=10)
+    with mock.patch("tion_btle.registry.monotonic", return_value=100):
+        registry.update(BLEDevice(MAC, "breezer", None), advertisement())
+    with mock.patch("tion_btle.registry.monotonic", return_value=111):
+        assert registry.get(MAC) is None
+
+
+def test_tion_uses_device_from_registry():
+    registry = DeviceRegistry(macs=["11:22:33:44:55:66"])
+    tion = TionS3(MAC, registry=registry)
+    device = BLEDevice(MAC, "breezer", None)
+    registry.update(device, advertisement())
+
+    with mock.patch("tion_btle.transport.BleakClient") as client:
+        tion.set_new_btle_device()
+        tion._btle
+        client.assert_called_once_with(device)
+
+        # same device is not replaced again
+        tion.set_new_btle_device()
+        tion._btle
+        client.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_start_stop():
+    with mock.patch("tion_btle.registry.BleakScanner") as scanner:
+        scanner.return_value.start = mock.AsyncMock()
+        scanner.return_value.stop = mock.AsyncMock()
+
+        async with DeviceRegistry(adapter="hci1") as registry:
+            assert registry.running
+            scanner.assert_called_once_with(detection_callback=registry.update, adapter="hci1")
+
+        scanner.return_value.stop.assert_awaited_once()
+        assert not registry.running
+
+
+@pytest.mark.asyncio
+async def test_registry_update_while_connected():
+    registry = DeviceRegistry(macs=[MAC])
+    registry.update(BLEDevice(MAC, "breezer", None), advertisement())
+    transports = []
+
+    def transport(device):
+        transports.append(FakeTransport(device, LiteResponder()))
+        return transports[-1]
+
+    tion = TionLite(MAC, registry=registry, transport=transport)
+    await tion.get()
+    await tion.connect()
+    newer = BLEDevice(MAC, "breezer", None)
+    registry.update(newer, advertisement(rssi=-30))
+    await tion.get()
+    await tion.disconnect()
+
+    await tion.set({"fan_speed": 2})
+    assert transports[-1].device is newer
+    assert tion.connection_status == "disc"
@@ -0,0 +1,124 @@
+import asyncio
+import datetime
+
+import pytest
+
+from tion_btle.clock import Clock, run_virtual, set_clock
+from tion_btle.lite import TionLite
+from tion_btle.scheduler import MISSED, OK, Action, Scheduler, Step, daily, once, ramp
+from tion_btle.transport import FakeTransport, LiteResponder
+
+START = datetime.datetime(2026, 1, 5, 6, 59).timestamp()
+"""Monday, one minute before the program"""
+CONNECT_TIME = 5
+
+
+class WallClock(Clock):
+    """Wall clock that follows virtual loop time"""
+
+    def time(self) -> float:
+        return START + self.monotonic()
+
+
+class SlowTransport(FakeTransport):
+    connects = 0
+
+    async def connect(self) -> bool:
+        SlowTransport.connects += 1
+        await asyncio.sleep(CONNECT_TIME)
+        return await super().connect()
+
+
+@pytest.fixture
+def wall_clock():
+    SlowTransport.connects = 0
+    previous = set_clock(WallClock())
+    yield
+    set_clock(previous)
+
+
+def _tion(mac: str = "AA:BB:CC:DD:EE:01") -> TionLite:
+    return TionLite(mac, transport=lambda device: SlowTransport(device, LiteResponder()))
+
+
+def test_triggers():
+    monday = daily("07:00")
+    assert monday(START) == START + 60
+    assert monday(START + 60) == START + 60 + 24 * 3600
+    assert daily("07:00", days=[2])(START) == START + 60 + 2 * 24 * 3600
+    assert once(START + 10)(START) == START + 10
+    assert once(START + 10)(START + 10) is None
+    with pytest.raises(ValueError):
+        daily("7")
+
+
+def test_ramp():
+    assert ramp("fan_speed", 1, 4, 600) == [Step(0, {"fan_speed": 1}), Step(200, {"fan_speed": 2}),
+                                             Step(400, {"fan_speed": 3}), Step(600, {"fan_speed": 4})]
+    assert ramp("heater_temp", 20, 10, 60, steps=3) == [Step(0, {"heater_temp": 20}), Step(30, {"heater_temp": 15}),
+                                                          Step(60, {"heater_temp": 10})]
+    assert ramp("fan_speed", 1, 4, 600, steps=1) == [Step(0, {"fan_speed": 4})]
+
+
+def test_ramp_in_held_session(wall_clock):
+    async def main():
+        group = [_tion(), _tion("AA:BB:CC:DD:EE:02")]
+        scheduler = Scheduler([Action("morning", group, daily("07:00"), ramp("fan_speed", 1, 4, 600))],
+                              preconnect=30)
+        scheduler.start()
+        await asyncio.sleep(60 + 600 + 1)
+        await scheduler.stop()
+        return scheduler, group
+
+    scheduler, group = run_virtual(main())
+    assert len(scheduler.records) == 8
+    assert all(r.status == OK and r.preconnected and r.late < 1 for r in scheduler.records)
+    assert [r.due - START for r in scheduler.records if r.mac == group[0].mac] == [60, 260, 460, 660]
+    # single connection of each device for the whole ramp
+    assert SlowTransport.connects == 2
+    assert [tion.fan_speed for tion in group] == [4, 4]
+    assert all(tion.connection_status == "disc" for tion in group)
+    assert scheduler.summary()["morning"][OK] == 8
+
+
+def test_cold_write_is_late(wall_clock):
+    async def main():
+        scheduler = Scheduler(preconnect=0)
+        return await scheduler.run_action(Action("night", _tion(), once(START + 60), {"heater_temp": 15}), START + 60)
+
+    [record] = run_virtual(main())
+    assert record.status == OK and not record.preconnected
+    assert record.late >= CONNECT_TIME
+
+
+def test_missed_steps(wall_clock):
+    async def main():
+        scheduler = Scheduler(misfire=60)
+        action = Action("morning", _tion(), once(START - 3600), ramp("fan_speed", 1, 4, 3600 + 300, steps=2))
+        return await scheduler.run_action(action, START - 3600)
+
+    records = run_virtual(main())
+    assert [r.status for r in records] == [MISSED, OK]
+    assert SlowTransport.connects == 1
+
+
+def test_link_lost_in_held_session(wall_clock):
+    async def main():
+        tion = _tion()
+        scheduler = Scheduler([Action("morning", tion, daily("07:00"), ramp("fan_speed", 1, 4, 600))], preconnect=30)
+        scheduler.start()
+        # between the first and the second step of the ramp
+        await asyncio.sleep(60 + 100)
+        await tion._transport.disconnect()
+        await asyncio.sleep(600)
+        await scheduler.stop()
+        return scheduler, tion
+
+    scheduler, tion = run_virtual(main())
+    assert [r.status for r in scheduler.records] == [OK] * 4
+    # the step after the drop waits for reconnect, the next ones use restored connection
+    assert scheduler.records[1].late >= CONNECT_TIME
+    assert all(r.late < 1 for r in (scheduler.records[0], scheduler.records[2], scheduler.records[3]))
+    assert SlowTransport.connects == 2
+    assert tion.fan_speed == 4
+    assert tion.connection_status == "disc"
@@ -0,0 +1,111 @@
+import multiprocessing
+import uuid
+
+import pytest
+
+from tion_btle.shared_state import SharedStateTable, StatePublisher, SEQ, HEADER
+from tion_btle.tion import TionException
+from tests.unit.helpers import STATE, FakeTion
+
+MAC = "AA:BB:CC:DD:EE:FF"
+LITE_STATE = {**STATE, "in_temp": 18, "out_temp": -5, "filter_remain": 120.5, "request_error_code": 0,
+              "light": "on", "co2_auto_control": "0", "filter_change_required": "0", "electronic_temp": 30,
+              "heating": "off", "sound": "on"}
+
+
+@pytest.fixture
+def table():
+    with SharedStateTable.create(f"tion-test-{uuid.uuid4().hex[:8]}", slots=4) as table:
+        yield table
+
+
+def test_publish_and_read(table):
+    table.publish(MAC, "Lite", LITE_STATE, timestamp=100)
+
+    reader = SharedStateTable.attach(table.name)
+    state = reader.read(MAC.lower())
+    reader.close()
+
+    assert state == {**LITE_STATE, "model": "Lite", "updated": 100,
+                     "co2_auto_control": "off", "filter_change_required": "off"}
+
+
+def test_model_specific_fields(table):
+    table.publish(MAC, "S3", {**STATE, "productivity": 40})
+    state = table.read(MAC)
+    assert state["productivity"] == 40
+    assert "light" not in state and "electronic_temp" not in state
+
+
+def test_slots(table):
+    macs = [f"AA:BB:CC:DD:EE:{i:02X}" for i in range(4)]
+    for i, mac in enumerate(macs):
+        table.publish(mac, "S4", {**STATE, "fan_speed": i})
+    table.publish(macs[1], "S4", {**STATE, "fan_speed": 5})
+
+    assert table.read("11:22:33:44:55:66") is None
+    assert {mac: s["fan_speed"] for mac, s in table.read_all().items()} == dict(zip(macs, [0, 5, 2, 3]))
+    with pytest.raises(TionException):
+        table.publish("11:22:33:44:55:66", "S4", STATE)
+
+
+def test_read_during_write(table):
+    table.publish(MAC, "S4", STATE)
+    offset = HEADER.size
+    seq = SEQ.unpack_from(table._shm.buf, offset)[0]
+    SEQ.pack_into(table._shm.buf, offset, seq + 1)
+    with pytest.raises(TionException):
+        table.read(MAC)
+
+    SEQ.pack_into(table._shm.buf, offset, seq + 2)
+    assert table.read(MAC)["fan_speed"] == STATE["fan_speed"]
+
+
+def test_not_a_table():
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(create=True, size=64)
+    try:
+        with pytest.raises(TionException):
+            SharedStateTable.attach(shm.name)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _read_in_child(name, queue):
+    with SharedStateTable.attach(name) as table:
+        queue.put(table.read(MAC)["fan_speed"])
+
+
+def test_other_process(table):
+    table.publish(MAC, "S4", STATE)
+    queue = multiprocessing.get_context("spawn").Queue()
+    process = multiprocessing.get_context("spawn").Process(target=_read_in_child, args=(table.name, queue))
+    process.start()
+    process.join(30)
+    assert queue.get(timeout=1) == STATE["fan_speed"]
+    # reader exit must not remove the segment
+    assert table.read(MAC) is not None
+
+
+@pytest.mark.asyncio
+async def test_publisher(table):
+    tion = FakeTion(dict(STATE))
+    tion.model = "S4"
+    publisher = StatePublisher(table, [tion])
+    assert await publisher.publish_once() == 1
+    assert table.read(tion.mac)["model"] == "S4"
+
+
+@pytest.mark.asyncio
+async def test_publisher_with_full_table():
+    tions = [FakeTion(dict(STATE)) for _ in range(2)]
+    tions[1].mac = "AA:BB:CC:DD:EE:01"
+    for tion in tions:
+        tion.model = "Lite"
+    with SharedStateTable.create(f"tion-test-{uuid.uuid4().hex[:8]}", slots=1) as table:
+        publisher = StatePublisher(table, tions)
+        assert await publisher.publish_once() == 1
+        assert await publisher.publish_once() == 1
+        assert publisher.dropped == {tions[1].mac}
+        assert table.read(tions[0].mac) is not None
@@ -0,0 +1,84 @@
+import time
+import unittest.mock as mock
+
+import pytest
+
+from tion_btle.s3 import TionS3
+from tion_btle.snapshot import SnapshotStore
+from tests.unit.test_tion import _mock_btle
+
+MAC = "AA:BB:CC:DD:EE:FF"
+S3_RESPONSE = bytearray([0xb3, 0x10, 0x24, 0x14, 0x03, 0x00, 0x15, 0x14, 0x14, 0x8f, 0x00, 0x0c, 0x0a, 0x00, 0x4b, 0x0a,
+                         0x00, 0x33, 0x00, 0x5a])
+
+
+def test_record_and_load(tmp_path):
+    path = tmp_path / "state.json"
+    store = SnapshotStore(path, save_interval=0)
+    store.record(MAC.lower(), "S3", {"fan_speed": 4}, {"address": MAC, "name": "breezer"})
+
+    snapshot = SnapshotStore(path).get(MAC)
+    assert snapshot.model == "S3"
+    assert snapshot.state == {"fan_speed": 4}
+    assert snapshot.device["name"] == "breezer"
+    assert not snapshot.stale
+
+
+def test_save_interval(tmp_path):
+    path = tmp_path / "state.json"
+    store = SnapshotStore(path, save_interval=3600)
+    store.record(MAC, "S3", {"fan_speed": 1})
+    store.record(MAC, "S3", {"fan_speed": 2})
+    assert SnapshotStore(path).get(MAC).state == {"fan_speed": 1}
+
+    store.flush()
+    assert SnapshotStore(path).get(MAC).state == {"fan_speed": 2}
+
+
+def test_stale(tmp_path):
+    store = SnapshotStore(tmp_path / "state.json", max_age=60)
+    with mock.patch("tion_btle.snapshot.time.time", return_value=time.time() - 61):
+        store.record(MAC, "S3", {})
+    assert store.get(MAC).stale
+    assert store.get(MAC).age >= 61
+
+
+def test_refresh_schedule(tmp_path):
+    store = SnapshotStore(tmp_path / "state.json")
+    with mock.patch("tion_btle.snapshot.time.time", return_value=time.time() - 100):
+        store.record("00:00:00:00:00:01", "S3", {})
+    store.record("00:00:00:00:00:02", "S3", {})
+
+    schedule = store.refresh_schedule(["00:00:00:00:00:02", "00:00:00:00:00:01", "00:00:00:00:00:03"], period=30)
+
+    assert schedule == [("00:00:00:00:00:03", 0), ("00:00:00:00:00:01", 10), ("00:00:00:00:00:02", 20)]
+
+
+@pytest.mark.asyncio
+async def test_tion_uses_snapshot(tmp_path):
+    store = SnapshotStore(tmp_path / "state.json")
+    store.record(MAC, "S3", {"fan_speed": 3, "model": "S3"})
+    tion = TionS3(MAC, snapshots=store)
+    btle = _mock_btle(tion)
+
+    state = await tion.get(skip_update=True)
+
+    assert state["fan_speed"] == 3
+    assert state["stale"] is False
+    btle.connect.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_tion_records_snapshot(tmp_path):
+    store = SnapshotStore(tmp_path / "state.json")
+    tion = TionS3(MAC, snapshots=store)
+    btle = _mock_btle(tion)
+    btle.write.side_effect = lambda *args: tion._delegation.handleNotification(0, S3_RESPONSE)
+
+    await tion.get()
+    store.flush()
+
+    snapshot = SnapshotStore(tmp_path / "state.json").get(MAC)
+    assert snapshot.model == "S3"
+    assert snapshot.state["fan_speed"] == 4
+    assert snapshot.device["address"] == MAC
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import unittest.mock as mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tion_btle.s3 import TionS3
+from tion_btle.sync import LoopThread, SyncTion
+from tests.unit.test_snapshot import MAC, S3_RESPONSE
+from tests.unit.test_tion import _mock_btle
+
+
+@pytest.fixture
+def loop():
+    loop = LoopThread()
+    yield loop
+    loop.stop(timeout=5)
+
+
+def _device(loop: LoopThread) -> SyncTion:
+    device = SyncTion(TionS3, MAC, loop=loop)
+    _mock_btle(device.tion)
+    device.tion._get_data_from_breezer = mock.AsyncMock(return_value=S3_RESPONSE)
+    return device
+
+
+def test_get_from_threads(loop):
+    device = _device(loop)
+    with ThreadPoolExecutor(8) as pool:
+        states = list(pool.map(lambda _: device.get(), range(16)))
+
+    assert all(s["fan_speed"] == states[0]["fan_speed"] for s in states)
+    assert device.mac == MAC
+    assert device.tion._btle.connect.await_count <= 16
+
+
+def test_set(loop):
+    device = _device(loop)
+    device.set({"fan_speed": 3})
+    assert device.fan_speed == 3
+    # state request and new settings
+    assert device.tion._btle.write.await_count == 2
+
+
+def test_session_keeps_connection(loop):
+    device = _device(loop)
+    with device.session():
+        device.get()
+        device.get()
+    assert device.tion._btle.connect.await_count == 1
+    assert device.connection_status == "disc"
+
+
+def test_instances_share_loop(loop):
+    devices = [SyncTion(TionS3, f"AA:BB:CC:DD:EE:{i:02X}", loop=loop) for i in range(2)]
+    loops = [loop.call(asyncio.get_running_loop) for _ in devices]
+    assert loops[0] is loops[1] is loop.loop
+
+
+def test_blocking_call_in_loop_thread(loop):
+    async def nested():
+        return loop.run(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError):
+        loop.run(nested())
+
+
+def test_stop(loop):
+    loop.start()
+    thread = loop._thread
+    loop.stop(timeout=5)
+    assert not thread.is_alive()
+    assert not loop.running
+    assert threading.current_thread() is threading.main_thread()
@@ -1,3 +1,4 @@
+import asyncio
 import time
 import pytest
 import unittest.mock as mock
@@ -5,15 +6,16 @@ import unittest.mock as mock
 from bleak import exc
 
 import tion_btle.tion
+from tion_btle import clock
+from tion_btle.clock import run_virtual
 from tion_btle.tion import Tion
 from tion_btle.lite import TionLiteFamily
 from tion_btle.lite import TionLite
 from tion_btle.s3 import TionS3
 from tion_btle.s4 import TionS4
-from tion_btle.tion import retry, MaxTriesExceededError
+from tion_btle.tion import retry, Deadline, MaxTriesExceededError, TionTimeoutError
 
 
-@pytest.mark.asyncio
 @pytest.mark.parametrize(
     "retries, repeats, succeed_run, t_delay",
     [
@@ -24,7 +26,7 @@ from tion_btle.tion import retry, MaxTriesExceededError
         pytest.param(2, 2, 1, 2, id="Delay between retries"),
     ]
 )
-async def test_retry(retries: int, repeats: int, succeed_run: int, t_delay: int):
+def test_retry(retries: int, repeats: int, succeed_run: int, t_delay: int):
     class TestRetry:
         count = 0
 
@@ -38,18 +40,23 @@ async def test_retry(retries: int, repeats: int, succeed_run: int, t_delay: int)
             raise exc.BleakError
 
     i = TestRetry()
-    start = time.time()
 
-    if succeed_run < repeats:
-        assert await i.a(_succeed_run=succeed_run) == "expected_result"
-    else:
-        with pytest.raises(MaxTriesExceededError) as c:
-            await i.a(_succeed_run=succeed_run)
+    async def run() -> float:
+        start = clock.monotonic()
+        if succeed_run < repeats:
+            assert await i.a(_succeed_run=succeed_run) == "expected_result"
+        else:
+            with pytest.raises(MaxTriesExceededError) as c:
+                await i.a(_succeed_run=succeed_run)
+        return clock.monotonic() - start
 
-    end = time.time()
+    # delays are virtual: test takes no real time
+    real_start = time.monotonic()
+    elapsed = run_virtual(run())
 
     assert i.count == repeats
-    assert end - start >= t_delay
+    assert elapsed >= t_delay
+    assert time.monotonic() - real_start < 1
 
 
 class TestLogLevels:
@@ -125,3 +132,174 @@ def test_mac(instance):
     target = 'foo'
     t_tion = instance(target)
     assert t_tion.mac == target
+
+
+def _mock_btle(tion: Tion, connect_delay: float = 0) -> mock.MagicMock:
+    btle = mock.MagicMock()
+    btle.is_connected = False
+
+    async def _connect():
+        await asyncio.sleep(connect_delay)
+        btle.is_connected = True
+        return True
+
+    async def _disconnect():
+        btle.is_connected = False
+        return True
+
+    btle.connect = mock.AsyncMock(side_effect=_connect)
+    btle.disconnect = mock.AsyncMock(side_effect=_disconnect)
+    btle.subscribe = mock.AsyncMock()
+    btle.write = mock.AsyncMock()
+    tion._btle = btle
+    return btle
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "connect_delay, timeout, phase",
+    [
+        pytest.param(10, 0.1, "connect", id="slow connect"),
+        pytest.param(0, 0.1, "get", id="no response"),
+    ]
+)
+async def test_get_timeout(connect_delay: float, timeout: float, phase: str):
+    tion = TionS3(mac="")
+    btle = _mock_btle(tion, connect_delay=connect_delay)
+
+    start = time.monotonic()
+    with pytest.raises(TionTimeoutError):
+        await tion.get(timeout=timeout)
+    await asyncio.sleep(0)
+
+    assert time.monotonic() - start < timeout + 0.5
+    assert tion._Tion__connections_count == 0
+    assert not btle.is_connected
+    btle.disconnect.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_get_closes_connection():
+    tion = TionS3(mac="")
+    btle = _mock_btle(tion)
+
+    task = asyncio.create_task(tion.get())
+    await asyncio.sleep(0.05)
+    assert btle.is_connected
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # running request is cancelled by the queue when nobody waits for it
+    await asyncio.sleep(0.01)
+
+    assert tion._Tion__connections_count == 0
+    assert not btle.is_connected
+
+
+@pytest.mark.asyncio
+async def test_get_response_within_timeout():
+    tion = TionS3(mac="")
+    btle = _mock_btle(tion)
+    response = bytearray([0xb3, 0x10, 0x24, 0x14, 0x03, 0x00, 0x15, 0x14, 0x14, 0x8f, 0x00, 0x0c, 0x0a, 0x00, 0x4b,
+                          0x0a, 0x00, 0x33, 0x00, 0x5a])
+    btle.write.side_effect = lambda *args: tion._delegation.handleNotification(0, response)
+
+    result = await tion.get(timeout=1)
+
+    assert result["fan_speed"] == 4
+    assert tion._Tion__connections_count == 0
+
+
+def test_deadline():
+    assert Deadline().remaining is None
+    assert Deadline().budget(0.5) is None
+
+    deadline = Deadline(10)
+    assert 9 < deadline.remaining <= 10
+    assert 4 < deadline.budget(0.5) <= 5
+
+    later = Deadline(20)
+    deadline.extend(later)
+    assert deadline.expires_at == later.expires_at
+    deadline.extend(Deadline())
+    assert deadline.remaining is None
+
+
+@pytest.mark.asyncio
+async def test_lost_response_is_resent():
+    tion = TionS3(mac="")
+    btle = _mock_btle(tion)
+    response = bytearray([0xb3, 0x10, 0x24, 0x14, 0x03, 0x00, 0x15, 0x14, 0x14, 0x8f, 0x00, 0x0c, 0x0a, 0x00, 0x4b,
+                          0x0a, 0x00, 0x33, 0x00, 0x5a])
+    for _ in range(tion._latency.min_samples):
+        tion._latency.add(0.01)
+
+    writes = []
+
+    def _answer_second_request(*args):
+        writes.append(args)
+        if len(writes) > 1:
+            tion._delegation.handleNotification(0, response)
+
+    btle.write.side_effect = _answer_second_request
+
+    start = time.monotonic()
+    result = await tion.get(timeout=5)
+
+    assert result["fan_speed"] == 4
+    assert len(writes) == 2
+    assert time.monotonic() - start < 1
+    assert tion.latency_stats["timeouts"] == 1
+
+
+def test_idle_device_is_small():
+    import tracemalloc
+
+    with mock.patch("tion_btle.transport.BleakClient") as client:
+        macs = [f"AA:BB:CC:DD:{i >> 8:02X}:{i & 0xFF:02X}" for i in range(500)]
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        devices = [TionLite(mac) for mac in macs]
+        size = (tracemalloc.get_traced_memory()[0] - before) / len(devices)
+        tracemalloc.stop()
+
+    client.assert_not_called()
+    assert size < 1500
+    # all state is in slots
+    for model in (TionLite, TionS3, TionS4):
+        assert vars(model(macs[0])) == {}
+
+
+@pytest.mark.asyncio
+async def test_transport_is_released_after_disconnect():
+    transports = []
+
+    def transport(device):
+        transports.append(mock.MagicMock(is_connected=False))
+        btle = transports[-1]
+
+        async def _connect():
+            btle.is_connected = True
+            return True
+
+        async def _disconnect():
+            btle.is_connected = False
+            return True
+
+        btle.connect = mock.AsyncMock(side_effect=_connect)
+        btle.disconnect = mock.AsyncMock(side_effect=_disconnect)
+        btle.subscribe = mock.AsyncMock()
+        return btle
+
+    tion = TionS3(mac="", transport=transport)
+    assert tion.connection_status == "disc" and not transports
+
+    await tion.connect()
+    assert len(transports) == 1 and tion.connection_status == "connected"
+    await tion.disconnect()
+    assert tion._transport is None
+
+    await tion.connect()
+    await tion.disconnect()
+    assert len(transports) == 2
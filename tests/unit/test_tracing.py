@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+
+from tion_btle import tracing
+from tion_btle.latency import LatencyTracker
+from tion_btle.lite import TionLite
+from tion_btle.tracing import JsonLinesExporter, ProfileHook, Tracer
+from tion_btle.transport import FakeTransport, LiteResponder
+
+MAC = "AA:BB:CC:DD:EE:01"
+
+
+def _tion(tracer: Tracer) -> TionLite:
+    return TionLite(MAC, transport=lambda device: FakeTransport(device, LiteResponder()), tracer=tracer)
+
+
+@pytest.mark.asyncio
+async def test_spans_of_get():
+    spans = []
+    tion = _tion(Tracer(spans.append))
+    await tion.get()
+
+    root = spans[-1]
+    assert root.name == "get" and root.parent_id is None
+    assert root.attributes["device"] == MAC and root.attributes["model"] == "Lite"
+    assert root.attributes["queue_wait"] >= 0
+    names = [s.name for s in spans]
+    for name in ("_try_connect", "_enable_notifications", "_try_write", "wait_response", "_decode_response"):
+        assert name in names
+    assert all(s.trace_id == root.trace_id for s in spans)
+    assert all(s.parent_id is not None for s in spans[:-1])
+    write = next(s for s in spans if s.name == "_try_write")
+    assert write.attributes["attempt"] == 1 and write.attributes["bytes"] > 0
+    assert next(s for s in spans if s.name == "wait_response").attributes["packets"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_failed_span_and_concurrent_traces():
+    spans = []
+    tracer = Tracer(spans.append)
+    broken = TionLite("AA:BB:CC:DD:EE:02", transport=lambda device: FakeTransport(device), tracer=tracer)
+    broken._latency = LatencyTracker(initial_timeout=0.05, max_timeout=0.05)
+    broken.response_retries = 0
+
+    results = await asyncio.gather(_tion(tracer).get(), broken.get(), return_exceptions=True)
+    assert isinstance(results[1], Exception)
+
+    roots = [s for s in spans if s.parent_id is None]
+    assert sorted(r.status for r in roots) == ["error", "ok"]
+    by_id = {s.span_id: s for s in spans}
+    for s in spans:
+        if s.parent_id is not None:
+            assert by_id[s.parent_id].trace_id == s.trace_id
+    failed = next(r for r in roots if r.status == "error")
+    assert failed.attributes["device"] == broken.mac and "TionException" in failed.error
+    assert tracer.stats["errors"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_untraced_device_records_nothing():
+    tion = _tion(None)
+    await tion.get()
+    assert tracing.current_span() is None
+    assert tracing.span("x") is tracing.NULL_SPAN
+
+
+@pytest.mark.asyncio
+async def test_json_lines_and_profile(tmp_path):
+    exporter = JsonLinesExporter(tmp_path / "spans.jsonl")
+    hook = ProfileHook(tmp_path / "profiles", operations=2, memory=True)
+    tion = _tion(Tracer(exporter, profile=hook))
+    for _ in range(3):
+        await tion.get()
+    exporter.close()
+
+    lines = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    assert {"name", "trace_id", "span_id", "parent_id", "duration", "attributes"} <= set(lines[0])
+    assert len([s for s in lines if s["parent_id"] is None]) == 3
+
+    assert hook.done and not hook.active
+    assert sorted(p.name.split(".", 1)[1] for p in hook.saved) == ["memory.txt", "prof"]
+    assert all(p.stat().st_size > 0 for p in hook.saved)
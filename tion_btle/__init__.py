@@ -2,3 +2,21 @@ from .s3 import TionS3
 from .lite import TionLite
 from .s4 import TionS4
 from .tion import Tion
+from .command_queue import Priority
+from .registry import DeviceRegistry
+from .factory import create_tion, detect_model, ModelCache
+from .snapshot import SnapshotStore
+from .recorder import FlightRecorder
+from .capture import CaptureWriter, CaptureReader
+from .history import HistoryStore
+from .reconcile import Reconciler
+from .shared_state import SharedStateTable, StatePublisher
+from .gateway import Gateway
+from .adapters import AdapterPool
+from .transport import Transport, BleakTransport
+from .bridge import BridgeClient, ProxyServer
+from .sync import SyncTion
+from .provision import Provisioner
+from .tracing import Tracer
+from .monitor import Monitor
+from .scheduler import Scheduler
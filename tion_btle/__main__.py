@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from typing import List
+
+if __package__ == "":
+    from tion_btle.bridge import DEFAULT_PROXY_PORT, BridgeClient, ProxyServer
+    from tion_btle.factory import MODELS, ModelCache, create_tion
+    from tion_btle.gateway import DEFAULT_PORT, Gateway
+    from tion_btle.monitor import Monitor
+    from tion_btle.provision import Provisioner, scan
+    from tion_btle.registry import DeviceRegistry
+    from tion_btle.tion import Tion
+    from tion_btle.tracing import Tracer
+    from tion_btle.transport import BleakTransport, FakeTransport, LiteResponder, TransportFactory
+else:
+    from .bridge import DEFAULT_PROXY_PORT, BridgeClient, ProxyServer
+    from .factory import MODELS, ModelCache, create_tion
+    from .gateway import DEFAULT_PORT, Gateway
+    from .monitor import Monitor
+    from .provision import Provisioner, scan
+    from .registry import DeviceRegistry
+    from .tion import Tion
+    from .tracing import Tracer
+    from .transport import BleakTransport, FakeTransport, LiteResponder, TransportFactory
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def create_devices(specs: List[str], cache: str | None = None, registry: DeviceRegistry | None = None,
+                         transport: TransportFactory | None = None, tracer: Tracer | None = None) -> List[Tion]:
+    """
+    Create Tion instances from command line
+    :param specs: MAC or MAC=MODEL
+    :param cache: path of model cache for devices without model
+    :param registry: device registry for new instances
+    :param transport: transport factory for new instances
+    :param tracer: tracer for new instances
+    """
+    model_cache = ModelCache(cache) if cache is not None else None
+    devices = []
+    for spec in specs:
+        mac, _, model = spec.partition("=")
+        if model:
+            if model not in MODELS:
+                raise SystemExit(f"Unknown model {model} for {mac}. Use one of: {', '.join(MODELS)}")
+            devices.append(MODELS[model](mac, registry=registry, transport=transport, tracer=tracer))
+        else:
+            devices.append(await create_tion(mac, cache=model_cache, registry=registry, transport=transport,
+                                             tracer=tracer))
+    return devices
+
+
+def read_specs(path: str) -> List[str]:
+    """
+    Read devices from JSON config: list of "MAC[=MODEL]" strings or {"mac": ..., "model": ...} objects, or object
+    that maps MAC to model (null to detect it)
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    if isinstance(config, dict) and "devices" in config:
+        config = config["devices"]
+    if isinstance(config, dict):
+        config = [{"mac": mac, "model": model} for mac, model in config.items()]
+    if not isinstance(config, list):
+        raise SystemExit(f"{path}: expected list of devices")
+
+    specs = []
+    for item in config:
+        if isinstance(item, dict):
+            specs.append(f"{item['mac']}={item['model']}" if item.get("model") else str(item["mac"]))
+        else:
+            specs.append(str(item))
+    return specs
+
+
+def parse_address(address: str, default_port: int) -> tuple:
+    host, _, port = address.partition(":")
+    return host, int(port) if port else default_port
+
+
+async def serve(args: argparse.Namespace):
+    registry = DeviceRegistry() if args.scan else None
+    bridge = BridgeClient(*parse_address(args.proxy, DEFAULT_PROXY_PORT)) if args.proxy else None
+    if registry is not None:
+        await registry.start()
+    try:
+        devices = await create_devices(args.devices, args.cache, registry, bridge.transport if bridge else None)
+        gateway = Gateway(devices, args.poll, args.timeout)
+        await gateway.start(path=args.socket, host=args.host, port=args.port)
+        await gateway.serve_forever()
+    finally:
+        if registry is not None:
+            await registry.stop()
+        if bridge is not None:
+            await bridge.close()
+
+
+async def proxy(args: argparse.Namespace):
+    if args.fake:
+        def transport(mac: str):
+            return FakeTransport(mac, LiteResponder())
+    else:
+        def transport(mac: str):
+            return BleakTransport(mac, args.adapter)
+
+    server = ProxyServer(transport)
+    await server.start(host=args.host, port=args.port)
+    await server.serve_forever()
+
+
+async def provision(args: argparse.Namespace):
+    provisioner = Provisioner(args.manifest, concurrency=args.concurrency, attempts=args.attempts,
+                              retry_delay=args.retry_delay, pair_timeout=args.timeout,
+                              cache=ModelCache(args.cache) if args.cache else None)
+    candidates = args.devices or scan(args.scan_time, **({"adapter": args.adapter} if args.adapter else {}))
+    for result in await provisioner.run(candidates):
+        print(f"{result.mac} {result.model or '-'} {result.status} attempts={result.attempts}"
+              + (f" error={result.error}" if result.error else ""))
+    print(provisioner.summary())
+
+
+async def monitor(args: argparse.Namespace):
+    specs = args.devices + (read_specs(args.config) if args.config else [])
+    if not specs:
+        raise SystemExit("No devices: give MAC[=MODEL] arguments or --config")
+
+    registry = DeviceRegistry() if args.scan else None
+    bridge = BridgeClient(*parse_address(args.proxy, DEFAULT_PROXY_PORT)) if args.proxy else None
+    # devices are created after monitor: they report retries to its tracer
+    fleet = Monitor([], interval=args.interval, concurrency=args.concurrency, timeout=args.timeout, every=args.every)
+    if registry is not None:
+        await registry.start()
+    try:
+        fleet.devices = await create_devices(specs, args.cache, registry, bridge.transport if bridge else None,
+                                             fleet.tracer)
+        if args.bench:
+            await fleet.bench(args.bench)
+        else:
+            await fleet.run(args.rounds)
+    finally:
+        if registry is not None:
+            await registry.stop()
+        if bridge is not None:
+            await bridge.close()
+
+
+def add_device_arguments(parser: argparse.ArgumentParser, required: bool = True):
+    parser.add_argument("devices", nargs="+" if required else "*", metavar="MAC[=MODEL]",
+                        help=f"breezer MAC, optionally with model ({', '.join(MODELS)}). Model is detected if omitted")
+    parser.add_argument("--cache", help="file for detected models")
+    parser.add_argument("--scan", action="store_true", help="keep fresh devices from background BLE scanner")
+    parser.add_argument("--proxy", metavar="HOST[:PORT]",
+                        help="connect to breezers through remote BLE proxy. Models should be given or cached")
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m tion_btle")
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="serve breezers to local clients over line-delimited JSON")
+    add_device_arguments(serve_parser)
+    serve_parser.add_argument("--socket", help="Unix socket path. TCP is used if not provided")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--poll", type=float, default=60, help="seconds between state polls")
+    serve_parser.add_argument("--timeout", type=float, default=30, help="timeout of breezer requests in seconds")
+    serve_parser.set_defaults(handler=serve)
+
+    proxy_parser = commands.add_parser("proxy", help="serve local Bluetooth adapter to remote clients")
+    proxy_parser.add_argument("--host", default="127.0.0.1", help="address to listen on, 0.0.0.0 for all")
+    proxy_parser.add_argument("--port", type=int, default=DEFAULT_PROXY_PORT)
+    proxy_parser.add_argument("--adapter", help="Bluetooth adapter, for example hci1")
+    proxy_parser.add_argument("--fake", action="store_true", help="use in-memory Lite breezers instead of Bluetooth")
+    proxy_parser.set_defaults(handler=proxy)
+
+    provision_parser = commands.add_parser("provision", help="pair many breezers and write result manifest")
+    provision_parser.add_argument("devices", nargs="*", metavar="MAC", help="breezers to pair. Scan for them if omitted")
+    provision_parser.add_argument("--manifest", default="tion_provision.json",
+                                  help="results file. Devices paired according to it are skipped")
+    provision_parser.add_argument("--cache", help="file for detected models")
+    provision_parser.add_argument("--scan-time", type=float, default=60, help="seconds to scan for new breezers")
+    provision_parser.add_argument("--adapter", help="Bluetooth adapter for scan, for example hci1")
+    provision_parser.add_argument("--concurrency", type=int, default=3, help="devices paired at the same time")
+    provision_parser.add_argument("--attempts", type=int, default=10, help="pair attempts for each device")
+    provision_parser.add_argument("--retry-delay", type=float, default=10, help="seconds between attempts")
+    provision_parser.add_argument("--timeout", type=float, default=30, help="timeout of single attempt in seconds")
+    provision_parser.set_defaults(handler=provision)
+
+    monitor_parser = commands.add_parser("monitor", help="stream state changes and request latency as JSON lines")
+    add_device_arguments(monitor_parser, required=False)
+    monitor_parser.add_argument("--config", help="JSON file with devices, in addition to arguments")
+    monitor_parser.add_argument("--interval", type=float, default=60, help="seconds between polls of each device")
+    monitor_parser.add_argument("--concurrency", type=int, default=4, help="requests made at the same time")
+    monitor_parser.add_argument("--timeout", type=float, default=30, help="timeout of breezer requests in seconds")
+    monitor_parser.add_argument("--every", action="store_true", help="write line for every poll, not only changes")
+    monitor_parser.add_argument("--rounds", type=int, help="stop after this count of polls of each device")
+    monitor_parser.add_argument("--bench", type=int, metavar="N",
+                                help="make N get/set cycles with each device and print latency percentiles")
+    monitor_parser.set_defaults(handler=monitor)
+
+    args = parser.parse_args(argv)
+    # force: handlers installed on import by dependencies must not override -v
+    logging.basicConfig(level=logging.WARNING - 10 * min(args.verbose, 2),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s", force=True)
+    try:
+        asyncio.run(args.handler(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+from typing import Awaitable, Dict, Iterable, List, Set, TypeVar
+
+from bleak import exc
+
+if __package__ == "":
+    from tion_btle.registry import DeviceRegistry
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError
+else:
+    from .registry import DeviceRegistry
+    from .tion import Tion, TionException, MaxTriesExceededError
+
+_LOGGER = logging.getLogger(__name__)
+
+NO_SIGNAL = -127
+"""RSSI of device that was not seen by adapter"""
+
+T = TypeVar("T")
+
+
+class AdapterPool:
+    """
+    Places breezers on several local Bluetooth adapters.
+
+    Device goes to the adapter that hears it best; adapters with RSSI within rssi_margin of the best one are treated
+    as equal and the least loaded of them is used. Device that failed max_failures times in a row on its adapter is
+    moved to another one.
+    """
+
+    def __init__(self, adapters: Iterable[str], capacity: int = 5, rssi_margin: int = 10, max_failures: int = 3,
+                 registries: Dict[str, DeviceRegistry] | None = None):
+        """
+        :param adapters: adapter names, for example ["hci0", "hci1"]
+        :param capacity: how many devices one adapter serves well
+        :param rssi_margin: adapters with RSSI difference less than margin (dBm) are chosen by load
+        :param max_failures: count of failures in a row that moves device to other adapter
+        :param registries: registries with per-adapter scanners (DeviceRegistry(adapter=...)), sources of RSSI
+        """
+        self.adapters: List[str] = list(adapters)
+        if not self.adapters:
+            raise TionException("AdapterPool", "At least one adapter is required")
+        self.capacity = capacity
+        self.rssi_margin = rssi_margin
+        self.max_failures = max_failures
+        self.registries: Dict[str, DeviceRegistry] = registries or {}
+        self._rssi: Dict[str, Dict[str, int]] = {a: {} for a in self.adapters}
+        self._devices: Dict[str, Tion] = {}
+        self._assignments: Dict[str, str] = {}
+        self._failures: Dict[str, int] = {}
+        self._excluded: Dict[str, Set[str]] = {}
+        self._moves: int = 0
+        self._adapter_failures: Dict[str, int] = {a: 0 for a in self.adapters}
+
+    def report_rssi(self, adapter: str, mac: str, rssi: int | None):
+        """Store RSSI of the device seen by adapter, for sources other than registries"""
+        if rssi is not None:
+            self._rssi[adapter][mac.upper()] = rssi
+
+    def rssi(self, mac: str, adapter: str) -> int:
+        registry = self.registries.get(adapter)
+        rssi = registry.rssi(mac) if registry is not None else None
+        if rssi is None:
+            rssi = self._rssi[adapter].get(mac.upper())
+        return NO_SIGNAL if rssi is None else rssi
+
+    def load(self, adapter: str) -> int:
+        """Count of devices on adapter"""
+        return sum(1 for a in self._assignments.values() if a == adapter)
+
+    def choose(self, mac: str) -> str:
+        """
+        Best adapter for the device now
+        :param mac: device MAC
+        :return: adapter name
+        """
+        mac = mac.upper()
+        current = self._assignments.get(mac)
+        excluded = self._excluded.get(mac, set())
+        candidates = [a for a in self.adapters if a not in excluded] or self.adapters
+
+        def load(adapter: str) -> int:
+            # device does not add load to the adapter it is already on
+            return self.load(adapter) - (adapter == current)
+
+        free = [a for a in candidates if load(a) < self.capacity] or candidates
+        best = max(self.rssi(mac, a) for a in free)
+        good = [a for a in free if best - self.rssi(mac, a) < self.rssi_margin]
+        return min(good, key=lambda a: (load(a), -self.rssi(mac, a), a != current))
+
+    def assign(self, tion: Tion) -> str:
+        """
+        Place device on adapter. Adapter is used from the next connection of the device.
+        :return: adapter name
+        """
+        mac = tion.mac.upper()
+        self._devices[mac] = tion
+        adapter = self.choose(mac)
+        old = self._assignments.get(mac)
+        if old is not None and old != adapter:
+            self._moves += 1
+            _LOGGER.info("Moving %s from %s to %s", mac, old, adapter)
+        self._assignments[mac] = adapter
+        tion.adapter = adapter
+        return adapter
+
+    def remove(self, tion: Tion):
+        mac = tion.mac.upper()
+        for d in (self._devices, self._assignments, self._failures, self._excluded):
+            d.pop(mac, None)
+
+    def rebalance(self) -> int:
+        """
+        Move devices whose adapter is not the best choice anymore
+        :return: count of moved devices
+        """
+        moved = 0
+        for mac, tion in list(self._devices.items()):
+            if self.choose(mac) != self._assignments[mac]:
+                self.assign(tion)
+                moved += 1
+        return moved
+
+    def report_success(self, tion: Tion):
+        self._failures[tion.mac.upper()] = 0
+
+    def report_failure(self, tion: Tion):
+        """Count failure of the device. Device is moved to other adapter after max_failures failures in a row"""
+        mac = tion.mac.upper()
+        adapter = self._assignments.get(mac)
+        if adapter is None:
+            return
+        self._adapter_failures[adapter] += 1
+        self._failures[mac] = self._failures.get(mac, 0) + 1
+        if self._failures[mac] < self.max_failures:
+            return
+
+        self._failures[mac] = 0
+        excluded = self._excluded.setdefault(mac, set())
+        excluded.add(adapter)
+        if excluded.issuperset(self.adapters):
+            # device fails everywhere: start over with all adapters except the last one
+            excluded.clear()
+            excluded.add(adapter)
+        _LOGGER.warning("%s failed %d times on %s", mac, self.max_failures, adapter)
+        self.assign(tion)
+
+    async def run(self, tion: Tion, aw: Awaitable[T]) -> T:
+        """
+        Await request to the device and count its result
+        :param tion: device
+        :param aw: request, for example tion.get()
+        :return: request result
+        """
+        if tion.mac.upper() not in self._assignments:
+            self.assign(tion)
+        try:
+            result = await aw
+        except (TionException, MaxTriesExceededError, exc.BleakError, OSError):
+            self.report_failure(tion)
+            raise
+        self.report_success(tion)
+        return result
+
+    def adapter(self, mac: str) -> str | None:
+        return self._assignments.get(mac.upper())
+
+    @property
+    def moves(self) -> int:
+        """Count of device moves between adapters"""
+        return self._moves
+
+    def utilization(self) -> Dict[str, dict]:
+        """Per-adapter report: devices, share of capacity, failures and mean RSSI of its devices"""
+        result = {}
+        for adapter in self.adapters:
+            macs = [m for m, a in self._assignments.items() if a == adapter]
+            signals = [r for r in (self.rssi(m, adapter) for m in macs) if r != NO_SIGNAL]
+            result[adapter] = {
+                "devices": len(macs),
+                "utilization": len(macs) / self.capacity,
+                "failures": self._adapter_failures[adapter],
+                "mean_rssi": sum(signals) / len(signals) if signals else None,
+            }
+        return result
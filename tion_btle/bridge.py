@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import struct
+import uuid
+from typing import Callable, Dict, Tuple
+
+from bleak import exc
+from bleak.backends.device import BLEDevice
+
+if __package__ == "":
+    from tion_btle.transport import DEFAULT_MTU, NotifyCallback, Transport
+else:
+    from .transport import DEFAULT_MTU, NotifyCallback, Transport
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PROXY_PORT = 7374
+
+FRAME = struct.Struct("<HBH6s")
+"""Frame header: payload length, frame type, sequence number, device MAC. Payload follows the header"""
+CHAR = struct.Struct("<16s")
+"""Characteristic UUID in request and notification payloads"""
+RESULT = struct.Struct("<BH")
+"""Result payload: status, value (MTU for connect). Error message follows if status is not OK"""
+
+CONNECT = 0x01
+DISCONNECT = 0x02
+WRITE = 0x03
+"""Payload: characteristic, response flag byte, data"""
+SUBSCRIBE = 0x04
+"""Payload: characteristic"""
+PAIR = 0x05
+REPLY = 0x80
+NOTIFY = 0x81
+"""Payload: characteristic, data. Sequence is 0"""
+
+OK = 0
+ERROR = 1
+
+
+def _mac_bytes(mac: str) -> bytes:
+    return bytes.fromhex(mac.replace(":", ""))
+
+
+def _mac_str(mac: bytes) -> str:
+    return ":".join(f"{b:02X}" for b in mac)
+
+
+def _pack(kind: int, seq: int, mac: bytes, payload: bytes = b"") -> bytes:
+    return FRAME.pack(len(payload), kind, seq, mac) + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[int, int, bytes, bytes]:
+    length, kind, seq, mac = FRAME.unpack(await reader.readexactly(FRAME.size))
+    payload = await reader.readexactly(length) if length else b""
+    return kind, seq, mac, payload
+
+
+class BridgeClient:
+    """
+    Connection to remote BLE proxy.
+
+    All devices behind the proxy share single TCP connection: requests carry device MAC and sequence number, replies
+    are matched by sequence number, notifications are routed by MAC and characteristic. Errors of remote BLE stack are
+    raised as BleakError, so they are retried like local ones.
+    """
+
+    def __init__(self, host: str, port: int = DEFAULT_PROXY_PORT):
+        self.host = host
+        self.port = port
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._receiver: asyncio.Task | None = None
+        self.__lock: asyncio.Lock | None = None
+        self._seq = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._callbacks: Dict[Tuple[bytes, bytes], NotifyCallback] = {}
+        self._transports: Dict[bytes, BridgeTransport] = {}
+
+    @property
+    def _lock(self) -> asyncio.Lock:
+        # created in the running loop: on Python 3.9 lock is bound to the loop that exists when it is created
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        return self.__lock
+
+    def transport(self, device: str | BLEDevice) -> BridgeTransport:
+        """Transport for the device behind the proxy. Use as Tion transport argument"""
+        mac = device.address if isinstance(device, BLEDevice) else device
+        key = _mac_bytes(mac)
+        if key not in self._transports:
+            self._transports[key] = BridgeTransport(self, mac)
+        return self._transports[key]
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def connect(self):
+        async with self._lock:
+            if self._writer is not None:
+                return
+            try:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                # unreachable proxy is retried like unreachable device
+                raise exc.BleakError(f"Could not connect to proxy {self.host}:{self.port}: {e}") from e
+            self._receiver = asyncio.create_task(self._receive())
+            _LOGGER.debug("Connected to proxy %s:%d", self.host, self.port)
+
+    async def close(self):
+        if self._receiver is not None:
+            self._receiver.cancel()
+            try:
+                await self._receiver
+            except asyncio.CancelledError:
+                pass
+        self._connection_lost("Bridge client closed")
+
+    async def __aenter__(self) -> BridgeClient:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _connection_lost(self, reason: str):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = self._receiver = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc.BleakError(reason))
+        self._pending.clear()
+        self._callbacks.clear()
+        for transport in self._transports.values():
+            transport._connected = False
+
+    async def _receive(self):
+        try:
+            while True:
+                kind, seq, mac, payload = await _read_frame(self._reader)
+                if kind == NOTIFY:
+                    callback = self._callbacks.get((mac, payload[:CHAR.size]))
+                    if callback is not None:
+                        callback(0, bytearray(payload[CHAR.size:]))
+                elif kind == REPLY:
+                    future = self._pending.pop(seq, None)
+                    if future is not None and not future.done():
+                        future.set_result(payload)
+                else:
+                    _LOGGER.warning("Unexpected frame type %d from proxy", kind)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            _LOGGER.warning("Lost connection to proxy %s:%d: %s", self.host, self.port, e)
+            self._connection_lost(f"Lost connection to proxy: {e}")
+
+    async def request(self, kind: int, mac: str, payload: bytes = b"") -> int:
+        """
+        Send request and wait for reply
+        :return: reply value
+        :raises BleakError: if proxy reported error or connection was lost
+        """
+        await self.connect()
+        if self._writer is None:
+            raise exc.BleakError("Not connected to proxy")
+        seq = next(self._seq) % 0xFFFF + 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[seq] = future
+        try:
+            self._writer.write(_pack(kind, seq, _mac_bytes(mac), payload))
+            reply = await future
+        finally:
+            self._pending.pop(seq, None)
+
+        status, value = RESULT.unpack_from(reply)
+        if status != OK:
+            raise exc.BleakError(reply[RESULT.size:].decode(errors="replace"))
+        return value
+
+    def _subscribe(self, mac: str, char: str, callback: NotifyCallback):
+        self._callbacks[(_mac_bytes(mac), uuid.UUID(char).bytes)] = callback
+
+
+class BridgeTransport(Transport):
+    """Transport to the device behind remote BLE proxy"""
+
+    def __init__(self, client: BridgeClient, mac: str):
+        self._client = client
+        self.mac = mac
+        self._connected = False
+        self._mtu_size = DEFAULT_MTU
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.mac} via {self._client.host}:{self._client.port})"
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    @property
+    def mtu_size(self) -> int:
+        return self._mtu_size
+
+    async def connect(self) -> bool:
+        self._mtu_size = await self._client.request(CONNECT, self.mac) or DEFAULT_MTU
+        self._connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        self._connected = False
+        if self._client.connected:
+            await self._client.request(DISCONNECT, self.mac)
+        return True
+
+    async def write(self, char: str, data: bytes | bytearray, response: bool = False) -> None:
+        await self._client.request(WRITE, self.mac, uuid.UUID(char).bytes + bytes([response]) + bytes(data))
+
+    async def subscribe(self, char: str, callback: NotifyCallback) -> None:
+        self._client._subscribe(self.mac, char, callback)
+        await self._client.request(SUBSCRIBE, self.mac, uuid.UUID(char).bytes)
+
+    async def pair(self) -> bool:
+        await self._client.request(PAIR, self.mac)
+        return True
+
+
+class ProxyServer:
+    """
+    BLE proxy node: executes requests of remote BridgeClient with local transports.
+
+    Each client connection has its own transports, they are disconnected when client goes away. Requests to the same
+    device are executed in order of arrival, requests to different devices run concurrently.
+    """
+
+    def __init__(self, transport: Callable[[str], Transport]):
+        """
+        :param transport: creates transport for MAC, for example BleakTransport or FakeTransport
+        """
+        self._transport_factory = transport
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PROXY_PORT):
+        self._server = await asyncio.start_server(self._handle_client, host=host, port=port)
+        _LOGGER.info("Proxy is listening on %s", self.address)
+
+    @property
+    def address(self):
+        return None if self._server is None else self._server.sockets[0].getsockname()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self):
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def __aenter__(self) -> ProxyServer:
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        transports: Dict[bytes, Transport] = {}
+        locks: Dict[bytes, asyncio.Lock] = {}
+        tasks = set()
+
+        async def execute(kind: int, seq: int, mac: bytes, payload: bytes):
+            transport = transports.get(mac)
+            if transport is None:
+                transport = transports[mac] = self._transport_factory(_mac_str(mac))
+            async with locks.setdefault(mac, asyncio.Lock()):
+                try:
+                    value = await self._execute(transport, kind, mac, payload, writer)
+                    reply = RESULT.pack(OK, value)
+                except Exception as e:
+                    # any failure of local stack is reported to the client
+                    _LOGGER.debug("Request %d for %s failed: %s", kind, _mac_str(mac), e)
+                    reply = RESULT.pack(ERROR, 0) + (str(e) or type(e).__name__).encode()
+            if not writer.is_closing():
+                writer.write(_pack(REPLY, seq, mac, reply))
+
+        try:
+            while True:
+                kind, seq, mac, payload = await _read_frame(reader)
+                # started in order of arrival, so per-device lock keeps order of requests
+                task = asyncio.create_task(execute(kind, seq, mac, payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            for transport in transports.values():
+                try:
+                    if transport.is_connected:
+                        await transport.disconnect()
+                except Exception as e:
+                    _LOGGER.debug("Could not disconnect %s: %s", transport, e)
+            writer.close()
+
+    @staticmethod
+    async def _execute(transport: Transport, kind: int, mac: bytes, payload: bytes,
+                       writer: asyncio.StreamWriter) -> int:
+        if kind == CONNECT:
+            await transport.connect()
+            return transport.mtu_size
+        if kind == DISCONNECT:
+            await transport.disconnect()
+        elif kind == WRITE:
+            char = str(uuid.UUID(bytes=payload[:CHAR.size]))
+            await transport.write(char, payload[CHAR.size + 1:], bool(payload[CHAR.size]))
+        elif kind == SUBSCRIBE:
+            char_bytes = payload[:CHAR.size]
+
+            def forward(handle: int, data: bytearray):
+                if not writer.is_closing():
+                    writer.write(_pack(NOTIFY, 0, mac, char_bytes + bytes(data)))
+
+            await transport.subscribe(str(uuid.UUID(bytes=char_bytes)), forward)
+        elif kind == PAIR:
+            await transport.pair()
+        else:
+            raise ValueError(f"Unknown request type {kind}")
+        return 0
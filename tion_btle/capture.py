@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Callable, Dict, Iterator, NamedTuple
+
+if __package__ == "":
+    from tion_btle import clock
+    from tion_btle.tion import Tion, TionException
+    from tion_btle.light_family import TionLiteFamily
+    from tion_btle.recorder import FlightRecorder
+else:
+    from . import clock
+    from .tion import Tion, TionException
+    from .light_family import TionLiteFamily
+    from .recorder import FlightRecorder
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"TIONCAP\x01"
+RECORD = struct.Struct("<dB6sBH")
+"""Record header: unix time, kind (FlightRecorder.WRITE/NOTIFY), MAC, model code, payload length"""
+MODELS = ("", "S3", "Lite", "S4")
+"""Model codes: index in this tuple"""
+
+
+def _mac_to_bytes(mac: str) -> bytes:
+    try:
+        result = bytes.fromhex(mac.replace(":", ""))
+    except ValueError:
+        result = b""
+    return result if len(result) == 6 else bytes(6)
+
+
+def _model_code(model: str) -> int:
+    return MODELS.index(model) if model in MODELS else 0
+
+
+class CaptureRecord(NamedTuple):
+    timestamp: float
+    kind: int
+    mac: str
+    model: str
+    data: memoryview
+    """Payload view into the capture file. Valid until reader is closed, copy it if you need it later"""
+
+
+class CaptureWriter:
+    """
+    Appends timestamped frames to capture file.
+
+    File starts with MAGIC, then records follow: RECORD header and payload.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+    def write(self, kind: int, mac: str, model: str, data: bytes | bytearray | memoryview,
+              timestamp: float | None = None) -> None:
+        """
+        Append frame
+        :param kind: FlightRecorder.WRITE or FlightRecorder.NOTIFY
+        :param mac: device MAC
+        :param model: device model
+        :param data: raw frame
+        :param timestamp: unix time of the frame, now if not provided
+        """
+        self._file.write(RECORD.pack(
+            time.time() if timestamp is None else timestamp, kind, _mac_to_bytes(mac), _model_code(model), len(data)
+        ))
+        self._file.write(data)
+
+    def attach(self, tion: Tion) -> None:
+        """Write all frames of tion to this capture"""
+        mac, model = tion.mac, tion.model
+        tion.flight_recorder.sink = lambda kind, data: self.write(kind, mac, model, data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> CaptureWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CaptureReader:
+    """Iterates records of memory-mapped capture file without copying payloads"""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC):
+                raise TionException("CaptureReader", f"{path} is too short for capture file")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise TionException("CaptureReader", f"{path} is not a capture file")
+        self._macs: Dict[bytes, str] = {}
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        view = self._view
+        end = len(view)
+        offset = len(MAGIC)
+        unpack = RECORD.unpack_from
+        header_size = RECORD.size
+        macs = self._macs
+
+        while offset + header_size <= end:
+            timestamp, kind, mac, model, length = unpack(view, offset)
+            offset += header_size
+            if offset + length > end:
+                _LOGGER.warning("Truncated record at the end of %s", self.path)
+                return
+
+            mac_str = macs.get(mac)
+            if mac_str is None:
+                mac_str = macs[mac] = ":".join(f"{b:02X}" for b in mac)
+
+            yield CaptureRecord(timestamp, kind, mac_str, MODELS[model] if model < len(MODELS) else "",
+                                view[offset:offset + length])
+            offset += length
+
+    def close(self) -> None:
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            _LOGGER.debug("Records of %s are still used, file will be closed when they are released", self.path)
+
+    def __enter__(self) -> CaptureReader:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ReplayStats(NamedTuple):
+    records: int
+    messages: int
+    errors: int
+
+
+def replay(reader: CaptureReader, tion: Tion, mac: str | None = None) -> ReplayStats:
+    """
+    Feed captured frames to tion framing and decoding code at maximum speed
+    :param reader: capture
+    :param tion: instance of the captured model
+    :param mac: replay only frames of this device
+    :return: count of replayed records, decoded messages and decoding errors
+    """
+    records = messages = errors = 0
+    lite_family = isinstance(tion, TionLiteFamily)
+    request_starts = (TionLiteFamily.SINGLE_PACKET_ID, TionLiteFamily.FIRST_PACKET_ID)
+
+    for record in reader:
+        if mac is not None and record.mac != mac.upper():
+            continue
+        records += 1
+
+        if record.kind == FlightRecorder.WRITE:
+            if lite_family and len(record.data) >= 11 and record.data[0] in request_starts:
+                # responses are matched with requests by request id
+                tion._pending_requests.append(bytes(record.data[7:11]))
+            continue
+
+        try:
+            if tion._collect_message(bytearray(record.data)):
+                tion._decode_response(tion._data)
+                messages += 1
+        except (TionException, IndexError) as e:
+            _LOGGER.debug("Could not decode frame at %f: %s", record.timestamp, e)
+            errors += 1
+
+    return ReplayStats(records, messages, errors)
+
+
+async def replay_notifications(reader: CaptureReader, callback: Callable[[int, bytearray], None],
+                               mac: str | None = None, speed: float | None = None) -> int:
+    """
+    Feed captured notifications to callback, for example to TionDelegation.handleNotification of fake transport
+    :param reader: capture
+    :param callback: notification callback
+    :param mac: replay only notifications of this device
+    :param speed: 1.0 for original timing, 2.0 for twice faster and so on. None for maximum speed
+    :return: count of replayed notifications
+    """
+    count = 0
+    first_record: float | None = None
+    start = clock.monotonic()
+
+    for record in reader:
+        if record.kind != FlightRecorder.NOTIFY or (mac is not None and record.mac != mac.upper()):
+            continue
+
+        if speed is not None:
+            if first_record is None:
+                first_record = record.timestamp
+            delay = (record.timestamp - first_record) / speed - (clock.monotonic() - start)
+            if delay > 0:
+                await clock.sleep(delay)
+
+        callback(0, bytearray(record.data))
+        count += 1
+
+    return count
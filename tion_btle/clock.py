@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import warnings
+from typing import Awaitable, TypeVar
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Clock:
+    """
+    Time source for timeouts, retries and schedulers of the library.
+
+    Default clock follows the running event loop: monotonic() is loop.time() and sleep() is asyncio.sleep(), so
+    VirtualTimeLoop controls them without any patching. Subclass and install it with set_clock() for other time
+    sources.
+    """
+
+    def monotonic(self) -> float:
+        """Seconds from unspecified point. Loop time when called inside event loop"""
+        try:
+            return asyncio.get_running_loop().time()
+        except RuntimeError:
+            return time.monotonic()
+
+    def time(self) -> float:
+        """Unix time"""
+        return time.time()
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+
+_clock = Clock()
+
+
+def get_clock() -> Clock:
+    return _clock
+
+
+def set_clock(clock: Clock) -> Clock:
+    """
+    Install clock for the whole library
+    :return: previous clock
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def monotonic() -> float:
+    return _clock.monotonic()
+
+
+async def sleep(delay: float) -> None:
+    await _clock.sleep(delay)
+
+
+class _VirtualSelector:
+    """Selector that moves loop time forward instead of blocking when there is no ready I/O"""
+
+    def __init__(self, selector, loop: VirtualTimeLoop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout: float | None = None):
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # no timers: only I/O or call from other thread may wake the loop
+            return self._selector.select(None)
+        self._loop.advance(timeout)
+        return []
+
+    def __getattr__(self, item):
+        return getattr(self._selector, item)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop with virtual time for tests.
+
+    When all tasks wait for timers, time jumps to the nearest timer instead of sleeping, so sleeps, timeouts and
+    backoffs of any length take no real time. Ready I/O is still processed, but in-flight I/O does not hold the
+    virtual time: it is meant for code that talks to in-memory transports.
+    """
+
+    def __init__(self, start: float = 0.0):
+        super().__init__()
+        self._virtual_time = start
+        self._selector = _VirtualSelector(self._selector, self)
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def advance(self, seconds: float) -> None:
+        if seconds > 0:
+            self._virtual_time += seconds
+
+
+def _current_event_loop() -> asyncio.AbstractEventLoop | None:
+    """Event loop set for the current thread, without the deprecation warning of implicit creation"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            return asyncio.get_event_loop_policy().get_event_loop()
+        except RuntimeError:
+            return None
+
+
+def run_virtual(main: Awaitable[T], start: float = 0.0) -> T:
+    """
+    Run coroutine in new VirtualTimeLoop, like asyncio.run()
+    :param main: coroutine to run
+    :param start: initial loop time
+    :return: coroutine result
+    """
+    previous = _current_event_loop()
+    loop = VirtualTimeLoop(start)
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            # unlike asyncio.run(), keep the loop of the thread: on Python 3.9 asyncio primitives created outside of
+            # running loop take it from get_event_loop()
+            asyncio.set_event_loop(previous)
+            loop.close()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List
+
+if __package__ == "":
+    from tion_btle import clock, tracing
+else:
+    from . import clock, tracing
+
+if TYPE_CHECKING:
+    from .tion import Deadline
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Command priority. Lower value is served first."""
+    INTERACTIVE = 0
+    """User actions"""
+    SCHEDULED = 1
+    """Automation and scheduled changes"""
+    POLL = 2
+    """Background state polling"""
+
+
+class Command:
+    GET = "get"
+    SET = "set"
+
+    def __init__(self, kind: str, priority: Priority, seq: int, payload: dict | None = None,
+                 deadline: Deadline | None = None):
+        self.kind = kind
+        self.priority = priority
+        self.seq = seq
+        self.payload = payload
+        self.deadline = deadline
+        self.task: asyncio.Future | None = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued: float = clock.monotonic()
+        self.started: bool = False
+        self.waiters: int = 1
+        self.span = tracing.current_span()
+        """Span of the caller. Steps of execution are its children"""
+
+    def __lt__(self, other: Command) -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def merge(self, other: Command) -> bool:
+        """
+        Merge not started command into this one
+        :param other: new command
+        :return: True if other command is covered by this one and should not be queued
+        """
+        if self.started or self.kind != other.kind:
+            return False
+
+        if self.kind == self.SET:
+            self.payload = {**self.payload, **other.payload}
+
+        if self.deadline is not None and other.deadline is not None:
+            self.deadline.extend(other.deadline)
+        else:
+            self.deadline = None
+
+        self.priority = min(self.priority, other.priority)
+        self.waiters += 1
+        return True
+
+
+class QueueStats:
+    def __init__(self):
+        self.executed: Dict[Priority, int] = {p: 0 for p in Priority}
+        self.total_wait: Dict[Priority, float] = {p: 0.0 for p in Priority}
+        self.max_wait: Dict[Priority, float] = {p: 0.0 for p in Priority}
+        self.merged: int = 0
+        self.dropped: int = 0
+        self.last_wait: float = 0.0
+
+    def add(self, priority: Priority, wait: float):
+        self.executed[priority] += 1
+        self.total_wait[priority] += wait
+        self.max_wait[priority] = max(self.max_wait[priority], wait)
+        self.last_wait = wait
+
+    def as_dict(self) -> dict:
+        return {
+            p.name.lower(): {
+                "executed": self.executed[p],
+                "mean_wait": self.total_wait[p] / self.executed[p] if self.executed[p] else 0.0,
+                "max_wait": self.max_wait[p],
+            } for p in Priority
+        } | {
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "last_wait": self.last_wait,
+        }
+
+
+class CommandQueue:
+    """
+    Per-device queue of commands that need radio.
+
+    Commands are executed one by one in priority order. Not started command is merged with new command of the same
+    kind: get requests share single state read, set requests are combined to single write with newer values.
+    """
+    def __init__(self, executor: Callable[[str, dict | None, Deadline | None], Awaitable[Any]]):
+        """
+        :param executor: coroutine function that executes command of given kind with given payload before deadline
+        """
+        self._executor = executor
+        self._heap: List[Command] = []
+        self._seq = itertools.count()
+        self._worker: asyncio.Task | None = None
+        self.stats = QueueStats()
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    async def submit(self, kind: str, priority: Priority = Priority.POLL, payload: dict | None = None,
+                     deadline: Deadline | None = None) -> Any:
+        """
+        Queue command and wait for its result.
+        If all callers that wait for a command are cancelled, not started command is dropped and running command is
+        cancelled.
+        :param kind: Command.GET or Command.SET
+        :param priority: command priority
+        :param payload: command data (new settings for set)
+        :param deadline: when command must be finished
+        :return: executor result
+        """
+        command = Command(kind, priority, next(self._seq), payload, deadline)
+
+        for queued in self._heap:
+            if queued.merge(command):
+                _LOGGER.debug("Merged %s(priority=%s) into queued command", kind, priority.name)
+                self.stats.merged += 1
+                heapq.heapify(self._heap)
+                command = queued
+                break
+        else:
+            heapq.heappush(self._heap, command)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._work())
+
+        try:
+            return await asyncio.shield(command.future)
+        except asyncio.CancelledError:
+            self._release(command)
+            raise
+
+    def _release(self, command: Command):
+        command.waiters -= 1
+        if command.waiters > 0:
+            return
+
+        if not command.started and command in self._heap:
+            _LOGGER.debug("Dropping %s: nobody is waiting for it", command.kind)
+            self._heap.remove(command)
+            heapq.heapify(self._heap)
+            self.stats.dropped += 1
+            command.future.cancel()
+        elif command.task is not None and not command.task.done():
+            _LOGGER.debug("Cancelling running %s: nobody is waiting for it", command.kind)
+            command.task.cancel()
+
+    async def _execute(self, command: Command) -> Any:
+        # runs in its own task, so the caller span is current only for this execution
+        tracing.activate(command.span)
+        tracing.annotate(queue_wait=clock.monotonic() - command.enqueued)
+        return await self._executor(command.kind, command.payload, command.deadline)
+
+    async def _work(self):
+        while self._heap:
+            command = heapq.heappop(self._heap)
+            command.started = True
+            self.stats.add(command.priority, clock.monotonic() - command.enqueued)
+
+            command.task = asyncio.ensure_future(self._execute(command))
+            try:
+                await asyncio.wait([command.task])
+            except asyncio.CancelledError:
+                command.task.cancel()
+                command.future.cancel()
+                raise
+
+            if command.future.done():
+                continue
+            if command.task.cancelled():
+                command.future.cancel()
+            elif command.task.exception() is not None:
+                command.future.set_exception(command.task.exception())
+            else:
+                command.future.set_result(command.task.result())
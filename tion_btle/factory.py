@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Dict, Iterable, Type
+
+from bleak import BleakClient, exc
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+if __package__ == "":
+    from tion_btle.tion import Tion, TionException
+    from tion_btle.light_family import TionLiteFamily
+    from tion_btle.lite import TionLite
+    from tion_btle.s3 import TionS3
+    from tion_btle.s4 import TionS4
+    from tion_btle.registry import DeviceRegistry
+    from tion_btle.storage import JsonStore
+else:
+    from .tion import Tion, TionException
+    from .light_family import TionLiteFamily
+    from .lite import TionLite
+    from .s3 import TionS3
+    from .s4 import TionS4
+    from .registry import DeviceRegistry
+    from .storage import JsonStore
+
+_LOGGER = logging.getLogger(__name__)
+
+MODELS: Dict[str, Type[Tion]] = {
+    "S3": TionS3,
+    "Lite": TionLite,
+    "S4": TionS4,
+}
+
+NAME_MARKERS = (
+    ("4s", "S4"),
+    ("lite", "Lite"),
+    ("3s", "S3"),
+)
+"""Substrings of advertised name (lowercase) and models they identify"""
+
+GAP_DEVICE_NAME = "00002a00-0000-1000-8000-00805f9b34fb"
+
+
+class ModelCache(JsonStore):
+    """Detected models by MAC, stored on disk"""
+
+    def get(self, mac: str) -> str | None:
+        model = self.data.get(mac.upper())
+        return model if model in MODELS else None
+
+    def set(self, mac: str, model: str):
+        if self.data.get(mac.upper()) != model:
+            self.data[mac.upper()] = model
+            self.save()
+
+
+def model_from_name(name: str | None) -> str | None:
+    if not name:
+        return None
+    name = name.lower()
+    for marker, model in NAME_MARKERS:
+        if marker in name:
+            return model
+    return None
+
+
+def model_from_advertisement(name: str | None, service_uuids: Iterable[str] = ()) -> str | None:
+    """
+    Detect model by advertised name and service UUIDs
+    :return: model name (key of MODELS) or None if advertisement is not enough
+    """
+    service_uuids = {u.lower() for u in service_uuids}
+    if TionS3.uuid in service_uuids:
+        return "S3"
+
+    model = model_from_name(name)
+    if TionLiteFamily.uuid in service_uuids and model == "S3":
+        # Lite family service could not belong to S3
+        return None
+    return model
+
+
+async def probe_model(device: str | BLEDevice) -> str | None:
+    """
+    Detect model with single connection: by GATT services and device name
+    :return: model name or None
+    """
+    client = BleakClient(device)
+    try:
+        await client.connect()
+        services = {s.uuid.lower() for s in client.services}
+        if TionS3.uuid in services:
+            return "S3"
+        name = bytes(await client.read_gatt_char(GAP_DEVICE_NAME)).decode(errors="ignore")
+        _LOGGER.debug("Probed %s: %s, name %s", device, services, name)
+        return model_from_advertisement(name, services)
+    except (exc.BleakError, OSError) as e:
+        _LOGGER.warning("Could not probe %s: %s", device, e)
+        return None
+    finally:
+        try:
+            await client.disconnect()
+        except (exc.BleakError, OSError):
+            pass
+
+
+async def detect_model(device: str | BLEDevice, advertisement: AdvertisementData | None = None,
+                       cache: ModelCache | None = None, probe: bool = True) -> str:
+    """
+    Detect breezer model. Sources are checked in order: cache, advertisement, GATT probe.
+    :param device: MAC-address or BLEDevice
+    :param advertisement: last advertisement of the device
+    :param cache: cache of detected models
+    :param probe: may we connect to device if other sources are not enough
+    :return: model name (key of MODELS)
+    :raises TionException: if model could not be detected
+    """
+    mac = device.address if isinstance(device, BLEDevice) else device
+
+    model = cache.get(mac) if cache is not None else None
+    if model is None and advertisement is not None:
+        model = model_from_advertisement(advertisement.local_name, advertisement.service_uuids)
+    if model is None and isinstance(device, BLEDevice):
+        model = model_from_name(device.name)
+    if model is None and probe:
+        model = await probe_model(device)
+    if model is None:
+        raise TionException("detect_model", f"Could not detect model of {mac}")
+
+    if cache is not None:
+        cache.set(mac, model)
+    return model
+
+
+async def create_tion(device: str | BLEDevice, advertisement: AdvertisementData | None = None,
+                      cache: ModelCache | str | os.PathLike | None = None, registry: DeviceRegistry | None = None,
+                      probe: bool = True, **kwargs) -> Tion:
+    """
+    Create instance of the right class for the breezer
+    :param device: MAC-address or BLEDevice
+    :param advertisement: last advertisement of the device. Taken from registry if not provided
+    :param cache: ModelCache or path to its file
+    :param registry: device registry for the new instance
+    :param probe: may we connect to device if other sources are not enough
+    :param kwargs: other arguments for the model class
+    :return: Tion instance
+    """
+    if cache is not None and not isinstance(cache, ModelCache):
+        cache = ModelCache(cache)
+
+    mac = device.address if isinstance(device, BLEDevice) else device
+    if registry is not None:
+        entry = registry.entry(mac)
+        if entry is not None:
+            advertisement = advertisement or entry.advertisement
+            if not isinstance(device, BLEDevice):
+                device = entry.device
+
+    model = await detect_model(device, advertisement, cache, probe)
+    _LOGGER.debug("%s is %s", mac, model)
+    return MODELS[model](device, registry=registry, **kwargs)
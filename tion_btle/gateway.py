@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Iterable, Set
+
+from bleak import exc
+
+if __package__ == "":
+    from tion_btle import clock
+    from tion_btle.command_queue import Priority
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError
+else:
+    from . import clock
+    from .command_queue import Priority
+    from .tion import Tion, TionException, MaxTriesExceededError
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PORT = 7373
+ALL = "*"
+"""Watch key for events of all devices"""
+
+
+class _Client:
+    """Connection of single gateway client. Messages are sent by its own task, so slow client never blocks others"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.watching: Set[str] = set()
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def send(self, message: dict):
+        self._outbox.put_nowait(message)
+
+    async def _send_loop(self):
+        while True:
+            message = await self._outbox.get()
+            self.writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+            await self.writer.drain()
+
+    async def close(self):
+        self._sender.cancel()
+        try:
+            await self._sender
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class Gateway:
+    """
+    Serves many local clients with single set of Tion instances.
+
+    Protocol is line-delimited JSON. Request: {"id": 1, "cmd": "get", "mac": "AA:BB:CC:DD:EE:FF"}. Response:
+    {"id": 1, "ok": true, "result": ...} or {"id": 1, "ok": false, "error": "..."}. Commands:
+      * list -- MACs and models of served devices
+      * get -- cached state of the device, add "refresh": true to read it from breezer
+      * set -- write "settings" to the device
+      * watch/unwatch -- subscribe to state changes of "mac" or of all devices if mac is not provided. Changes are
+        pushed as {"event": "state", "mac": ..., "state": ..., "changed": ...}
+
+    Every device is polled every poll_interval seconds, reads are answered from the last polled state and writes go
+    to the device command queue, so the count of clients does not change radio load.
+    """
+
+    def __init__(self, devices: Iterable[Tion], poll_interval: float = 60, timeout: float | None = 30):
+        """
+        :param devices: breezers to serve
+        :param poll_interval: seconds between state polls of each device
+        :param timeout: timeout of each request to breezer in seconds
+        """
+        self.devices: Dict[str, Tion] = {tion.mac.upper(): tion for tion in devices}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._cache: Dict[str, dict] = {}
+        self._updated: Dict[str, float] = {}
+        self._clients: Set[_Client] = set()
+        self._pollers: list = []
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self, path: str | None = None, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        """
+        Start polling and serving clients
+        :param path: Unix socket path. TCP socket on host:port is used if not provided
+        :param host: TCP host
+        :param port: TCP port, 0 for any free port
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_client, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host=host, port=port)
+        self._pollers = [asyncio.create_task(self._poll(mac)) for mac in self.devices]
+        _LOGGER.info("Serving %d devices on %s", len(self.devices), path or self.address)
+
+    @property
+    def address(self):
+        """Socket address of the server"""
+        return None if self._server is None else self._server.sockets[0].getsockname()
+
+    async def stop(self):
+        for poller in self._pollers:
+            poller.cancel()
+        await asyncio.gather(*self._pollers, return_exceptions=True)
+        self._pollers = []
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await asyncio.gather(*(client.close() for client in list(self._clients)), return_exceptions=True)
+
+    async def serve_forever(self):
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def __aenter__(self) -> Gateway:
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def _device(self, mac: str | None) -> Tion:
+        try:
+            return self.devices[str(mac).upper()]
+        except KeyError:
+            raise TionException("gateway", f"Unknown device {mac}") from None
+
+    def _update(self, mac: str, state: dict):
+        old = self._cache.get(mac, {})
+        changed = {k: v for k, v in state.items() if old.get(k) != v and k != "time"}
+        self._cache[mac] = state
+        self._updated[mac] = time.time()
+        if not changed:
+            return
+
+        event = {"event": "state", "mac": mac, "state": state, "changed": changed}
+        for client in self._clients:
+            if mac in client.watching or ALL in client.watching:
+                client.send(event)
+
+    async def _refresh(self, mac: str, priority: Priority = Priority.POLL) -> dict:
+        state = await self.devices[mac].get(priority=priority, timeout=self.timeout)
+        self._update(mac, state)
+        return state
+
+    async def _poll(self, mac: str):
+        while True:
+            try:
+                await self._refresh(mac)
+            except (TionException, MaxTriesExceededError, exc.BleakError, OSError) as e:
+                _LOGGER.warning("Could not poll %s: %s", mac, e)
+            await clock.sleep(self.poll_interval)
+
+    async def get(self, mac: str, refresh: bool = False) -> dict:
+        tion = self._device(mac)
+        state = self._cache.get(tion.mac.upper())
+        if state is None or refresh:
+            # concurrent requests are merged in the device command queue
+            state = await self._refresh(tion.mac.upper(), Priority.INTERACTIVE)
+        return {**state, "updated": self._updated[tion.mac.upper()]}
+
+    async def set(self, mac: str, settings: dict) -> None:
+        tion = self._device(mac)
+        if not isinstance(settings, dict) or not settings:
+            raise TionException("gateway", "settings must be non-empty object")
+
+        await tion.set(settings, priority=Priority.INTERACTIVE, timeout=self.timeout)
+        key = tion.mac.upper()
+        if key in self._cache:
+            new_state = {**self._cache[key], **settings}
+            if settings.get("fan_speed") == 0:
+                new_state["state"] = "off"
+            self._update(key, new_state)
+
+    def list(self) -> list:
+        return [{"mac": mac, "model": tion.model, "cached": mac in self._cache} for mac, tion in self.devices.items()]
+
+    async def _dispatch(self, client: _Client, request: dict):
+        cmd = request.get("cmd")
+        mac = request.get("mac")
+        if cmd == "list":
+            return self.list()
+        if cmd == "get":
+            return await self.get(mac, bool(request.get("refresh", False)))
+        if cmd == "set":
+            return await self.set(mac, request.get("settings"))
+        if cmd in ("watch", "unwatch"):
+            key = ALL if mac is None else self._device(mac).mac.upper()
+            if cmd == "watch":
+                client.watching.add(key)
+                return self._cache.get(key) if key != ALL else None
+            client.watching.discard(key)
+            return None
+        raise TionException("gateway", f"Unknown command {cmd}")
+
+    async def _answer(self, client: _Client, request: dict):
+        response = {"id": request.get("id")}
+        try:
+            response.update(ok=True, result=await self._dispatch(client, request))
+        except TionException as e:
+            response.update(ok=False, error=e.message)
+        except (MaxTriesExceededError, exc.BleakError, OSError, asyncio.TimeoutError) as e:
+            response.update(ok=False, error=str(e) or e.__class__.__name__)
+        except Exception as e:
+            # for example bad value in settings: client must get an answer anyway
+            _LOGGER.exception("Could not answer %s", request)
+            response.update(ok=False, error=f"{type(e).__name__}: {e}")
+        client.send(response)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = _Client(reader, writer)
+        self._clients.add(client)
+        requests: Set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be an object")
+                except ValueError as e:
+                    client.send({"id": None, "ok": False, "error": f"Bad request: {e}"})
+                    continue
+                # requests are served concurrently: slow read must not delay others
+                task = asyncio.create_task(self._answer(client, request))
+                requests.add(task)
+                task.add_done_callback(requests.discard)
+        except (ConnectionError, ValueError) as e:
+            _LOGGER.debug("Closing client connection: %s", e)
+        finally:
+            self._clients.discard(client)
+            for task in requests:
+                task.cancel()
+            await client.close()
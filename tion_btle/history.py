@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import logging
+import math
+import mmap
+import os
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+if __package__ == "":
+    from tion_btle.storage import JsonStore
+else:
+    from .storage import JsonStore
+
+_LOGGER = logging.getLogger(__name__)
+
+FIELDS: Dict[str, str] = {
+    "in_temp": "f",
+    "out_temp": "f",
+    "heater_temp": "b",
+    "fan_speed": "B",
+    "filter_remain": "f",
+    "electronic_temp": "B",
+    "productivity": "B",
+}
+"""Numeric fields of get() result that are kept in history and array typecodes of their columns"""
+
+TIME = "time"
+
+
+class Bucket(NamedTuple):
+    start: float
+    """Unix time of the bucket start"""
+    min: float
+    max: float
+    mean: float
+    count: int
+
+
+class _Column:
+    """
+    Append-only typed column.
+
+    New values go to preallocated in-memory chunk. Full chunk is appended to the column file, which is read through
+    mmap.
+    """
+
+    def __init__(self, path: Path, typecode: str, chunk_size: int, count: int):
+        self.path = path
+        self.typecode = typecode
+        self._chunk = array(typecode, bytes(chunk_size * array(typecode).itemsize))
+        self._pending = 0
+        self._stored = count
+        """Count of values in the file"""
+        self._mmap: mmap.mmap | None = None
+        self._view: memoryview | None = None
+        self._mapped = 0
+
+    def __len__(self) -> int:
+        return self._stored + self._pending
+
+    def append(self, value) -> bool:
+        """
+        :return: True if chunk is full and column should be flushed
+        """
+        self._chunk[self._pending] = value
+        self._pending += 1
+        return self._pending == len(self._chunk)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        with open(self.path, "ab") as f:
+            f.write(memoryview(self._chunk)[:self._pending])
+        self._stored += self._pending
+        self._pending = 0
+
+    def _stored_view(self) -> memoryview:
+        if self._mapped != self._stored:
+            self.close()
+            if self._stored:
+                with open(self.path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap).cast("B")[:self._stored * self._chunk.itemsize].cast(self.typecode)
+            self._mapped = self._stored
+        return self._view if self._view is not None else memoryview(array(self.typecode))
+
+    def slice(self, start: int, stop: int) -> array:
+        """Copy of values in [start, stop)"""
+        result = array(self.typecode)
+        stored = self._stored
+        if start < stored:
+            result.frombytes(self._stored_view()[start:min(stop, stored)].cast("B"))
+        if stop > stored:
+            result.extend(self._chunk[max(start - stored, 0):stop - stored])
+        return result
+
+    def __getitem__(self, i: int):
+        if i < self._stored:
+            return self._stored_view()[i]
+        return self._chunk[i - self._stored]
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._mapped = 0
+
+
+class _Series:
+    """History of one device: time column and value columns of equal length"""
+
+    def __init__(self, directory: Path, fields: Dict[str, str], chunk_size: int):
+        self.directory = directory
+        self.fields = fields
+        directory.mkdir(parents=True, exist_ok=True)
+
+        paths = {name: directory / f"{name}.{typecode}" for name, typecode in fields.items()}
+        sizes = {name: (os.path.getsize(p) if p.exists() else 0) // array(fields[name]).itemsize
+                 for name, p in paths.items()}
+        count = min(sizes.values())
+        for name, size in sizes.items():
+            if size != count:
+                # interrupted flush: drop values that have no pair in other columns
+                _LOGGER.warning("Truncating %s from %d to %d values", paths[name], size, count)
+                os.truncate(paths[name], count * array(fields[name]).itemsize)
+
+        self.columns = {name: _Column(p, fields[name], chunk_size, count) for name, p in paths.items()}
+        self.time = self.columns[TIME]
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def append(self, timestamp: float, values: dict) -> None:
+        if len(self.time) and timestamp < self.time[len(self.time) - 1]:
+            _LOGGER.debug("Ignoring out of order record at %f in %s", timestamp, self.directory)
+            return
+
+        full = self.time.append(timestamp)
+        for name, column in self.columns.items():
+            if name != TIME:
+                value = values.get(name)
+                column.append(float("nan") if value is None and column.typecode in "fd" else value or 0)
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        for column in self.columns.values():
+            column.flush()
+
+    def range(self, start: float | None, end: float | None) -> Tuple[int, int]:
+        """Indexes of records with start <= time < end"""
+        lo = 0 if start is None else bisect_left(self.time, start, 0, len(self.time))
+        hi = len(self.time) if end is None else bisect_left(self.time, end, lo, len(self.time))
+        return lo, hi
+
+    def close(self) -> None:
+        for column in self.columns.values():
+            column.close()
+
+
+class HistoryStore:
+    """
+    Telemetry history of breezers in compact typed columns.
+
+    Each device has a directory with a file per field (TIME and FIELDS); a file is a plain array of machine values.
+    Records are kept in memory chunks of chunk_size values and appended to files when chunk is full or on flush().
+    Records must be added in time order, queries use binary search on the time column.
+    """
+
+    def __init__(self, path: str | os.PathLike, chunk_size: int = 1024):
+        """
+        :param path: directory for history files
+        :param chunk_size: how many records are kept in memory before writing to disk
+        """
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self._meta = JsonStore(self.path / "devices.json")
+        self._series: Dict[str, _Series] = {}
+
+    @staticmethod
+    def _key(mac: str) -> str:
+        return mac.upper().replace(":", "")
+
+    def _get_series(self, mac: str, state: dict | None = None) -> _Series | None:
+        key = self._key(mac)
+        series = self._series.get(key)
+        if series is not None:
+            return series
+
+        fields = self._meta.data.get(key)
+        if fields is None:
+            if state is None:
+                return None
+            fields = {TIME: "d", **{name: typecode for name, typecode in FIELDS.items() if name in state}}
+            self._meta.data[key] = fields
+            self._meta.save()
+
+        series = self._series[key] = _Series(self.path / key, fields, self.chunk_size)
+        return series
+
+    def record(self, mac: str, state: dict, timestamp: float | None = None) -> None:
+        """
+        Append state of the device
+        :param mac: device MAC
+        :param state: result of get()
+        :param timestamp: unix time of the state, now if not provided
+        """
+        self._get_series(mac, state).append(time.time() if timestamp is None else timestamp, state)
+
+    def fields(self, mac: str) -> List[str]:
+        """Fields stored for the device"""
+        series = self._get_series(mac)
+        return [] if series is None else [f for f in series.fields if f != TIME]
+
+    def __len__(self) -> int:
+        return len(self._meta.data)
+
+    def count(self, mac: str) -> int:
+        series = self._get_series(mac)
+        return 0 if series is None else len(series)
+
+    def query(self, mac: str, field: str, start: float | None = None,
+              end: float | None = None) -> Tuple[array, array]:
+        """
+        Values of the field in time range
+        :param mac: device MAC
+        :param field: one of FIELDS
+        :param start: unix time, inclusive. None for the oldest record
+        :param end: unix time, exclusive. None for the newest record
+        :return: arrays of times and values
+        :raises KeyError: if field is not stored for the device
+        """
+        series = self._get_series(mac)
+        if series is None:
+            return array("d"), array(FIELDS[field])
+        column = series.columns[field]
+        lo, hi = series.range(start, end)
+        return series.time.slice(lo, hi), column.slice(lo, hi)
+
+    def rollup(self, mac: str, field: str, bucket: float, start: float | None = None,
+               end: float | None = None) -> List[Bucket]:
+        """
+        Min, max and mean of the field over time buckets. Buckets without records are skipped, NaN values are ignored.
+        :param mac: device MAC
+        :param field: one of FIELDS
+        :param bucket: bucket size in seconds. Buckets are aligned to multiples of bucket since epoch
+        :param start: unix time, inclusive. None for the oldest record
+        :param end: unix time, exclusive. None for the newest record
+        :return: list of buckets in time order
+        """
+        times, values = self.query(mac, field, start, end)
+        result = []
+        lo = 0
+        while lo < len(times):
+            bucket_start = times[lo] // bucket * bucket
+            hi = bisect_left(times, bucket_start + bucket, lo)
+            chunk = values[lo:hi]
+            total = math.fsum(chunk)
+            if math.isnan(total):
+                chunk = array(chunk.typecode, (v for v in chunk if not math.isnan(v)))
+                total = math.fsum(chunk)
+            if chunk:
+                result.append(Bucket(bucket_start, min(chunk), max(chunk), total / len(chunk), len(chunk)))
+            lo = hi
+        return result
+
+    def flush(self) -> None:
+        """Write in-memory records to disk"""
+        for series in self._series.values():
+            series.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for series in self._series.values():
+            series.close()
+        self._series.clear()
+
+    def __enter__(self) -> HistoryStore:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Deque, Sequence
+
+
+def percentile(samples: Sequence[float], q: float) -> float | None:
+    """
+    Nearest-rank percentile
+    :param samples: observations in any order
+    :param q: percentile in 0..100
+    :return: observation or None if there are no observations
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class LatencyTracker:
+    """
+    Rolling distribution of breezer response latency.
+
+    Keeps last `window` round-trip times and EWMA of them. Response timeout follows observed p99 latency, so lost
+    response is detected fast for quick devices and slow devices do not get false timeouts. Every consecutive timeout
+    doubles the timeout up to max_timeout: device that became slower than its history still gets answered and its new
+    latency is learned.
+    """
+    __slots__ = ("initial_timeout", "min_timeout", "max_timeout", "factor", "min_samples", "alpha", "window",
+                 "_samples", "ewma", "count", "timeouts",
+                 "consecutive_timeouts")
+
+    def __init__(self, initial_timeout: float = 10.0, min_timeout: float = 0.2, max_timeout: float = 10.0,
+                 factor: float = 3.0, window: int = 64, min_samples: int = 5, alpha: float = 0.2):
+        """
+        :param initial_timeout: timeout until we have min_samples observations
+        :param min_timeout: lower limit for timeout
+        :param max_timeout: upper limit for timeout
+        :param factor: timeout is p99 latency multiplied by factor
+        :param window: how many last observations are used for percentiles
+        :param min_samples: how many observations we need to trust them
+        :param alpha: EWMA smoothing factor
+        """
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.factor = factor
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.window = window
+        self._samples: Deque[float] | None = None
+        """Created with the first observation"""
+        self.ewma: float | None = None
+        self.count: int = 0
+        """Total count of observed responses"""
+        self.timeouts: int = 0
+        """Total count of responses that were not received in time"""
+        self.consecutive_timeouts: int = 0
+        """Timeouts since the last received response"""
+
+    def add(self, latency: float) -> None:
+        """
+        Add observed round-trip time
+        :param latency: seconds between request and full response
+        """
+        if self._samples is None:
+            self._samples = deque(maxlen=self.window)
+        self._samples.append(latency)
+        self.ewma = latency if self.ewma is None else self.alpha * latency + (1 - self.alpha) * self.ewma
+        self.count += 1
+        self.consecutive_timeouts = 0
+
+    def add_timeout(self) -> None:
+        """Register response that was not received in time"""
+        self.timeouts += 1
+        self.consecutive_timeouts += 1
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Latency percentile over the window
+        :param q: percentile in 0..100
+        :return: seconds or None if there are no observations
+        """
+        return percentile(self._samples, q)
+
+    @property
+    def timeout(self) -> float:
+        """How long we should wait for the response"""
+        if self._samples is None or len(self._samples) < self.min_samples:
+            timeout = self.initial_timeout
+        else:
+            timeout = min(self.max_timeout, max(self.min_timeout, self.percentile(99) * self.factor))
+        if self.consecutive_timeouts:
+            # exponent is limited, so the product stays finite
+            timeout = max(timeout, min(self.max_timeout, timeout * 2 ** min(self.consecutive_timeouts, 32)))
+        return timeout
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "timeouts": self.timeouts,
+            "ewma": self.ewma,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "timeout": self.timeout,
+        }
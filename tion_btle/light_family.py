@@ -1,21 +1,48 @@
 from __future__ import annotations
 
 import abc
+import asyncio
 import logging
-from random import randrange
-from typing import final, List
+from collections import deque
+from random import randbytes, randrange
+from typing import final, Deque, List
 
+from bleak import exc
 from bleak.backends.device import BLEDevice
 
 if __package__ == "":
-    from tion_btle.tion import Tion
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError, retry
+    from tion_btle.recorder import FlightRecorder
+    from tion_btle import tracing
 else:
-    from .tion import Tion
+    from .tion import Tion, TionException, MaxTriesExceededError, retry
+    from .recorder import FlightRecorder
+    from . import tracing
 
-logging.basicConfig(level=logging.DEBUG)
 _LOGGER = logging.getLogger(__name__)
 
 
+class RandomPool:
+    """Random filler bytes for requests. Bytes are generated in big chunks, so single request takes just a slice"""
+    __slots__ = ("size", "_pool", "_offset")
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self._pool = b""
+        self._offset = 0
+
+    def take(self, n: int) -> bytes:
+        offset = self._offset
+        if offset + n > len(self._pool):
+            self._pool = randbytes(max(self.size, n))
+            offset = 0
+        self._offset = offset + n
+        return self._pool[offset:offset + n]
+
+
+_random_pool = RandomPool()
+
+
 class TionLiteFamily(Tion):
     uuid: str = "98f00001-3788-83ea-453e-f52244709ddb"
     uuid_write: str = "98f00002-3788-83ea-453e-f52244709ddb"
@@ -31,19 +58,57 @@ class TionLiteFamily(Tion):
     END_PACKET_ID = 0xc0
     MAGIC_NUMBER: int = 0x3a  # 58
 
-    def __init__(self, mac: str | BLEDevice):
-        super().__init__(mac)
+    DEFAULT_PACKET_SIZE: int = 20
+    """Packet size that fits into default ATT MTU (23 bytes without 3 bytes of ATT header)"""
+    max_packet_size: int = DEFAULT_PACKET_SIZE
+    """
+    Biggest packet that model accepts. Bigger packets are opt-in: no shipped model raises it, because firmware support
+    of packets above 20 bytes is not confirmed. Set it on subclass or instance to use negotiated MTU, for example
+    tion.max_packet_size = 244. If the breezer rejects the write, the instance falls back to 20-byte packets
+    """
+    pipelined_writes: bool = True
+    """Queue all packets of multi-packet request at once and retry whole request instead of single packets"""
+    MAX_PENDING_REQUESTS: int = 16
+    """How many sent requests may wait for response. Responses for older requests are dropped as late"""
+
+    __slots__ = ("_crc", "_header", "_have_full_package", "_got_new_sequence", "_mtu_rejected", "_package_size",
+                 "_command_type", "_request_id", "_sent_request_id", "_command_number", "_last_request_id",
+                 "__pending_requests", "unmatched_responses", "_light", "_have_heater")
+
+    def __init__(self, mac: str | BLEDevice, **kwargs):
+        super().__init__(mac, **kwargs)
         self._data: bytearray = bytearray()
-        self._crc: bytearray = bytearray()
-        self._header: bytearray = bytearray()
+        # empty bytes are shared by all instances, fields get own bytearrays from responses
+        self._crc: bytes | bytearray = b""
+        self._header: bytes | bytearray = b""
         self._have_full_package: bool = False
         self._got_new_sequence: bool = False
+        self._mtu_rejected: bool = False
         self.have_breezer_state: bool = False
 
+        # header
+        self._package_size: int = 0
+        self._command_type: bytes | bytearray = b""
+        self._request_id: bytes | bytearray = b""
+        self._sent_request_id: bytes | bytearray = b""
+        self._command_number: bytes | bytearray = b""
+        self._last_request_id: int = randrange(0xFFFFFFFF)
+        self.__pending_requests: Deque[bytes] | None = None
+        self.unmatched_responses: int = 0
+        """Count of dropped responses that do not match any sent request"""
+
         # states
         self._light: bool = False
         self._have_heater: bool = False
 
+    @final
+    @property
+    def _pending_requests(self) -> Deque[bytes]:
+        """Ids of sent requests that wait for response. Created with the first request"""
+        if self.__pending_requests is None:
+            self.__pending_requests = deque(maxlen=self.MAX_PENDING_REQUESTS)
+        return self.__pending_requests
+
     @final
     @property
     def light(self) -> str:
@@ -55,22 +120,73 @@ class TionLiteFamily(Tion):
         self._light = self._encode_state(new_state)
 
     @final
-    @property
-    def random(self) -> bytes:
-        # return random hex number.
-        return randrange(0xFF)
+    def _build_command(self, template: bytes, random_byte: bool = False, random_filler: bool = False) -> bytearray:
+        """
+        Command from preassembled template: new request id is written to [7:11], random byte to [4] and random filler
+        to [11:15] if requested. Model-specific fields are patched by caller
+        :param template: immutable command with zeroes in variable fields
+        """
+        command = bytearray(template)
+        command[7:11] = self._new_request_id()
+        if random_byte or random_filler:
+            random = _random_pool.take(5)
+            if random_byte:
+                command[4] = random[4]
+            if random_filler:
+                command[11:15] = random[:4]
+        return command
 
     @final
-    @property
-    def random4(self) -> list:
-        # return 4 random hex.
-        return [self.random, self.random, self.random, self.random]
+    def _new_request_id(self) -> bytes:
+        """
+        Generate unique id for the new request and wait for response with it
+        :return: 4 bytes of request id
+        """
+        self._last_request_id = (self._last_request_id + 1) & 0xFFFFFFFF
+        self._sent_request_id = self._last_request_id.to_bytes(4, byteorder='little')
+        self._pending_requests.append(self._sent_request_id)
+        return self._sent_request_id
+
+    @final
+    def _decode_header(self, header: bytearray):
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Header is %s", bytes(header).hex())
+        self._package_size = int.from_bytes(header[1:3], byteorder='little', signed=False)
+        if header[3] != self.MAGIC_NUMBER:
+            _LOGGER.error("Got wrong magic number at position 3")
+            raise TionException("_decode_header", "wrong magic number")
+        self._command_type = reversed(header[5:7])
+        self._request_id = header[7:11]  # must match self._sent_request_id
+        self._command_number = header[11:15]
+
+    @final
+    def _match_response(self) -> bool:
+        """
+        Check that collected response is an answer to one of sent requests
+        :return: True if response matches pending request
+        """
+        try:
+            self._decode_header(self._header)
+        except (TionException, IndexError) as e:
+            _LOGGER.warning("Dropping response with bad header %s: %s", bytes(self._header).hex(), e)
+            self.unmatched_responses += 1
+            return False
+
+        request_id = bytes(self._request_id)
+        if request_id not in self._pending_requests:
+            _LOGGER.warning("Dropping response for unknown or late request %s", request_id.hex())
+            self.unmatched_responses += 1
+            return False
+
+        self._pending_requests.remove(request_id)
+        return True
 
     @final
     def _collect_message(self, package: bytearray) -> bool:
         self._have_full_package = False
 
-        _LOGGER.debug("Got %s from tion", bytes(package).hex())
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Got %s from tion", bytes(package).hex())
 
         if package[0] == self.FIRST_PACKET_ID or package[0] == self.SINGLE_PACKET_ID:
             self._data = package
@@ -99,23 +215,41 @@ class TionLiteFamily(Tion):
             self._header = self._data[:15]
             self._data = self._data[15:-2]
             self._crc = self._data[-2:]
+            self._have_full_package = self._match_response()
 
         return self._have_full_package
 
     @final
-    def split_command(self, request: bytearray) -> List[bytearray]:
+    @property
+    def packet_size(self) -> int:
+        """Size of single packet (packet id included) that we may send with current connection"""
+        if self._mtu_rejected or self.max_packet_size <= self.DEFAULT_PACKET_SIZE:
+            return self.DEFAULT_PACKET_SIZE
+
+        try:
+            mtu = self._btle.mtu_size if self._btle.is_connected else 0
+        except (AttributeError, exc.BleakError):
+            mtu = 0
+
+        return max(self.DEFAULT_PACKET_SIZE, min(self.max_packet_size, mtu - 3))
+
+    @final
+    def split_command(self, request: bytearray, packet_size: int | None = None) -> List[bytearray]:
         def chunks(lst, n):
             """Yield successive n-sized chunks from lst."""
             for j in range(0, len(lst), n):
                 yield lst[j:j + n]
 
+        if packet_size is None:
+            packet_size = self.packet_size
+
         request.pop(0)
 
-        if len(request) < 20:
+        if len(request) < packet_size:
             request.insert(0, self.SINGLE_PACKET_ID)
             return [request]
 
-        result = list(chunks(request, 19))
+        result = list(chunks(request, packet_size - 1))
 
         for i in range(0, len(result)):
             if i == 0:  # First packet
@@ -130,11 +264,49 @@ class TionLiteFamily(Tion):
     @final
     async def _send_request(self, request: bytearray):
         self.have_breezer_state = False
+        packet_size = self.packet_size
+
+        try:
+            await self._write_packets(self.split_command(bytearray(request), packet_size))
+        except MaxTriesExceededError:
+            if packet_size == self.DEFAULT_PACKET_SIZE:
+                raise
+            _LOGGER.warning("Could not write %d-byte packets. Falling back to %d-byte packets",
+                            packet_size, self.DEFAULT_PACKET_SIZE)
+            self._mtu_rejected = True
+            await self._write_packets(self.split_command(bytearray(request), self.DEFAULT_PACKET_SIZE))
+
+    @final
+    async def _write_packets(self, packets: List[bytearray]):
+        if self.pipelined_writes and len(packets) > 1:
+            await self._try_write_frame(packets)
+            return
 
-        for d in self.split_command(request):
-            _LOGGER.debug("Doing write: request=%s", bytes(d).hex())
+        for d in packets:
             await self._try_write(d)
 
+    @final
+    @retry(retries=3)
+    async def _try_write_frame(self, packets: List[bytearray]):
+        """
+        Write all packets of request back-to-back without waiting for each one.
+        Writes are queued in packets order. Any failure resends request starting from the first packet, so breezer
+        drops partially received request and never gets a half-written one.
+
+        :param packets: packets from split_command
+        """
+        _LOGGER.debug("Writing %d packets to %s", len(packets), self.uuid_write)
+        tracing.annotate(packets=len(packets))
+        for p in packets:
+            self._recorder.record(FlightRecorder.WRITE, p)
+        results = await asyncio.gather(
+            *[self._btle.write(self.uuid_write, p, False) for p in packets],
+            return_exceptions=True
+        )
+        for r in results:
+            if isinstance(r, BaseException):
+                raise r
+
     async def _pair(self):
         """Lite family breezers is not require special pairing procedure"""
         return
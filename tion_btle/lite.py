@@ -11,18 +11,16 @@ else:
     from .tion import TionException
     from .light_family import TionLiteFamily
 
-logging.basicConfig(level=logging.DEBUG)
 _LOGGER = logging.getLogger(__name__)
 
 
 class TionLite(TionLiteFamily):
 
-    def __init__(self, mac: str | BLEDevice):
-        super().__init__(mac)
-        self._package_size: bytearray = bytearray()
-        self._command_type: bytearray = bytearray()
-        self._request_id: bytearray = bytearray()
-        self._sent_request_id: bytearray = bytearray()
+    __slots__ = ("_filter_change_required", "_co2_auto_control", "_electronic_temp", "_electronic_work_time",
+                 "_device_work_time")
+
+    def __init__(self, mac: str | BLEDevice, **kwargs):
+        super().__init__(mac, **kwargs)
 
         if mac == "dummy":
             _LOGGER.info("Dummy mode!")
@@ -36,6 +34,16 @@ class TionLite(TionLiteFamily):
         self._device_work_time: float = 0
         self._error_code: int = 0
 
+    _STATUS_COMMAND = bytes([TionLiteFamily.SINGLE_PACKET_ID, 0x10, 0x00, TionLiteFamily.MAGIC_NUMBER, 0x02, 0x32, 0x12,
+                             0, 0, 0, 0, 0x48, 0xd3, 0xc3, 0x1a, 0xbb, 0xaa])
+    """State request template, request id is at [7:11]"""
+    _SET_COMMAND = bytes([0x00, 0x1e, 0x00, TionLiteFamily.MAGIC_NUMBER, 0, 0x30, 0x12, 0, 0, 0, 0, 0, 0, 0, 0,
+                          0, 0x00, 0, 0, 0, 0x0a, 0x14, 0x19, 0x02, 0x04, 0x06, 0x60, 0x00, 0x00, 0xbb, 0xaa])
+    """
+    Set request template: random byte at [4], request id at [7:11], random filler at [11:15], state bits at [15],
+    sb at [16], tb at [17], heater temperature at [18] and fan speed at [19]. Presets and lb follow
+    """
+
     @property
     def REQUEST_PARAMS(self) -> list:
         return [0x32, 0x12]
@@ -48,30 +56,13 @@ class TionLite(TionLiteFamily):
     def REQUEST_DEVICE_INFO(self) -> list:
         return [0x09, TionLiteFamily.MIDDLE_PACKET_ID]
 
-    def _decode_header(self, header: bytearray):
-        _LOGGER.debug("Header is %s", bytes(header).hex())
-        self._package_size = int.from_bytes(header[1:2], byteorder='big', signed=False)
-        if header[3] != self.MAGIC_NUMBER:
-            _LOGGER.error("Got wrong magic number at position 3")
-            raise Exception("wrong magic number")
-        self._command_type = reversed(header[5:6])
-        self._request_id = header[7:10]  # must match self._sent_request_id
-        self._command_number = header[11:14]
-
     @property
     def command_getStatus(self) -> bytearray:
-        def generate_request_id() -> bytearray:
-            self._sent_request_id = bytearray([0x0d, 0xd7, 0x1f, 0x8f])
-            return self._sent_request_id
-
-        generate_request_id()
-        packet_size = 0x10  # 17 bytes
-        return bytearray(
-            [self.SINGLE_PACKET_ID, packet_size, 0x00, self.MAGIC_NUMBER, 0x02] + self.REQUEST_PARAMS + list(
-                self._sent_request_id) + [0x48, 0xd3, 0xc3, 0x1a] + self.CRC)
+        return self._build_command(self._STATUS_COMMAND)
 
     def _decode_response(self, response: bytearray):
-        _LOGGER.debug("Data is %s", bytes(response).hex())
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Data is %s", bytes(response).hex())
         try:
             self._state = response[0] & 1
             self._sound = response[0] >> 1 & 1
@@ -112,29 +103,17 @@ class TionLite(TionLiteFamily):
             "light": self.light,
         }
 
-    @property
-    def __presets(self) -> list:
-        return [0x0a, 0x14, 0x19, 0x02, 0x04, 0x06]
-
     def _encode_request(self, request: dict) -> bytearray:
-        def encode_state():
-            result = \
-                self._encode_state(request["state"]) | \
-                (self._encode_state(request["sound"]) << 1) | \
-                (self._encode_state(request["light"]) << 2) | \
-                (self._encode_state(request["heater"]) << 4)
-            return result
-
-        sb = 0x00  # ??
-        tb = 0x02 if (self.heater_temp > 0 or self.fan_speed > 0) else 0x01
-        lb = [0x60, 0x00] if sb == 0 else [0x00, 0x00]
-
-        return bytearray(
-            [0x00, 0x1e, 0x00, self.MAGIC_NUMBER, self.random] +
-            self.SET_PARAMS + self.random4 + self.random4 +
-            [encode_state(), sb, tb, int(request["heater_temp"]), int(request["fan_speed"])] +
-            self.__presets + lb + [0x00] + self.CRC
-        )
+        # sb is always 0, so lb in the template is [0x60, 0x00]
+        command = self._build_command(self._SET_COMMAND, random_byte=True, random_filler=True)
+        command[15] = self._encode_state(request["state"]) | \
+            (self._encode_state(request["sound"]) << 1) | \
+            (self._encode_state(request["light"]) << 2) | \
+            (self._encode_state(request["heater"]) << 4)
+        command[17] = 0x02 if (self.heater_temp > 0 or self.fan_speed > 0) else 0x01
+        command[18] = int(request["heater_temp"])
+        command[19] = int(request["fan_speed"])
+        return command
 
     @property
     def _packages(self) -> list:
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sys
+from typing import Awaitable, Callable, Dict, Iterable, List, TextIO, Tuple
+
+from bleak import exc
+
+if __package__ == "":
+    from tion_btle import clock
+    from tion_btle.command_queue import Priority
+    from tion_btle.latency import percentile
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError
+    from tion_btle.tracing import Span, Tracer
+else:
+    from . import clock
+    from .command_queue import Priority
+    from .latency import percentile
+    from .tion import Tion, TionException, MaxTriesExceededError
+    from .tracing import Span, Tracer
+
+_LOGGER = logging.getLogger(__name__)
+
+ERRORS = (TionException, MaxTriesExceededError, exc.BleakError, OSError, asyncio.TimeoutError)
+"""Failures of single request that are reported instead of stopping the monitor"""
+PERCENTILES = (50, 90, 99)
+
+
+class Monitor:
+    """
+    Polls many breezers under concurrency limit and writes one compact JSON line per state change.
+
+    Poll line: {"ts": 1700000000.0, "mac": ..., "model": ..., "op": "get", "latency": 0.42, "retries": 0,
+    "changed": {...}}. First poll of the device reports full state in "changed". Failed request has "error" instead
+    of "changed". "latency" is time from the start of the request to the result, waiting for the concurrency limit is
+    not included. "retries" counts reconnects and request resends of devices created with monitor tracer, for other
+    devices only resends after lost responses are known.
+    """
+
+    def __init__(self, devices: Iterable[Tion], output: TextIO | None = None, interval: float = 60,
+                 concurrency: int = 4, timeout: float | None = 30, every: bool = False):
+        """
+        :param devices: breezers to poll
+        :param output: stream for JSON lines, stdout by default
+        :param interval: seconds between polls of each device
+        :param concurrency: how many requests are made at the same time
+        :param timeout: timeout of each request in seconds
+        :param every: write line for every poll, not only for changes
+        """
+        self.devices: List[Tion] = list(devices)
+        self.output = output
+        self.interval = interval
+        self.timeout = timeout
+        self.every = every
+        self.tracer = Tracer(self._export)
+        """Pass to devices to get exact retry counts"""
+        self.concurrency = concurrency
+        self.__radio: asyncio.Semaphore | None = None
+        self._states: Dict[str, dict] = {}
+        self._retries: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+
+    @property
+    def _radio(self) -> asyncio.Semaphore:
+        # created in the running loop: on Python 3.9 semaphore is bound to the loop that exists when it is created
+        if self.__radio is None:
+            self.__radio = asyncio.Semaphore(self.concurrency)
+        return self.__radio
+
+    def _export(self, span: Span) -> None:
+        device = span.attributes.get("device")
+        if span.parent_id is not None:
+            # spans of retry wrappers and resends have attempt number, first attempt is not a retry. Waiting for
+            # response of resent request is a part of the resend
+            if span.attributes.get("attempt", 1) > 1 and span.name != "wait_response":
+                self._pending[span.trace_id] = self._pending.get(span.trace_id, 0) + 1
+            return
+        if device is not None:
+            self._retries[device] = self._pending.pop(span.trace_id, 0)
+
+    def emit(self, record: dict) -> None:
+        output = sys.stdout if self.output is None else self.output
+        output.write(json.dumps(record, separators=(",", ":"), default=str))
+        output.write("\n")
+        output.flush()
+
+    async def measure(self, tion: Tion, request: Callable[[], Awaitable]) -> Tuple[object, str | None, float, int]:
+        """
+        Make request under concurrency limit
+        :param tion: device of the request
+        :param request: starts the request
+        :return: result, error message, latency in seconds and count of retries
+        """
+        async with self._radio:
+            timeouts = tion.latency_stats["timeouts"]
+            self._retries.pop(tion.mac, None)
+            started = clock.monotonic()
+            result = error = None
+            try:
+                result = await request()
+            except TionException as e:
+                error = e.message
+            except ERRORS as e:
+                error = str(e) or e.__class__.__name__
+            latency = clock.monotonic() - started
+        retries = self._retries.pop(tion.mac, None)
+        if retries is None:
+            retries = tion.latency_stats["timeouts"] - timeouts
+        return result, error, latency, retries
+
+    def _record(self, tion: Tion, op: str, latency: float, retries: int) -> dict:
+        return {"ts": round(clock.get_clock().time(), 3), "mac": tion.mac, "model": tion.model, "op": op,
+                "latency": round(latency, 4), "retries": retries}
+
+    async def poll(self, tion: Tion) -> dict | None:
+        """
+        Read state of the device once
+        :return: written line or None if state did not change
+        """
+        state, error, latency, retries = await self.measure(
+            tion, lambda: tion.get(priority=Priority.POLL, timeout=self.timeout))
+        record = self._record(tion, "get", latency, retries)
+        if error is not None:
+            record["error"] = error
+        else:
+            old = self._states.get(tion.mac, {})
+            changed = {k: v for k, v in state.items() if old.get(k) != v and k != "time"}
+            self._states[tion.mac] = state
+            if not changed and not self.every:
+                return None
+            record["changed"] = changed
+        self.emit(record)
+        return record
+
+    async def _watch(self, tion: Tion, rounds: int | None) -> None:
+        done = 0
+        while rounds is None or done < rounds:
+            await self.poll(tion)
+            done += 1
+            if rounds is None or done < rounds:
+                await clock.sleep(self.interval)
+
+    async def run(self, rounds: int | None = None) -> None:
+        """
+        Poll all devices
+        :param rounds: how many polls of each device are made, forever if None
+        """
+        await asyncio.gather(*(self._watch(tion, rounds) for tion in self.devices))
+
+    async def _bench_device(self, tion: Tion, cycles: int) -> Dict[str, _OpStats]:
+        stats = {"get": _OpStats(), "set": _OpStats()}
+
+        async def run(op: str, request: Callable[[], Awaitable]):
+            result, error, latency, retries = await self.measure(tion, request)
+            stats[op].add(latency, error, retries)
+            if error is not None:
+                _LOGGER.info("%s of %s failed: %s", op, tion.mac, error)
+            return result
+
+        for _ in range(cycles):
+            state = await run("get", lambda: tion.get(priority=Priority.INTERACTIVE, timeout=self.timeout))
+            if state is None:
+                continue
+            # writes current fan speed back, so benchmark does not change anything
+            await run("set", lambda: tion.set({"fan_speed": state["fan_speed"]}, timeout=self.timeout))
+        return stats
+
+    async def bench(self, cycles: int) -> List[dict]:
+        """
+        Make get and set requests to every device and write latency percentiles of each device and operation, then
+        of all devices ("mac": "*")
+        :param cycles: get/set pairs for each device
+        :return: written lines
+        """
+        per_device = await asyncio.gather(*(self._bench_device(tion, cycles) for tion in self.devices))
+        summaries = []
+        total = {"get": _OpStats(), "set": _OpStats()}
+        for tion, stats in zip(self.devices, per_device):
+            for op, op_stats in stats.items():
+                summaries.append({"mac": tion.mac, "model": tion.model, "op": op, **op_stats.as_dict()})
+                total[op].merge(op_stats)
+        summaries += [{"mac": "*", "model": None, "op": op, **op_stats.as_dict()} for op, op_stats in total.items()]
+        for summary in summaries:
+            self.emit(summary)
+        return summaries
+
+
+class _OpStats:
+    """Latencies of successful requests and counts of failures and retries of single operation"""
+    __slots__ = ("latencies", "errors", "retries")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.retries = 0
+
+    def add(self, latency: float, error: str | None, retries: int) -> None:
+        self.retries += retries
+        if error is None:
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+
+    def merge(self, other: _OpStats) -> None:
+        self.latencies += other.latencies
+        self.errors += other.errors
+        self.retries += other.retries
+
+    def as_dict(self) -> dict:
+        result = {"count": len(self.latencies), "errors": self.errors, "retries": self.retries}
+        for q in PERCENTILES:
+            value = percentile(self.latencies, q)
+            result[f"p{q}"] = None if value is None else round(value, 4)
+        result["max"] = round(max(self.latencies), 4) if self.latencies else None
+        return result
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterable, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
+
+from bleak import BleakScanner, exc
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+if __package__ == "":
+    from tion_btle import clock
+    from tion_btle.factory import create_tion, model_from_advertisement
+    from tion_btle.storage import JsonStore
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError
+else:
+    from . import clock
+    from .factory import create_tion, model_from_advertisement
+    from .storage import JsonStore
+    from .tion import Tion, TionException, MaxTriesExceededError
+
+_LOGGER = logging.getLogger(__name__)
+
+Candidate = Union[str, BLEDevice, Tuple[BLEDevice, AdvertisementData], Tion]
+"""MAC, BLEDevice, scanner result or ready Tion instance"""
+
+PAIRED = "paired"
+FAILED = "failed"
+
+
+class ProvisionResult(NamedTuple):
+    mac: str
+    model: str | None
+    status: str
+    """PAIRED or FAILED"""
+    attempts: int
+    time: float
+    """Unix time of the last attempt"""
+    duration: float
+    """Seconds from the first attempt to result"""
+    error: str | None
+
+
+class Manifest(JsonStore):
+    """Provisioning results by MAC, stored on disk after each result"""
+
+    def record(self, result: ProvisionResult):
+        self.data[result.mac] = result._asdict()
+        self.save()
+
+    def get(self, mac: str) -> ProvisionResult | None:
+        record = self.data.get(mac.upper())
+        try:
+            return None if record is None else ProvisionResult(**record)
+        except TypeError:
+            _LOGGER.warning("Skipping bad manifest record for %s", mac)
+            return None
+
+    def paired(self, mac: str) -> bool:
+        result = self.get(mac)
+        return result is not None and result.status == PAIRED
+
+
+async def scan(duration: float | None = None, **scanner_kwargs) -> AsyncIterable[Tuple[BLEDevice, AdvertisementData]]:
+    """
+    Stream of breezers around, each device is reported once
+    :param duration: scan time in seconds. None to scan until consumer stops
+    :param scanner_kwargs: arguments for BleakScanner, for example adapter
+    """
+    found: asyncio.Queue = asyncio.Queue()
+    seen = set()
+
+    def detected(device: BLEDevice, advertisement: AdvertisementData):
+        if device.address in seen:
+            return
+        if model_from_advertisement(advertisement.local_name, advertisement.service_uuids) is None:
+            return
+        seen.add(device.address)
+        found.put_nowait((device, advertisement))
+
+    deadline = None if duration is None else clock.monotonic() + duration
+    async with BleakScanner(detection_callback=detected, **scanner_kwargs):
+        while deadline is None or clock.monotonic() < deadline:
+            try:
+                yield await asyncio.wait_for(found.get(), None if deadline is None else deadline - clock.monotonic())
+            except asyncio.TimeoutError:
+                break
+
+
+class Provisioner:
+    """
+    Pairs many breezers concurrently.
+
+    Candidate that could not be paired (usually because its pairing button was not pressed yet) is retried after
+    retry_delay seconds until attempts are exhausted. Every result is written to manifest, devices already paired
+    according to manifest are skipped, so interrupted run may be restarted with the same candidates.
+    """
+
+    def __init__(self, manifest: Manifest | str | os.PathLike | None = None, concurrency: int = 3, attempts: int = 10,
+                 retry_delay: float = 10, pair_timeout: float | None = 30,
+                 factory: Callable[[Candidate], Awaitable[Tion]] | None = None, **kwargs):
+        """
+        :param manifest: Manifest or path to its file
+        :param concurrency: how many devices are paired at the same time
+        :param attempts: pair attempts for each device
+        :param retry_delay: seconds between attempts
+        :param pair_timeout: timeout of single attempt in seconds
+        :param factory: creates Tion for candidate. create_tion is used if not provided
+        :param kwargs: arguments for create_tion, for example cache or transport
+        """
+        if manifest is not None and not isinstance(manifest, Manifest):
+            manifest = Manifest(manifest)
+        self.manifest = manifest
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self.pair_timeout = pair_timeout
+        self._factory = factory or self._create
+        self._kwargs = kwargs
+        self.concurrency = concurrency
+        self.__radio: asyncio.Semaphore | None = None
+        self._started: Dict[str, asyncio.Task] = {}
+        self.results: List[ProvisionResult] = []
+
+    @property
+    def _radio(self) -> asyncio.Semaphore:
+        # created in the running loop: on Python 3.9 semaphore is bound to the loop that exists when it is created
+        if self.__radio is None:
+            self.__radio = asyncio.Semaphore(self.concurrency)
+        return self.__radio
+
+    @staticmethod
+    def _mac(candidate: Candidate) -> str:
+        if isinstance(candidate, tuple):
+            candidate = candidate[0]
+        if isinstance(candidate, (BLEDevice, Tion)):
+            return (candidate.address if isinstance(candidate, BLEDevice) else candidate.mac).upper()
+        return candidate.upper()
+
+    async def _create(self, candidate: Candidate) -> Tion:
+        if isinstance(candidate, Tion):
+            return candidate
+        if isinstance(candidate, tuple):
+            return await create_tion(candidate[0], candidate[1], **self._kwargs)
+        return await create_tion(candidate, **self._kwargs)
+
+    async def _provision(self, mac: str, candidate: Candidate) -> ProvisionResult:
+        started = clock.monotonic()
+        model = None
+        error = None
+        attempt = 0
+        while attempt < self.attempts:
+            attempt += 1
+            try:
+                async with self._radio:
+                    tion = await self._factory(candidate)
+                    model = tion.model
+                    await tion.pair(timeout=self.pair_timeout)
+                result = ProvisionResult(mac, model, PAIRED, attempt, time.time(), clock.monotonic() - started, None)
+                break
+            except (TionException, MaxTriesExceededError, exc.BleakError, OSError, asyncio.TimeoutError) as e:
+                error = getattr(e, "message", None) or str(e) or type(e).__name__
+                _LOGGER.info("Could not pair %s (attempt %d/%d): %s", mac, attempt, self.attempts, error)
+                if attempt < self.attempts:
+                    # radio is free for other devices while we wait for this one
+                    await clock.sleep(self.retry_delay)
+        else:
+            result = ProvisionResult(mac, model, FAILED, attempt, time.time(), clock.monotonic() - started, error)
+
+        _LOGGER.info("%s: %s after %d attempts", mac, result.status, result.attempts)
+        self.results.append(result)
+        if self.manifest is not None:
+            self.manifest.record(result)
+        return result
+
+    def submit(self, candidate: Candidate) -> asyncio.Task | None:
+        """
+        Start provisioning of candidate
+        :return: task with ProvisionResult or None if device is already paired or in progress
+        """
+        mac = self._mac(candidate)
+        if mac in self._started:
+            return None
+        if self.manifest is not None and self.manifest.paired(mac):
+            _LOGGER.debug("%s is already paired", mac)
+            return None
+        task = self._started[mac] = asyncio.create_task(self._provision(mac, candidate))
+        return task
+
+    async def run(self, candidates: Iterable[Candidate] | AsyncIterable[Candidate]) -> List[ProvisionResult]:
+        """
+        Provision all candidates
+        :param candidates: list of candidates or stream, for example scan()
+        :return: results of this run
+        """
+        tasks = []
+        if hasattr(candidates, "__aiter__"):
+            async for candidate in candidates:
+                tasks.append(self.submit(candidate))
+        else:
+            tasks = [self.submit(candidate) for candidate in candidates]
+
+        return list(await asyncio.gather(*(t for t in tasks if t is not None)))
+
+    def summary(self) -> dict:
+        paired = [r for r in self.results if r.status == PAIRED]
+        return {
+            "paired": len(paired),
+            "failed": len(self.results) - len(paired),
+            "mean_attempts": sum(r.attempts for r in paired) / len(paired) if paired else 0.0,
+            "mean_duration": sum(r.duration for r in paired) / len(paired) if paired else 0.0,
+        }
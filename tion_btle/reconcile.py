@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict
+
+from bleak import exc
+
+if __package__ == "":
+    from tion_btle import clock
+    from tion_btle.command_queue import Priority
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError
+else:
+    from . import clock
+    from .command_queue import Priority
+    from .tion import Tion, TionException, MaxTriesExceededError
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def drift(desired: dict, state: dict) -> dict:
+    """
+    Fields of desired settings that differ from the breezer state
+    :param desired: settings in set() format
+    :param state: result of get()
+    :return: settings that should be written
+    """
+    if desired.get("fan_speed") == 0:
+        # same as in set(): zero speed means turned off breezer
+        desired = {k: v for k, v in desired.items() if k != "fan_speed"}
+        desired["state"] = "off"
+    return {k: v for k, v in desired.items() if state.get(k) != v}
+
+
+class ReconcileStats:
+    def __init__(self):
+        self.checks: int = 0
+        self.writes: int = 0
+        self.failures: int = 0
+        self.fields_written: int = 0
+        self.convergences: int = 0
+        self.total_convergence_time: float = 0.0
+        self.max_convergence_time: float = 0.0
+        self.last_convergence_time: float | None = None
+
+    def add_convergence(self, duration: float):
+        self.convergences += 1
+        self.total_convergence_time += duration
+        self.max_convergence_time = max(self.max_convergence_time, duration)
+        self.last_convergence_time = duration
+
+    def as_dict(self) -> dict:
+        return {
+            "checks": self.checks,
+            "writes": self.writes,
+            "failures": self.failures,
+            "fields_written": self.fields_written,
+            "convergences": self.convergences,
+            "mean_convergence_time":
+                self.total_convergence_time / self.convergences if self.convergences else 0.0,
+            "max_convergence_time": self.max_convergence_time,
+            "last_convergence_time": self.last_convergence_time,
+        }
+
+
+class Reconciler:
+    """
+    Keeps breezer in desired state.
+
+    Every check reads breezer state and writes only fields that differ from desired settings, so breezer changed by
+    remote control or reset by power cut is brought back with a minimal write. Failed checks are repeated with
+    exponential backoff.
+    """
+
+    def __init__(self, tion: Tion, desired: dict | None = None, interval: float = 60,
+                 priority: Priority = Priority.SCHEDULED, min_backoff: float = 5, max_backoff: float = 600,
+                 timeout: float | None = None):
+        """
+        :param tion: breezer
+        :param desired: desired settings in set() format
+        :param interval: seconds between checks of converged breezer
+        :param priority: priority of get and set requests in device command queue
+        :param min_backoff: delay after the first failed check in seconds
+        :param max_backoff: maximal delay between failed checks in seconds
+        :param timeout: timeout of each get and set request in seconds
+        """
+        self.tion = tion
+        self.interval = interval
+        self.priority = priority
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.stats = ReconcileStats()
+        self._desired: Dict[str, object] = dict(desired or {})
+        self._diverged_at: float | None = clock.monotonic() if self._desired else None
+        self._failures: int = 0
+        # created by run() in the running loop: on Python 3.9 event is bound to the loop that exists when it is created
+        self._changed: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def desired(self) -> dict:
+        return dict(self._desired)
+
+    @desired.setter
+    def desired(self, settings: dict):
+        self._desired = dict(settings)
+        self._desire_changed()
+
+    def update(self, settings: dict):
+        """Change some of desired settings"""
+        self._desired.update(settings)
+        self._desire_changed()
+
+    def _desire_changed(self):
+        if self._diverged_at is None:
+            self._diverged_at = clock.monotonic()
+        self._failures = 0
+        if self._changed is not None:
+            self._changed.set()
+
+    @property
+    def converged(self) -> bool:
+        """Breezer state matched desired settings at the last check"""
+        return self._diverged_at is None
+
+    async def check(self) -> dict:
+        """
+        Read breezer state and write drifted fields
+        :return: written settings, empty if breezer is in desired state
+        """
+        self.stats.checks += 1
+        state = await self.tion.get(priority=self.priority, timeout=self.timeout)
+        changes = drift(self._desired, state)
+        now = clock.monotonic()
+
+        if not changes:
+            if self._diverged_at is not None:
+                self.stats.add_convergence(now - self._diverged_at)
+                _LOGGER.debug("%s converged in %.1fs", self.tion.mac, now - self._diverged_at)
+                self._diverged_at = None
+            return changes
+
+        if self._diverged_at is None:
+            _LOGGER.info("%s drifted: %s", self.tion.mac, changes)
+            self._diverged_at = now
+
+        self.stats.writes += 1
+        self.stats.fields_written += len(changes)
+        await self.tion.set(changes, priority=self.priority, timeout=self.timeout)
+        return changes
+
+    @property
+    def next_delay(self) -> float:
+        """Seconds until the next check"""
+        if self._failures:
+            return min(self.max_backoff, self.min_backoff * 2 ** (self._failures - 1))
+        # written state is verified by the next check without waiting for the whole interval
+        return self.interval if self.converged else self.min_backoff
+
+    async def run(self):
+        """Check breezer until cancelled. Change of desired settings triggers immediate check"""
+        self._changed = asyncio.Event()
+        while True:
+            self._changed.clear()
+            try:
+                await self.check()
+                self._failures = 0
+            except (TionException, MaxTriesExceededError, exc.BleakError, OSError) as e:
+                self._failures += 1
+                self.stats.failures += 1
+                _LOGGER.warning("Could not reconcile %s: %s. Next try in %.0fs", self.tion.mac, e, self.next_delay)
+            except Exception:
+                # unexpected error must not stop reconciliation silently
+                self._failures += 1
+                self.stats.failures += 1
+                _LOGGER.exception("Unexpected error while reconciling %s. Next try in %.0fs", self.tion.mac,
+                                  self.next_delay)
+
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.next_delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Run checks in background task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
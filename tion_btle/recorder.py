@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from array import array
+from time import monotonic
+from typing import Callable, List
+
+
+class FlightRecorder:
+    """
+    Bounded ring buffer with last raw frames of the device.
+
+    Frames are copied into preallocated arrays, so recording costs a single copy and no allocations. Arrays are
+    allocated with the first frame, so idle device does not pay for them. Frames longer than slot_size are truncated,
+    their original length is kept.
+    """
+    __slots__ = ("size", "slot_size", "_times", "_lengths", "_kinds", "_frames", "_count", "sink")
+    WRITE = 0
+    NOTIFY = 1
+    KINDS = ("write", "notify")
+
+    def __init__(self, size: int = 64, slot_size: int = 20):
+        """
+        :param size: how many last frames we keep
+        :param slot_size: how many bytes of each frame we keep
+        """
+        self.size = size
+        self.slot_size = slot_size
+        self._times: array | None = None
+        self._lengths: array | None = None
+        self._kinds: bytearray | None = None
+        self._frames: bytearray | None = None
+        self._count: int = 0
+        self.sink: Callable[[int, bytes | bytearray], None] | None = None
+        """Optional callback that gets every recorded frame, for example capture writer"""
+
+    def record(self, kind: int, data: bytes | bytearray) -> None:
+        """
+        Store frame
+        :param kind: WRITE or NOTIFY
+        :param data: raw frame
+        """
+        if self._frames is None:
+            self._allocate()
+        i = self._count % self.size
+        length = len(data)
+        stored = length if length < self.slot_size else self.slot_size
+        offset = i * self.slot_size
+
+        self._frames[offset:offset + stored] = memoryview(data)[:stored]
+        self._times[i] = monotonic()
+        self._lengths[i] = length if length < 0xFFFF else 0xFFFF
+        self._kinds[i] = kind
+        self._count += 1
+
+        if self.sink is not None:
+            self.sink(kind, data)
+
+    def _allocate(self) -> None:
+        self._times = array('d', bytes(8 * self.size))
+        self._lengths = array('H', bytes(2 * self.size))
+        self._kinds = bytearray(self.size)
+        self._frames = bytearray(self.size * self.slot_size)
+
+    def __len__(self) -> int:
+        return min(self._count, self.size)
+
+    @property
+    def total(self) -> int:
+        """Count of recorded frames including overwritten ones"""
+        return self._count
+
+    def clear(self) -> None:
+        self._count = 0
+
+    def dump(self) -> List[dict]:
+        """
+        :return: stored frames, oldest first: monotonic time, kind, original length and hex of stored bytes
+        """
+        result = []
+        for n in range(self._count - len(self), self._count):
+            i = n % self.size
+            length = self._lengths[i]
+            offset = i * self.slot_size
+            result.append({
+                "time": self._times[i],
+                "kind": self.KINDS[self._kinds[i]],
+                "length": length,
+                "data": self._frames[offset:offset + min(length, self.slot_size)].hex(),
+            })
+        return result
+
+    def format(self) -> str:
+        """Human-readable dump: one frame per line, time is relative to the last frame"""
+        frames = self.dump()
+        if not frames:
+            return "no frames"
+        last = frames[-1]["time"]
+        return "\n".join(
+            f"{f['time'] - last:+9.3f}s {f['kind']:<6} {f['data']}{'...' if f['length'] > self.slot_size else ''}"
+            for f in frames
+        )
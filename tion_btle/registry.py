@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+from time import monotonic
+from typing import Dict, Iterable, NamedTuple, Set
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RegistryEntry(NamedTuple):
+    device: BLEDevice
+    advertisement: AdvertisementData | None
+    rssi: int | None
+    seen: float
+    """monotonic time of the last advertisement"""
+
+
+class DeviceRegistry:
+    """
+    Keeps fresh BLEDevice objects for known breezers.
+
+    Single long-running BleakScanner feeds all Tion instances that use the registry, so connection may use BLEDevice
+    from the last advertisement instead of scanning for the MAC in every connect.
+    """
+
+    def __init__(self, macs: Iterable[str] = (), max_age: float = 120, **scanner_kwargs):
+        """
+        :param macs: MACs to watch. Tion instances created with this registry are added automatically
+        :param max_age: devices that were not seen for max_age seconds are treated as unknown
+        :param scanner_kwargs: arguments for BleakScanner, for example adapter
+        """
+        self.max_age = max_age
+        self._scanner_kwargs = scanner_kwargs
+        self._scanner: BleakScanner | None = None
+        self._watched: Set[str] = {m.upper() for m in macs}
+        self._entries: Dict[str, RegistryEntry] = {}
+
+    async def start(self):
+        """Start scanner"""
+        if self._scanner is not None:
+            return
+        self._scanner = BleakScanner(detection_callback=self.update, **self._scanner_kwargs)
+        await self._scanner.start()
+        _LOGGER.debug("Scanner started for %d devices", len(self._watched))
+
+    async def stop(self):
+        """Stop scanner. Collected devices stay in registry"""
+        if self._scanner is None:
+            return
+        try:
+            await self._scanner.stop()
+        finally:
+            self._scanner = None
+
+    async def __aenter__(self) -> DeviceRegistry:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._scanner is not None
+
+    def watch(self, mac: str):
+        """Add MAC to the list of devices we keep"""
+        self._watched.add(mac.upper())
+
+    def update(self, device: BLEDevice, advertisement: AdvertisementData | None = None):
+        """
+        Store device from advertisement. Used as scanner detection callback, may be called by external scanners too.
+        :param device: detected device
+        :param advertisement: advertisement data
+        """
+        mac = device.address.upper()
+        if self._watched and mac not in self._watched:
+            return
+
+        rssi = advertisement.rssi if advertisement is not None else getattr(device, "rssi", None)
+        self._entries[mac] = RegistryEntry(device, advertisement, rssi, monotonic())
+
+    def entry(self, mac: str) -> RegistryEntry | None:
+        """Last registry entry for MAC if it is fresh enough"""
+        entry = self._entries.get(mac.upper())
+        if entry is None or monotonic() - entry.seen > self.max_age:
+            return None
+        return entry
+
+    def get(self, mac: str) -> BLEDevice | None:
+        """BLEDevice from the last advertisement of MAC if it is fresh enough"""
+        entry = self.entry(mac)
+        return None if entry is None else entry.device
+
+    def rssi(self, mac: str) -> int | None:
+        entry = self.entry(mac)
+        return None if entry is None else entry.rssi
+
+    def __contains__(self, mac: str) -> bool:
+        return self.entry(mac) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -9,7 +9,6 @@ if __package__ == "":
 else:
     from .tion import Tion, TionException
 
-logging.basicConfig(level=logging.DEBUG)
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -20,8 +19,6 @@ class TionS3(Tion):
     write = None
     notify = None
 
-    _btle = None
-
     command_prefix = 61
     command_suffix = 90
 
@@ -29,8 +26,10 @@ class TionS3(Tion):
     command_REQUEST_PARAMS = 1
     command_SET_PARAMS = 2
 
-    def __init__(self, mac: str | BLEDevice):
-        super().__init__(mac)
+    __slots__ = ("_timer", "_time", "_productivity", "_fw_version")
+
+    def __init__(self, mac: str | BLEDevice, **kwargs):
+        super().__init__(mac, **kwargs)
 
         # S3-specific properties
         self._timer: bool = False
@@ -61,7 +60,8 @@ class TionS3(Tion):
         return True
 
     def _decode_response(self, response: bytearray):
-        _LOGGER.debug("Data is %s", bytes(response).hex())
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Data is %s", bytes(response).hex())
         try:
             self._fan_speed = int(list("{:02x}".format(response[2]))[1])
             self._mode = int(list("{:02x}".format(response[2]))[0])
@@ -11,15 +11,24 @@ else:
     from .tion import TionException
     from .light_family import TionLiteFamily
 
-logging.basicConfig(level=logging.DEBUG)
 _LOGGER = logging.getLogger(__name__)
 
 
 class TionS4(TionLiteFamily):
-    def __init__(self, mac: str | BLEDevice):
-        super().__init__(mac)
+    modes = ['outside', 'recirculation']
 
-        self.modes = ['outside', 'recirculation']
+    _STATUS_COMMAND = bytes([TionLiteFamily.SINGLE_PACKET_ID, 0x10, 0x00, TionLiteFamily.MAGIC_NUMBER, 0xa1, 0x32, 0x32,
+                             0, 0, 0, 0, 0, 0, 0, 0, 0xbb, 0xaa])
+    """State request template: request id at [7:11], random filler at [11:15]"""
+    _SET_COMMAND = bytes([0x00, 0x17, 0x00, TionLiteFamily.MAGIC_NUMBER, 0, 0x30, 0x32, 0, 0, 0, 0, 0, 0, 0, 0,
+                          0, 0x00, 0, 0, 0, 0xb5, 0x00, 0xbb, 0xaa])
+    """
+    Set request template: random byte at [4], request id at [7:11], random filler at [11:15], state bits at [15], mode
+    at [17], heater temperature at [18], fan speed at [19] and sign
+    """
+
+    def __init__(self, mac: str | BLEDevice, **kwargs):
+        super().__init__(mac, **kwargs)
 
         if mac == "dummy":
             _LOGGER.info("Dummy mode!")
@@ -38,7 +47,8 @@ class TionS4(TionLiteFamily):
         return [50, 50]  # 0x32 0x32
 
     def _decode_response(self, response: bytearray):
-        _LOGGER.debug("Data is %s", bytes(response).hex())
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Data is %s", bytes(response).hex())
         try:
             self._mode = response[2]
             self._heater_temp = response[3]
@@ -62,28 +72,18 @@ class TionS4(TionLiteFamily):
         }
 
     def _encode_request(self, request: dict) -> bytearray:
-        def encode_state() -> int:
-            """Encode different device states to single status int"""
-            #   power   sound   light   heater  true    resetSettings   resetErrorCounter   resetFilterResource
-            #   0       1       2       3       4       5               6                   7
-            return self._encode_state(request["state"]) | \
-                (self._encode_state(request["sound"]) << 1) | \
-                (self._encode_state(request["light"]) << 2) | \
-                ((not self._encode_state(request["heater"])) << 3) | \
-                (True << 4)
-        try:
-            sign = 181
-        except KeyError:
-            sign = 0
-
-        return bytearray([0x00, 0x17, 0x00, self.MAGIC_NUMBER, self.random] +
-                         self.SET_PARAMS + self.random4 + self.random4 +
-                         [
-                             encode_state(), 0x00, self._encode_mode(request["mode"]), int(request["heater_temp"]),
-                             int(request["fan_speed"])
-                         ] +
-                         list(sign.to_bytes(2, byteorder='little')) + self.CRC
-                         )
+        command = self._build_command(self._SET_COMMAND, random_byte=True, random_filler=True)
+        #   power   sound   light   heater  true    resetSettings   resetErrorCounter   resetFilterResource
+        #   0       1       2       3       4       5               6                   7
+        command[15] = self._encode_state(request["state"]) | \
+            (self._encode_state(request["sound"]) << 1) | \
+            (self._encode_state(request["light"]) << 2) | \
+            ((not self._encode_state(request["heater"])) << 3) | \
+            (True << 4)
+        command[17] = self._encode_mode(request["mode"])
+        command[18] = int(request["heater_temp"])
+        command[19] = int(request["fan_speed"])
+        return command
 
     @property
     def _packages(self) -> list:
@@ -96,8 +96,4 @@ class TionS4(TionLiteFamily):
 
     @property
     def command_getStatus(self) -> bytearray:
-        return bytearray([TionLiteFamily.SINGLE_PACKET_ID, 0x10, 0x00, self.MAGIC_NUMBER, 0xa1] +
-                         self.REQUEST_PARAMS +
-                         self.random4 + self.random4 +
-                         self.CRC
-                         )
+        return self._build_command(self._STATUS_COMMAND, random_filler=True)
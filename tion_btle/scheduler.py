@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional
+
+from bleak import exc
+
+if __package__ == "":
+    from tion_btle import clock
+    from tion_btle.command_queue import Priority
+    from tion_btle.latency import percentile
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError
+else:
+    from . import clock
+    from .command_queue import Priority
+    from .latency import percentile
+    from .tion import Tion, TionException, MaxTriesExceededError
+
+_LOGGER = logging.getLogger(__name__)
+
+Trigger = Callable[[float], Optional[float]]
+"""Gets unix time and returns unix time of the next run after it, None if there are no more runs"""
+
+OK = "ok"
+ERROR = "error"
+MISSED = "missed"
+
+WAKE_UP_INTERVAL = 60
+"""Long waits are split so changes of wall clock are noticed"""
+
+
+class Step(NamedTuple):
+    offset: float
+    """Seconds from the start of the action"""
+    settings: dict
+    """Settings in set() format"""
+
+
+class ActionRecord(NamedTuple):
+    action: str
+    mac: str
+    step: int
+    due: float
+    """Unix time when the step should have been executed"""
+    late: float
+    """Seconds between due time and the end of the write"""
+    duration: float
+    """Seconds the write took"""
+    status: str
+    preconnected: bool
+    """Connection was opened before due time"""
+    error: str | None = None
+
+
+def daily(at: str, days: Iterable[int] | None = None) -> Trigger:
+    """
+    Trigger at local time of day
+    :param at: "HH:MM" or "HH:MM:SS"
+    :param days: weekdays to run on, 0 is Monday. Every day if not provided
+    """
+    parts = [int(p) for p in at.split(":")]
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"Bad time of day {at}, expected HH:MM or HH:MM:SS")
+    time_of_day = datetime.time(*parts)
+    weekdays = None if days is None else frozenset(days)
+
+    def next_run(after: float) -> float | None:
+        day = datetime.datetime.fromtimestamp(after).date()
+        for shift in range(8):
+            date = day + datetime.timedelta(days=shift)
+            due = datetime.datetime.combine(date, time_of_day).timestamp()
+            if due > after and (weekdays is None or date.weekday() in weekdays):
+                return due
+        return None
+
+    return next_run
+
+
+def once(timestamp: float) -> Trigger:
+    """Trigger at given unix time"""
+    def next_run(after: float) -> float | None:
+        return timestamp if timestamp > after else None
+
+    return next_run
+
+
+def ramp(field: str, start: int, stop: int, duration: float, steps: int | None = None) -> List[Step]:
+    """
+    Steps that change integer field evenly from start to stop
+    :param field: setting to change, for example "fan_speed"
+    :param start: value of the first step
+    :param stop: value of the last step, written duration seconds after the first one
+    :param steps: count of steps. One step for every value by default
+    """
+    if steps is None:
+        steps = abs(stop - start) + 1
+    if steps < 2:
+        return [Step(0.0, {field: stop})]
+    return [Step(duration * i / (steps - 1), {field: round(start + (stop - start) * i / (steps - 1))})
+            for i in range(steps)]
+
+
+class Action:
+    """Program of one breezer or a group: steps that are written at trigger time"""
+
+    def __init__(self, name: str, devices: Tion | Iterable[Tion], trigger: Trigger, steps: Iterable[Step] | dict):
+        """
+        :param name: unique name of the action
+        :param devices: breezer or group of breezers
+        :param trigger: when the action runs, for example daily("07:00")
+        :param steps: settings or steps with offsets, for example ramp("fan_speed", 1, 4, 600)
+        """
+        self.name = name
+        self.devices: List[Tion] = [devices] if isinstance(devices, Tion) else list(devices)
+        self.trigger = trigger
+        if isinstance(steps, dict):
+            steps = [Step(0.0, steps)]
+        self.steps: List[Step] = sorted(steps, key=lambda step: step.offset)
+        if not self.steps:
+            raise ValueError(f"Action {name} has no steps")
+
+
+class Scheduler:
+    """
+    Runs actions at their trigger times.
+
+    Connection to the breezers of an action is opened `preconnect` seconds before the due time and held until its last
+    step, so writes are not delayed by connect and retries and multi-step ramps use single connection. Every write is
+    recorded with its lateness. Steps that could not start within `misfire` seconds after due time, for example after
+    host suspend, are recorded as missed and not written.
+    """
+
+    def __init__(self, actions: Iterable[Action] = (), preconnect: float = 30, priority: Priority = Priority.SCHEDULED,
+                 timeout: float | None = 60, misfire: float = 300, history: int = 1000,
+                 on_record: Callable[[ActionRecord], None] | None = None):
+        """
+        :param actions: initial actions
+        :param preconnect: seconds before due time to start connecting
+        :param priority: priority of writes in device command queue
+        :param timeout: timeout of each write in seconds
+        :param misfire: how late step may start, in seconds
+        :param history: how many last records are kept
+        :param on_record: gets every new record
+        """
+        self.preconnect = preconnect
+        self.priority = priority
+        self.timeout = timeout
+        self.misfire = misfire
+        self.on_record = on_record
+        self.records: Deque[ActionRecord] = deque(maxlen=history)
+        self._actions: Dict[str, Action] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._started = False
+        for action in actions:
+            self.add(action)
+
+    @property
+    def actions(self) -> List[Action]:
+        return list(self._actions.values())
+
+    def add(self, action: Action) -> Action:
+        """Add action. It is started at once if scheduler is running"""
+        if action.name in self._actions:
+            raise TionException("scheduler", f"Action {action.name} already exists")
+        self._actions[action.name] = action
+        if self._started:
+            self._start(action)
+        return action
+
+    def remove(self, name: str) -> None:
+        """Remove action and cancel its run"""
+        self._actions.pop(name, None)
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    def _start(self, action: Action) -> None:
+        self._tasks[action.name] = asyncio.create_task(self._run(action))
+
+    def start(self):
+        """Run actions in background tasks"""
+        self._started = True
+        for action in self._actions.values():
+            if action.name not in self._tasks or self._tasks[action.name].done():
+                self._start(action)
+
+    async def stop(self):
+        self._started = False
+        tasks = list(self._tasks.values())
+        self._tasks = {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks.values())
+
+    async def _run(self, action: Action):
+        after = clock.get_clock().time()
+        while (due := action.trigger(after)) is not None:
+            await self.run_action(action, due)
+            after = due
+
+    @staticmethod
+    async def _sleep_until_time(target: float) -> None:
+        """Sleep until unix time, checking wall clock at least every WAKE_UP_INTERVAL"""
+        while (delay := target - clock.get_clock().time()) > 0:
+            await clock.sleep(min(delay, WAKE_UP_INTERVAL))
+
+    @staticmethod
+    async def _sleep_until(target: float) -> None:
+        """Sleep until monotonic time"""
+        delay = target - clock.monotonic()
+        if delay > 0:
+            await clock.sleep(delay)
+
+    async def _connect(self, tion: Tion) -> bool:
+        try:
+            await tion.connect(timeout=self.preconnect)
+            return True
+        except (TionException, MaxTriesExceededError, exc.BleakError, OSError, asyncio.TimeoutError) as e:
+            _LOGGER.warning("Could not connect to %s in advance: %s", tion.mac, e)
+            return False
+
+    async def run_action(self, action: Action, due: float) -> List[ActionRecord]:
+        """
+        Run action once
+        :param action: action to run
+        :param due: unix time of the first step
+        :return: records of all writes
+        """
+        await self._sleep_until_time(due - self.preconnect)
+        # steps are timed with monotonic clock from here: the action is short compared to wall clock corrections
+        start = clock.monotonic() + (due - clock.get_clock().time())
+        if start - clock.monotonic() > -self.misfire:
+            connected = await asyncio.gather(*(self._connect(tion) for tion in action.devices))
+        else:
+            connected = [False] * len(action.devices)
+        held = [tion for tion, ok in zip(action.devices, connected) if ok]
+
+        records = []
+        try:
+            for index, step in enumerate(action.steps):
+                await self._sleep_until(start + step.offset)
+                records += await asyncio.gather(*(
+                    self._write(action, tion, index, step, due, start, ok)
+                    for tion, ok in zip(action.devices, connected)))
+        finally:
+            await asyncio.gather(*(tion.disconnect() for tion in held), return_exceptions=True)
+        return records
+
+    async def _write(self, action: Action, tion: Tion, index: int, step: Step, due: float, start: float,
+                     preconnected: bool) -> ActionRecord:
+        scheduled = start + step.offset
+        started = clock.monotonic()
+        status, error = OK, None
+        if started - scheduled > self.misfire:
+            status = MISSED
+        else:
+            try:
+                await tion.set(step.settings, priority=self.priority, timeout=self.timeout)
+            except TionException as e:
+                status, error = ERROR, e.message
+            except (MaxTriesExceededError, exc.BleakError, OSError, asyncio.TimeoutError) as e:
+                status, error = ERROR, str(e) or e.__class__.__name__
+        finished = clock.monotonic()
+
+        record = ActionRecord(action.name, tion.mac, index, due + step.offset, finished - scheduled,
+                              finished - started, status, preconnected, error)
+        if status != OK:
+            _LOGGER.warning("Step %d of %s for %s %s: %s", index, action.name, tion.mac, status, error)
+        elif record.late > 1:
+            _LOGGER.info("Step %d of %s for %s was %.1fs late", index, action.name, tion.mac, record.late)
+        self.records.append(record)
+        if self.on_record is not None:
+            self.on_record(record)
+        return record
+
+    def summary(self) -> Dict[str, dict]:
+        """Count of writes by status and lateness percentiles of successful writes of every action"""
+        result = {}
+        for name in dict.fromkeys(r.action for r in self.records):
+            records = [r for r in self.records if r.action == name]
+            late = [r.late for r in records if r.status == OK]
+            result[name] = {
+                OK: len(late),
+                ERROR: sum(r.status == ERROR for r in records),
+                MISSED: sum(r.status == MISSED for r in records),
+                "p50_late": percentile(late, 50),
+                "p99_late": percentile(late, 99),
+                "max_late": max(late) if late else None,
+            }
+        return result
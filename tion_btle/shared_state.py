@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Set
+
+from bleak import exc
+
+if __package__ == "":
+    from tion_btle import clock
+    from tion_btle.command_queue import Priority
+    from tion_btle.tion import Tion, TionException, MaxTriesExceededError
+else:
+    from . import clock
+    from .command_queue import Priority
+    from .tion import Tion, TionException, MaxTriesExceededError
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"TIONSHM1"
+HEADER = struct.Struct("<8sII")
+"""Table header: magic, count of slots, slot size"""
+SEQ = struct.Struct("<I")
+RECORD = struct.Struct("<6sBBHHbBfffBBBd")
+"""Slot after sequence number: MAC, model, mode, flags, present optional fields, heater_temp, fan_speed, in_temp,
+out_temp, filter_remain, electronic_temp, productivity, error code, unix time of the state"""
+SLOT_SIZE = 48
+
+MODELS = ("", "S3", "Lite", "S4")
+MODES = ("outside", "recirculation", "mixed")
+FLAGS = ("state", "heater", "heating", "sound", "light", "co2_auto_control", "filter_change_required")
+"""On/off fields, bit number is index in this tuple"""
+OPTIONAL = ("light", "co2_auto_control", "filter_change_required", "electronic_temp", "productivity")
+"""Model specific fields, bit number in present mask is index in this tuple"""
+MAX_READ_TRIES = 1000
+
+
+def _is_on(value) -> bool:
+    return value in ("on", "1", 1, True)
+
+
+class SharedStateTable:
+    """
+    Table of breezer states in shared memory: one fixed-size slot per device.
+
+    Single owner process writes slots, any number of processes read them without locks. Each slot starts with a
+    sequence number that is odd while slot is written (seqlock): reader retries if sequence was odd or changed during
+    read, so it never gets half-written record.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._buf = shm.buf
+        self.owner = owner
+        magic, self.slots, slot_size = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or slot_size != SLOT_SIZE:
+            self.close()
+            raise TionException("SharedStateTable", f"{shm.name} is not a state table")
+        self._index: Dict[bytes, int] = {}
+
+    @classmethod
+    def create(cls, name: str | None = None, slots: int = 64) -> SharedStateTable:
+        """
+        Create table in owner process
+        :param name: shared memory name, random if not provided
+        :param slots: maximal count of devices
+        """
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER.size + slots * SLOT_SIZE)
+        shm.buf[:HEADER.size + slots * SLOT_SIZE] = bytes(HEADER.size + slots * SLOT_SIZE)
+        HEADER.pack_into(shm.buf, 0, MAGIC, slots, SLOT_SIZE)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> SharedStateTable:
+        """Open existing table in reader process"""
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 tracks attached segments too and removes them when reader exits
+            shm = shared_memory.SharedMemory(name=name)
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except (ImportError, AttributeError, KeyError):
+                pass
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def _offset(self, slot: int) -> int:
+        return HEADER.size + slot * SLOT_SIZE
+
+    def _slot(self, mac: bytes) -> int | None:
+        slot = self._index.get(mac)
+        if slot is not None and self._buf[self._offset(slot) + SEQ.size:self._offset(slot) + SEQ.size + 6] == mac:
+            return slot
+
+        for slot in range(self.slots):
+            offset = self._offset(slot) + SEQ.size
+            stored = self._buf[offset:offset + 6]
+            if stored == mac:
+                self._index[mac] = slot
+                return slot
+            if stored == bytes(6):
+                # slots are filled in order
+                break
+        return None
+
+    def _free_slot(self) -> int | None:
+        for slot in range(self.slots):
+            offset = self._offset(slot) + SEQ.size
+            if self._buf[offset:offset + 6] == bytes(6):
+                return slot
+        return None
+
+    def publish(self, mac: str, model: str, state: dict, timestamp: float | None = None) -> None:
+        """
+        Write state of the device. Only owner may publish.
+        :param mac: device MAC
+        :param model: device model
+        :param state: result of get()
+        :param timestamp: unix time of the state, now if not provided
+        :raises TionException: if table is full
+        """
+        key = bytes.fromhex(mac.replace(":", ""))
+        slot = self._slot(key)
+        if slot is None:
+            slot = self._free_slot()
+            if slot is None:
+                raise TionException("SharedStateTable.publish", f"No free slot for {mac}")
+
+        flags = 0
+        for bit, name in enumerate(FLAGS):
+            if _is_on(state.get(name)):
+                flags |= 1 << bit
+        present = 0
+        for bit, name in enumerate(OPTIONAL):
+            if name in state:
+                present |= 1 << bit
+
+        mode = state.get("mode")
+        offset = self._offset(slot)
+        seq = SEQ.unpack_from(self._buf, offset)[0]
+        SEQ.pack_into(self._buf, offset, (seq + 1) & 0xFFFFFFFF)
+        RECORD.pack_into(
+            self._buf, offset + SEQ.size,
+            key, MODELS.index(model) if model in MODELS else 0, MODES.index(mode) if mode in MODES else 0xFF,
+            flags, present, int(state.get("heater_temp", 0)), int(state.get("fan_speed", 0)),
+            float(state.get("in_temp", 0)), float(state.get("out_temp", 0)), float(state.get("filter_remain", 0)),
+            int(state.get("electronic_temp", 0)), int(state.get("productivity", 0)),
+            int(state.get("request_error_code", 0)), time.time() if timestamp is None else timestamp,
+        )
+        SEQ.pack_into(self._buf, offset, (seq + 2) & 0xFFFFFFFF)
+        self._index[key] = slot
+
+    def _read_slot(self, slot: int) -> tuple:
+        offset = self._offset(slot)
+        for _ in range(MAX_READ_TRIES):
+            before = SEQ.unpack_from(self._buf, offset)[0]
+            if before & 1:
+                continue
+            record = RECORD.unpack_from(self._buf, offset + SEQ.size)
+            if SEQ.unpack_from(self._buf, offset)[0] == before:
+                return record
+        raise TionException("SharedStateTable.read", f"Slot {slot} is always being written")
+
+    @staticmethod
+    def _decode(record: tuple) -> dict:
+        (mac, model, mode, flags, present, heater_temp, fan_speed, in_temp, out_temp, filter_remain, electronic_temp,
+         productivity, error_code, updated) = record
+
+        state = {name: "on" if flags >> bit & 1 else "off" for bit, name in enumerate(FLAGS)}
+        state.update({
+            "mode": MODES[mode] if mode < len(MODES) else "unknown",
+            "heater_temp": heater_temp,
+            "fan_speed": fan_speed,
+            "in_temp": in_temp,
+            "out_temp": out_temp,
+            "filter_remain": filter_remain,
+            "electronic_temp": electronic_temp,
+            "productivity": productivity,
+            "request_error_code": error_code,
+            "model": MODELS[model] if model < len(MODELS) else "",
+        })
+        for bit, name in enumerate(OPTIONAL):
+            if not present >> bit & 1:
+                del state[name]
+        state["updated"] = updated
+        return state
+
+    def read(self, mac: str) -> dict | None:
+        """
+        Latest published state of the device
+        :param mac: device MAC
+        :return: state in get() format with "updated" unix time, None if device was not published. On/off fields
+          are always "on" or "off"
+        """
+        slot = self._slot(bytes.fromhex(mac.replace(":", "")))
+        return None if slot is None else self._decode(self._read_slot(slot))
+
+    def read_all(self) -> Dict[str, dict]:
+        """Latest states of all published devices by MAC"""
+        result = {}
+        for slot in range(self.slots):
+            record = self._read_slot(slot)
+            if record[0] == bytes(6):
+                break
+            result[":".join(f"{b:02X}" for b in record[0])] = self._decode(record)
+        return result
+
+    def close(self) -> None:
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Remove shared memory segment. Called by owner when table is not needed anymore"""
+        self._shm.unlink()
+
+    def __enter__(self) -> SharedStateTable:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+
+class StatePublisher:
+    """Polls breezers and publishes their states to shared table"""
+
+    def __init__(self, table: SharedStateTable, tions: Iterable[Tion], interval: float = 60,
+                 timeout: float | None = None):
+        """
+        :param table: table created by this process
+        :param tions: breezers to poll
+        :param interval: seconds between polls
+        :param timeout: timeout of each get request in seconds
+        """
+        self.table = table
+        self.tions: List[Tion] = list(tions)
+        self.interval = interval
+        self.timeout = timeout
+        self.dropped: Set[str] = set()
+        """MACs of breezers that did not fit into the table"""
+        self._task: asyncio.Task | None = None
+
+    async def _publish(self, tion: Tion) -> bool:
+        try:
+            state = await tion.get(priority=Priority.POLL, timeout=self.timeout)
+        except (TionException, MaxTriesExceededError, exc.BleakError, OSError) as e:
+            _LOGGER.warning("Could not get state of %s: %s", tion.mac, e)
+            return False
+        try:
+            self.table.publish(tion.mac, tion.model, state)
+        except TionException as e:
+            # full table must not stop publishing of the devices that have slots
+            if tion.mac not in self.dropped:
+                self.dropped.add(tion.mac)
+                _LOGGER.warning("Could not publish state of %s: %s", tion.mac, e.message)
+            return False
+        return True
+
+    async def publish_once(self) -> int:
+        """
+        Poll all breezers
+        :return: count of published states
+        """
+        results = await asyncio.gather(*(self._publish(tion) for tion in self.tions))
+        return sum(results)
+
+    async def run(self):
+        while True:
+            await self.publish_once()
+            await clock.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._task = None
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from typing import Iterable, List, NamedTuple, Tuple
+
+if __package__ == "":
+    from tion_btle.storage import JsonStore
+else:
+    from .storage import JsonStore
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    mac: str
+    model: str
+    state: dict
+    """Last result of get()"""
+    device: dict
+    """BLEDevice info: address, name, rssi"""
+    timestamp: float
+    """Unix time of the state"""
+    max_age: float
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.timestamp)
+
+    @property
+    def stale(self) -> bool:
+        return self.age > self.max_age
+
+
+class SnapshotStore(JsonStore):
+    """
+    Last known state, model and device info of breezers, stored on disk.
+
+    File is loaded on the first access. Records are written to disk not more often than once per save_interval
+    seconds; call save() before exit to keep the latest records.
+    """
+
+    def __init__(self, path: str | os.PathLike, max_age: float = 600, save_interval: float = 60):
+        """
+        :param path: file path
+        :param max_age: snapshots older than max_age seconds are marked as stale
+        :param save_interval: minimal interval between writes to disk in seconds
+        """
+        super().__init__(path)
+        self.max_age = max_age
+        self.save_interval = save_interval
+        self._dirty: bool = False
+        self._saved_at: float | None = None
+
+    def record(self, mac: str, model: str, state: dict, device: dict | None = None):
+        """
+        Store new state of the device
+        :param mac: device MAC
+        :param model: device model
+        :param state: result of get()
+        :param device: BLEDevice info
+        """
+        self.data[mac.upper()] = {
+            "model": model,
+            "state": state,
+            "device": device or {},
+            "timestamp": time.time(),
+        }
+        self._dirty = True
+        if self._saved_at is None or time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def save(self):
+        super().save()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Save unsaved records"""
+        if self._dirty:
+            self.save()
+
+    def get(self, mac: str) -> Snapshot | None:
+        record = self.data.get(mac.upper())
+        if record is None:
+            return None
+        try:
+            return Snapshot(mac.upper(), record["model"], record["state"], record.get("device", {}),
+                            float(record["timestamp"]), self.max_age)
+        except (KeyError, TypeError, ValueError) as e:
+            _LOGGER.warning("Skipping bad snapshot for %s: %s", mac, e)
+            return None
+
+    def model(self, mac: str) -> str | None:
+        snapshot = self.get(mac)
+        return None if snapshot is None else snapshot.model
+
+    def snapshots(self) -> List[Snapshot]:
+        return [s for s in (self.get(mac) for mac in self.data) if s is not None]
+
+    def refresh_schedule(self, macs: Iterable[str], period: float) -> List[Tuple[str, float]]:
+        """
+        Spread refresh of devices over period: oldest states first, devices without state before all others
+        :param macs: devices to refresh
+        :param period: seconds for refreshing all devices
+        :return: list of (mac, delay in seconds from now)
+        """
+        def age(mac: str) -> float:
+            snapshot = self.get(mac)
+            return float("inf") if snapshot is None else snapshot.age
+
+        ordered = sorted(macs, key=age, reverse=True)
+        step = period / len(ordered) if ordered else 0
+        return [(mac, i * step) for i, mac in enumerate(ordered)]
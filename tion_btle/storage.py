@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class JsonStore:
+    """
+    Dictionary persisted as JSON file.
+
+    File is read on the first access. save() writes temporary file and replaces the old one, so interrupted save never
+    leaves broken file.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self._data: dict | None = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("Could not read %s: %s. Starting with empty store", self.path, e)
+            return {}
+
+        if not isinstance(data, dict):
+            _LOGGER.warning("Unexpected content in %s. Starting with empty store", self.path)
+            return {}
+        return data
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
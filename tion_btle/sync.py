@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Iterator, Type, TypeVar
+
+if __package__ == "":
+    from tion_btle.factory import create_tion
+    from tion_btle.tion import Tion
+else:
+    from .factory import create_tion
+    from .tion import Tion
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LoopThread:
+    """Event loop running forever in background daemon thread"""
+
+    def __init__(self, name: str = "tion_btle"):
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Loop of the thread. Thread is started on the first access"""
+        self.start()
+        return self._loop
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._loop, ready), name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+    def stop(self, timeout: float | None = None):
+        """Stop loop. Running tasks are cancelled"""
+        with self._lock:
+            if not self.running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run(self, aw: Awaitable[T]) -> T:
+        """
+        Run awaitable in the loop and wait for its result
+        :raises RuntimeError: if called from the loop thread, that would block the loop forever
+        """
+        if threading.current_thread() is self._thread:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            raise RuntimeError("Blocking call from event loop thread. Await coroutine instead")
+
+        async def wrapper():
+            return await aw
+
+        future = asyncio.run_coroutine_threadsafe(wrapper(), self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            # for example KeyboardInterrupt in caller thread
+            future.cancel()
+            raise
+
+    def call(self, f: Callable[..., T], *args, **kwargs) -> T:
+        """Call function in the loop thread and wait for its result"""
+        async def wrapper():
+            return f(*args, **kwargs)
+
+        return self.run(wrapper())
+
+
+_default_loop: LoopThread | None = None
+_default_lock = threading.Lock()
+
+
+def default_loop() -> LoopThread:
+    """Loop thread shared by all SyncTion instances that were created without loop"""
+    global _default_loop
+    with _default_lock:
+        if _default_loop is None:
+            _default_loop = LoopThread()
+        return _default_loop
+
+
+class SyncTion:
+    """
+    Blocking interface to Tion for threads without event loop.
+
+    Tion instance lives in background loop thread that is shared by all SyncTion instances, so its command queue and
+    connection are shared too. Methods may be called from any thread.
+    """
+
+    def __init__(self, model: Type[Tion] | Callable[..., Tion], *args, loop: LoopThread | None = None, **kwargs):
+        """
+        :param model: Tion class, for example TionLite, or function that creates instance
+        :param args: arguments for model
+        :param loop: loop thread. Shared default if not provided
+        :param kwargs: keyword arguments for model
+        """
+        self._loop = loop or default_loop()
+        # asyncio objects of Tion must belong to the loop thread
+        self.tion: Tion = self._loop.call(model, *args, **kwargs)
+
+    @classmethod
+    def detect(cls, device, loop: LoopThread | None = None, **kwargs) -> SyncTion:
+        """Create instance of the right model, see create_tion for arguments"""
+        instance = cls.__new__(cls)
+        instance._loop = loop or default_loop()
+        instance.tion = instance._loop.run(create_tion(device, **kwargs))
+        return instance
+
+    def __getattr__(self, item: str) -> Any:
+        # properties of the breezer: mac, model, fan_speed, ...
+        if item == "tion":
+            raise AttributeError(item)
+        return getattr(self.tion, item)
+
+    def get(self, skip_update: bool = False, timeout: float | None = None, **kwargs) -> dict:
+        return self._loop.run(self.tion.get(skip_update=skip_update, timeout=timeout, **kwargs))
+
+    def set(self, new_settings: dict | None = None, timeout: float | None = None, **kwargs) -> None:
+        return self._loop.run(self.tion.set(new_settings, timeout=timeout, **kwargs))
+
+    def pair(self, timeout: float | None = None) -> None:
+        return self._loop.run(self.tion.pair(timeout=timeout))
+
+    def connect(self, timeout: float | None = None) -> None:
+        return self._loop.run(self.tion.connect(timeout=timeout))
+
+    def disconnect(self) -> None:
+        return self._loop.run(self.tion.disconnect())
+
+    @contextlib.contextmanager
+    def session(self, timeout: float | None = None) -> Iterator[SyncTion]:
+        """Keep connection open for several requests"""
+        self.connect(timeout)
+        try:
+            yield self
+        finally:
+            self.disconnect()
@@ -5,13 +5,31 @@ import asyncio
 import inspect
 import logging
 from asyncio import Semaphore
-from typing import Callable, List, final
+from typing import TYPE_CHECKING, Awaitable, Callable, List, final
 from time import localtime, strftime
 
-from bleak import BleakClient
 from bleak import exc
 from bleak.backends.device import BLEDevice
 
+if __package__ == "":
+    from tion_btle.command_queue import Command, CommandQueue, Priority
+    from tion_btle.latency import LatencyTracker
+    from tion_btle.recorder import FlightRecorder
+    from tion_btle import clock, tracing
+    from tion_btle.transport import BleakTransport, Transport, TransportFactory
+else:
+    from .command_queue import Command, CommandQueue, Priority
+    from .latency import LatencyTracker
+    from .recorder import FlightRecorder
+    from . import clock, tracing
+    from .transport import BleakTransport, Transport, TransportFactory
+
+if TYPE_CHECKING:
+    from .registry import DeviceRegistry
+    from .snapshot import SnapshotStore
+    from .history import HistoryStore
+    from .tracing import Tracer
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -27,15 +45,16 @@ def retry(retries: int = 2, delay: int = 0):
             for i in range(retries+1):
                 try:
                     _LOGGER.debug("Trying %d/%d: %s(args=%s,kwargs=%s)", i, retries, f.__name__, args, kwargs)
-                    if inspect.iscoroutinefunction(f):
-                        return await f(*args, **kwargs)
-                    return f(*args, **kwargs)
+                    with tracing.span(f.__name__, attempt=i + 1):
+                        if inspect.iscoroutinefunction(f):
+                            return await f(*args, **kwargs)
+                        return f(*args, **kwargs)
                 except (exc.BleakError, exc.BleakDBusError) as _e:
                     next_message = "Will try again" if i < retries else "Will not try again"
                     _LOGGER.warning("Got exception: %s. %s", str(_e), next_message)
                     last_warning_exception = _e
                     if delay > 0:
-                        await asyncio.sleep(delay)
+                        await clock.sleep(delay)
 
             _LOGGER.critical("Retry limit (%d) exceeded for %s(%s, %s)", retries, f.__name__, args, kwargs)
             if _LOGGER.level > logging.INFO and last_info_exception is not None:
@@ -50,13 +69,38 @@ def retry(retries: int = 2, delay: int = 0):
 
 
 class TionDelegation:
-    def __init__(self):
+    __slots__ = ("_data", "_new_data", "_recorder")
+
+    def __init__(self, recorder: FlightRecorder | None = None):
         self._data: List[bytearray] = []
+        self._new_data = asyncio.Event()
+        self._recorder = recorder
 
     def handleNotification(self, handle: int, data: bytearray):
         self._data.append(data)
-        _LOGGER.debug(f"Got data in {handle} response {bytes(data).hex()}")
-        _LOGGER.debug(f"{self._data=}")
+        self._new_data.set()
+        if self._recorder is not None:
+            self._recorder.record(FlightRecorder.NOTIFY, data)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(f"Got data in {handle} response {bytes(data).hex()}")
+            _LOGGER.debug(f"{self._data=}")
+
+    async def wait(self, timeout: float | None) -> bool:
+        """
+        Wait for new data
+        :param timeout: how long we may wait in seconds. None for infinite wait
+        :return: True if we have new data
+        """
+        if self.haveNewData:
+            return True
+
+        self._new_data.clear()
+        try:
+            await asyncio.wait_for(self._new_data.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        return self.haveNewData
 
     @property
     def data(self) -> bytearray:
@@ -73,17 +117,117 @@ class TionException(Exception):
         self.message = message
 
 
+class TionTimeoutError(TionException, asyncio.TimeoutError):
+    """Operation was not finished before its deadline"""
+
+
+class Deadline:
+    """Point in time when operation must be finished. Phases of the operation take their time budget from it."""
+
+    def __init__(self, timeout: float | None = None):
+        """
+        :param timeout: seconds from now. None for operation without deadline
+        """
+        self.timeout = timeout
+        self.expires_at: float | None = None if timeout is None else clock.monotonic() + timeout
+
+    @property
+    def remaining(self) -> float | None:
+        """Seconds left. None if there is no deadline"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - clock.monotonic())
+
+    def budget(self, share: float = 1.0) -> float | None:
+        """
+        Time budget for the next phase
+        :param share: part of remaining time that phase may use
+        :return: seconds or None if there is no deadline
+        """
+        remaining = self.remaining
+        return None if remaining is None else remaining * share
+
+    def extend(self, other: Deadline) -> None:
+        """Move deadline to the other one if it is later"""
+        if self.expires_at is None or other.expires_at is None:
+            self.expires_at = None
+        else:
+            self.expires_at = max(self.expires_at, other.expires_at)
+
+    async def run(self, aw: Awaitable, phase: str, share: float = 1.0):
+        """
+        Await for aw within time budget. aw is cancelled if budget is exceeded.
+        :param aw: awaitable for the phase
+        :param phase: phase name for the exception
+        :param share: part of remaining time that phase may use
+        :return: aw result
+        :raises TionTimeoutError: if phase was not finished in time
+        """
+        budget = self.budget(share)
+        if budget is None:
+            return await aw
+
+        try:
+            return await asyncio.wait_for(aw, budget)
+        except asyncio.TimeoutError as e:
+            raise TionTimeoutError(phase, f"Deadline exceeded in {phase} ({self.timeout}s)") from e
+
+
 class Tion:
+    # All attributes set by the library live in slots, so instance dictionary stays empty. __dict__ is kept because
+    # class level settings (response_retries, max_packet_size, pipelined_writes) are overridden per instance and
+    # methods of single instance are patched in tests
+    __slots__ = ("_mac", "_tracer", "_adapter", "_transport_factory", "_transport", "_own_transport", "_btle_device",
+                 "_next_btle_device", "_registry", "_snapshots", "_history", "_recorder", "__delegation", "_fan_speed",
+                 "_model", "_data", "_in_temp", "_out_temp", "_heater_temp", "_mode", "_state", "_heater", "_sound",
+                 "_filter_remain", "_error_code", "__failed_connects", "__connections_count",
+                 "__notifications_enabled", "have_breezer_state", "__semaphore", "__queue", "_latency", "__dict__",
+                 "__weakref__")
     statuses = ['off', 'on']
     modes = ['recirculation', 'mixed']  # 'recirculation', 'mixed' and 'outside', as Index exception
     uuid_notify: str = ""
     uuid_write: str = ""
 
-    def __init__(self, mac: str | BLEDevice):
+    connect_share: float = 0.6
+    """Part of the operation timeout that may be spent on connection"""
+    write_share: float = 0.5
+    """Part of the time remaining after connection that may be spent on request writing"""
+    response_timeout: float = 10
+    """Longest time we will wait for the response. Actual wait time is learned from observed response latency"""
+    response_retries: int = 2
+    """How many times request is resent if breezer did not answer in expected time"""
+    flight_recorder_size: int = 64
+    """How many last raw frames are kept in flight recorder"""
+
+    def __init__(self, mac: str | BLEDevice, registry: DeviceRegistry | None = None,
+                 snapshots: SnapshotStore | None = None, history: HistoryStore | None = None,
+                 adapter: str | None = None, transport: TransportFactory | None = None, tracer: Tracer | None = None):
+        """
+        :param mac: MAC-address or BLEDevice of the breezer
+        :param registry: registry with fresh BLEDevice objects. Connection uses device from it when possible
+        :param snapshots: store for the last known state. get(skip_update=True) answers from it without connection
+        :param history: store for telemetry history. Every state received from breezer is appended to it
+        :param adapter: Bluetooth adapter for connections, for example "hci1". System default if not provided
+        :param transport: creates transport for the device, for example BridgeClient.transport. Local adapter is used
+          if not provided
+        :param tracer: tracer for spans of public operations and their steps. Tracing is disabled if not provided
+        """
         self._mac = mac
-        self._btle: BleakClient = BleakClient(mac)
-        self._next_btle_device: BleakClient | None = None
-        self._delegation = TionDelegation()
+        self._tracer = tracer
+        self._adapter = adapter
+        self._transport_factory = transport
+        self._transport: Transport | None = None
+        """Created on connect and released after disconnect, see _btle"""
+        self._own_transport: bool = False
+        self._btle_device: str | BLEDevice = mac
+        self._next_btle_device: str | BLEDevice | None = None
+        self._registry = registry
+        if registry is not None:
+            registry.watch(self.mac)
+        self._snapshots = snapshots
+        self._history = history
+        self._recorder = FlightRecorder(self.flight_recorder_size)
+        self.__delegation: TionDelegation | None = None
         self._fan_speed = 0
         self._model: str = self.__class__.__name__
         self._data: bytearray = bytearray()
@@ -103,7 +247,9 @@ class Tion:
         self.__connections_count: int = 0
         self.__notifications_enabled: bool = False
         self.have_breezer_state: bool = False
-        self._semaphore = Semaphore(1)
+        self.__semaphore: Semaphore | None = None
+        self.__queue: CommandQueue | None = None
+        self._latency = LatencyTracker(initial_timeout=self.response_timeout, max_timeout=self.response_timeout)
 
     @abc.abstractmethod
     async def _send_request(self, request: bytearray):
@@ -180,38 +326,81 @@ class Tion:
         return "off"
 
     @final
-    async def get_state_from_breezer(self) -> None:
+    async def get_state_from_breezer(self, deadline: Deadline | None = None) -> None:
         """
         Get current state from breezer
+        :param deadline: when request must be finished
         :return: None
         """
+        deadline = Deadline() if deadline is None else deadline
+
+        await self.connect(timeout=deadline.budget(self.connect_share))
         try:
-            await self.connect()
-            await self._try_write(request=self.command_getStatus)
-            response = await self._get_data_from_breezer()
+            response = await self._exchange(lambda: self._try_write(request=self.command_getStatus), deadline)
         finally:
             await self.disconnect()
 
-        self._decode_response(response)
+        with tracing.span("_decode_response", bytes=len(response)):
+            self._decode_response(response)
 
     @final
-    async def get(self, skip_update: bool = False) -> dict:
+    async def get(self, skip_update: bool = False, priority: Priority = Priority.POLL,
+                  timeout: float | None = None) -> dict:
         """
         Report current breezer state
         :param skip_update: may we skip requesting data from breezer or not
+        :param priority: priority of the request in device command queue
+        :param timeout: how long request may take in seconds, including time in queue. None for no limit
         :return:
-          dictionary with device state
+          dictionary with device state. State from snapshot store has additional "stale" and "updated" keys
+        :raises TionTimeoutError: if request was not finished in time
         """
+        if skip_update and self.have_breezer_state:
+            return await self._get(skip_update=skip_update)
+
+        if skip_update and self._snapshots is not None:
+            snapshot = self._snapshots.get(self.mac)
+            if snapshot is not None:
+                _LOGGER.debug(f"Using snapshot for {self.mac}: age={snapshot.age:.0f}s")
+                return {**snapshot.state, "stale": snapshot.stale, "updated": snapshot.timestamp}
+
+        deadline = Deadline(timeout)
+        with self._trace("get", priority=priority.name):
+            return await deadline.run(self._queue.submit(Command.GET, priority, deadline=deadline), "get")
+
+    @final
+    async def _get(self, skip_update: bool = False, deadline: Deadline | None = None) -> dict:
         if skip_update and self.have_breezer_state:
             _LOGGER.debug(f"Skipping getting state from breezer because skip_update={skip_update} and "
                           f"have_breezer_state={self.have_breezer_state}")
-        else:
-            await self.get_state_from_breezer()
+            return self._state_json()
+
+        await self.get_state_from_breezer(deadline)
+        state = self._state_json()
+        self._record_snapshot(state)
+        if self._history is not None:
+            self._history.record(self.mac, state)
+        return state
+
+    @final
+    def _state_json(self) -> dict:
         common = self.__generate_common_json()
         model_specific_data = self._generate_model_specific_json()
 
         return {**common, **model_specific_data}
 
+    @final
+    def _record_snapshot(self, state: dict) -> None:
+        if self._snapshots is None:
+            return
+
+        device = {"address": self.mac}
+        if isinstance(self._btle_device, BLEDevice):
+            device["name"] = self._btle_device.name
+        if self._registry is not None:
+            device["rssi"] = self._registry.rssi(self.mac)
+        self._snapshots.record(self.mac, self.model, state, device)
+
     @final
     def _set_internal_state_from_request(self, request: dict) -> None:
         """
@@ -228,14 +417,17 @@ class Tion:
                 pass
 
     @final
-    async def set(self, new_settings=None) -> None:
+    async def set(self, new_settings=None, priority: Priority = Priority.INTERACTIVE,
+                  timeout: float | None = None) -> None:
         """
         Set new breezer state
         :param new_settings: json with new state
+        :param priority: priority of the request in device command queue
+        :param timeout: how long request may take in seconds, including time in queue. None for no limit
         :return: None
+        :raises TionTimeoutError: if request was not finished in time
         """
-        if new_settings is None:
-            new_settings = {}
+        new_settings = {} if new_settings is None else dict(new_settings)
 
         try:
             if new_settings["fan_speed"] == 0:
@@ -244,20 +436,139 @@ class Tion:
         except KeyError:
             pass
 
+        deadline = Deadline(timeout)
+        with self._trace("set", priority=priority.name, fields=sorted(new_settings)):
+            await deadline.run(self._queue.submit(Command.SET, priority, new_settings, deadline), "set")
+
+    @final
+    async def _set(self, new_settings: dict, deadline: Deadline | None = None) -> None:
+        deadline = Deadline() if deadline is None else deadline
+
+        await self.connect(timeout=deadline.budget(self.connect_share))
         try:
-            await self.connect()
-            current_settings = await self.get(skip_update=True)
+            current_settings = await self._get(skip_update=True, deadline=deadline)
 
             merged_settings = {**current_settings, **new_settings}
 
             encoded_request = self._encode_request(merged_settings)
             _LOGGER.debug("Will write %s", encoded_request)
-            await self._send_request(encoded_request)
+            await self._exchange(lambda: self._send_request(encoded_request), deadline)
             self._set_internal_state_from_request(new_settings)
-            await self._get_data_from_breezer()
+            self._record_snapshot(self._state_json())
         finally:
             await self.disconnect()
 
+    @final
+    async def _execute(self, kind: str, payload: dict | None, deadline: Deadline | None = None):
+        """Executes command from device command queue"""
+        try:
+            if kind == Command.SET:
+                return await self._set(payload, deadline)
+            return await self._get(deadline=deadline)
+        except (TionException, MaxTriesExceededError) as e:
+            self._dump_flight_record(e)
+            raise
+
+    @final
+    @property
+    def _btle(self) -> Transport:
+        """Transport of the current device. Created on the first use"""
+        if self._transport is None:
+            self._transport = self._create_transport(self._btle_device)
+            self._own_transport = True
+        return self._transport
+
+    @final
+    @_btle.setter
+    def _btle(self, transport: Transport):
+        """Use given transport until device changes. It is not released after disconnect"""
+        self._transport = transport
+        self._own_transport = False
+
+    @final
+    @property
+    def _delegation(self) -> TionDelegation:
+        """Notifications receiver. Created on the first use"""
+        if self.__delegation is None:
+            self.__delegation = TionDelegation(self._recorder)
+        return self.__delegation
+
+    @final
+    @property
+    def _semaphore(self) -> Semaphore:
+        """Serializes connects and disconnects. Created in the running loop: on Python 3.9 it is bound to the loop"""
+        if self.__semaphore is None:
+            self.__semaphore = Semaphore(1)
+        return self.__semaphore
+
+    @final
+    @property
+    def _queue(self) -> CommandQueue:
+        """Command queue. Created with the first request"""
+        if self.__queue is None:
+            self.__queue = CommandQueue(self._execute)
+        return self.__queue
+
+    @final
+    def _release_transport(self) -> None:
+        """Drop transport and notifications receiver of disconnected device, next connect creates new ones"""
+        if self._transport is not None and self._own_transport and not self._transport.is_connected:
+            self._transport = None
+            self._own_transport = False
+            self.__delegation = None
+
+    @final
+    @property
+    def flight_recorder(self) -> FlightRecorder:
+        """Last raw frames that were written to and received from breezer"""
+        return self._recorder
+
+    @final
+    def _trace(self, name: str, **attributes) -> tracing.Span | tracing._NullSpan:
+        """Root span of public operation or child of the current span if operation is called inside another one"""
+        if self._tracer is None:
+            return tracing.NULL_SPAN
+        return self._tracer.span(name, device=self.mac, model=self.model, **attributes)
+
+    @final
+    def _dump_flight_record(self, e: Exception) -> None:
+        """Attach last frames to exception and log them"""
+        e.flight_record = self._recorder.dump()
+        _LOGGER.warning("%s for %s. Last frames:\n%s", type(e).__name__, self.mac, self._recorder.format())
+
+    @final
+    async def _exchange(self, send: Callable[[], Awaitable], deadline: Deadline) -> bytearray:
+        """
+        Send request and wait for response. Request is resent if breezer did not answer in expected time.
+        :param send: coroutine function that sends request
+        :param deadline: when exchange must be finished
+        :return: breezer response
+        """
+        for attempt in range(self.response_retries + 1):
+            with tracing.span("write", attempt=attempt + 1):
+                await deadline.run(send(), "write", self.write_share)
+            try:
+                with tracing.span("wait_response", attempt=attempt + 1):
+                    return await self._get_data_from_breezer(timeout=deadline.remaining)
+            except TionException:
+                self._latency.add_timeout()
+                if attempt == self.response_retries or deadline.remaining == 0:
+                    raise
+                _LOGGER.info("No response in %.2fs. Resending request (%d/%d)",
+                             self._latency.timeout, attempt + 1, self.response_retries)
+
+    @final
+    @property
+    def latency_stats(self) -> dict:
+        """Observed response latency and current response timeout"""
+        return self._latency.as_dict()
+
+    @final
+    @property
+    def queue_stats(self) -> dict:
+        """Command queue statistics: executed commands and their waiting time in queue by priority"""
+        return self._queue.stats.as_dict()
+
     @final
     @property
     def mac(self):
@@ -285,7 +596,7 @@ class Tion:
     @final
     @property
     def connection_status(self):
-        status = "connected" if self._btle.is_connected else "disc"
+        status = "connected" if self._transport is not None and self._transport.is_connected else "disc"
         return status
 
     @final
@@ -301,16 +612,26 @@ class Tion:
         if self.connection_status == "disc":
             try:
                 await self._try_connect()
-            except exc.BleakError as e:
-                _LOGGER.warning(f"Got {str(e)=} exception in _connect")
-                raise e
 
-            if need_notifications:
-                await self._enable_notifications()
-            else:
-                _LOGGER.debug("Notifications was not requested")
+                if need_notifications:
+                    await self._enable_notifications()
+                else:
+                    _LOGGER.debug("Notifications was not requested")
+            except BaseException as e:
+                # includes cancellation: link must not stay open if we could not finish connection
+                _LOGGER.warning(f"Got {type(e).__name__}: {str(e)} exception in _connect")
+                await self._abort_connection()
+                raise e
         _LOGGER.debug(f"_connect done. {self.connection_status=}.")
 
+    @final
+    async def _abort_connection(self):
+        """Close link after failed or cancelled connection. Never raises."""
+        try:
+            await asyncio.shield(self._btle.disconnect())
+        except BaseException as e:
+            _LOGGER.debug(f"Got {type(e).__name__}: {str(e)} while aborting connection")
+
     @final
     async def _disconnect(self):
         _LOGGER.debug(f"Disconnecting. {self.connection_status=}.")
@@ -318,14 +639,18 @@ class Tion:
             await self._btle.disconnect()
             async with self._semaphore:
                 self.set_new_btle_device()
+                self._release_transport()
 
         _LOGGER.debug(f"_disconnect done. {self.connection_status=}")
 
     @final
     @retry(retries=3)
     async def _try_write(self, request: bytearray):
-        _LOGGER.debug(f"Writing {bytes(request).hex()} to {self.uuid_write}, {self.connection_status=}")
-        return await self._btle.write_gatt_char(
+        self._recorder.record(FlightRecorder.WRITE, request)
+        tracing.annotate(bytes=len(request))
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(f"Writing {bytes(request).hex()} to {self.uuid_write}, {self.connection_status=}")
+        return await self._btle.write(
             self.uuid_write,
             request,
             False
@@ -335,7 +660,8 @@ class Tion:
     async def _enable_notifications(self):
         _LOGGER.debug(f"Enabling notification. {self.connection_status=}")
         try:
-            await self._btle.start_notify(self.uuid_notify, self._delegation.handleNotification)
+            with tracing.span("_enable_notifications"):
+                await self._btle.subscribe(self.uuid_notify, self._delegation.handleNotification)
         except exc.BleakError as e:
             _LOGGER.warning("Got exception %s while enabling notifications!" % str(e))
             raise e
@@ -477,7 +803,17 @@ class Tion:
         return self.modes.index(mode) if mode in self.modes else 2
 
     @final
-    async def pair(self):
+    async def pair(self, timeout: float | None = None):
+        """
+        Pair with breezer
+        :param timeout: how long pairing may take in seconds. None for no limit
+        :raises TionTimeoutError: if pairing was not finished in time
+        """
+        with self._trace("pair"):
+            await Deadline(timeout).run(self._pair_device(), "pair")
+
+    @final
+    async def _pair_device(self):
         _LOGGER.debug("Pairing")
         await self._connect(need_notifications=False)
         _LOGGER.debug("Connected. BT pairing ...")
@@ -492,21 +828,30 @@ class Tion:
             raise TionException('pair', f"{type(e).__name__}: {str(e)}")
         finally:
             _LOGGER.debug("disconnected")
-            await self._disconnect()
+            await asyncio.shield(self._disconnect())
 
     @abc.abstractmethod
     async def _pair(self):
         """Perform model-specific pair steps"""
 
     @final
-    async def connect(self):
+    async def connect(self, timeout: float | None = None):
+        """
+        Connect to breezer and hold connection until disconnect() call. Held connection that was lost is restored
+        :param timeout: how long connection may take in seconds. None for no limit
+        :raises TionTimeoutError: if connection was not established in time. Connection is closed in such case.
+        """
         if self.__connections_count < 0:
             self.__connections_count = 0
 
-        if self.__connections_count == 0:
+        if self.__connections_count == 0 or self.connection_status == "disc":
+            if self.__connections_count > 0:
+                # held connection was dropped by breezer or adapter: next holder restores it
+                _LOGGER.info("Held connection to %s was lost. Reconnecting", self.mac)
             self.have_breezer_state = False
             async with self._semaphore:
-                await self._connect()
+                with self._trace("connect"):
+                    await Deadline(timeout).run(self._connect(), "connect")
 
         self.__connections_count += 1
 
@@ -514,10 +859,11 @@ class Tion:
     async def disconnect(self):
         self.__connections_count -= 1
         if self.__connections_count <= 0:
-            await self._disconnect()
             self.have_breezer_state = False
-            while self._delegation.haveNewData:
-                _LOGGER.debug(f"Cleaning data in disconnect: {self._delegation.data=}")
+            while self.__delegation is not None and self.__delegation.haveNewData:
+                _LOGGER.debug(f"Cleaning data in disconnect: {self.__delegation.data=}")
+            # shielded: cancellation of the caller must not leave link open
+            await asyncio.shield(self._disconnect())
 
     @property
     @abc.abstractmethod
@@ -536,32 +882,37 @@ class Tion:
         raise NotImplementedError()
 
     @final
-    async def _get_data_from_breezer(self) -> bytearray:
+    async def _get_data_from_breezer(self, timeout: float | None = None) -> bytearray:
         """ Get byte array with breezer response on state request
 
+        :param timeout: how long we may wait for the response. Wait is also limited by response timeout learned
+          from previous responses
         :returns:
           breezer response
         """
         self.have_breezer_state = False
+        wait_time = self._latency.timeout
+        deadline = Deadline(wait_time if timeout is None else min(timeout, wait_time))
+        start = clock.monotonic()
 
         _LOGGER.debug("Collecting data")
 
-        i = 0
-
-        while i < 10:
-            if self._delegation.haveNewData:
-                byte_response = self._delegation.data
-                if self._collect_message(byte_response):
-                    self.have_breezer_state = True
-                    break
-                i = 0
-            else:
-                await asyncio.sleep(1)
-            i += 1
-        else:
-            _LOGGER.debug("Waiting too long for data")
+        packets = 0
+        while True:
+            if not await self._delegation.wait(deadline.remaining):
+                _LOGGER.debug("Waiting too long for data")
+                break
+
+            byte_response = self._delegation.data
+            packets += 1
+            if self._collect_message(byte_response):
+                self.have_breezer_state = True
+                break
+
+        tracing.annotate(wait_time=wait_time, packets=packets)
 
         if self.have_breezer_state:
+            self._latency.add(clock.monotonic() - start)
             result = self._data
 
         else:
@@ -576,13 +927,38 @@ class Tion:
             return
         self._next_btle_device = new_device
 
+    @final
+    def _create_transport(self, device: str | BLEDevice) -> Transport:
+        if self._transport_factory is not None:
+            return self._transport_factory(device)
+        return BleakTransport(device, self._adapter)
+
+    @final
+    @property
+    def adapter(self) -> str | None:
+        return self._adapter
+
+    @final
+    @adapter.setter
+    def adapter(self, adapter: str | None):
+        """New adapter is used from the next connection"""
+        if adapter == self._adapter:
+            return
+        self._adapter = adapter
+        if self._next_btle_device is None:
+            self._next_btle_device = self._btle_device
+
     @final
     def set_new_btle_device(self):
-        if self._next_btle_device is not None:
-            try:
-                _LOGGER.debug(f"Updating _btle instance from {self._btle} to {self._next_btle_device}")
-            except AttributeError:
-                pass
+        if self._next_btle_device is None and self._registry is not None:
+            device = self._registry.get(self.mac)
+            if device is not None and device is not self._btle_device:
+                self._next_btle_device = device
 
-            self._btle = BleakClient(self._next_btle_device)
+        if self._next_btle_device is not None:
+            _LOGGER.debug(f"Updating _btle device from {self._btle_device} to {self._next_btle_device}")
+            # transport for the new device is created on the next use
+            self._transport = None
+            self._own_transport = False
+            self._btle_device = self._next_btle_device
             self._next_btle_device = None
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import cProfile
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("tion_btle_span", default=None)
+
+
+class Span:
+    """
+    Timed operation with attributes.
+
+    Span is a context manager: it becomes the current span of the task while entered, so spans started inside it are
+    its children. Failed span has "error" status and error message. Finished span is passed to tracer exporter.
+    """
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start", "duration", "attributes", "status",
+                 "error", "_started", "_token")
+
+    def __init__(self, tracer: Tracer, name: str, parent: Span | None = None, attributes: dict | None = None):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.trace_id = self.span_id if parent is None else parent.trace_id
+        self.parent_id = None if parent is None else parent.span_id
+        self.attributes: dict = {} if attributes is None else attributes
+        self.start: float = 0.0
+        """Unix time of the start"""
+        self.duration: float | None = None
+        """Seconds, None until span is finished"""
+        self.status = "ok"
+        self.error: str | None = None
+        self._started = 0.0
+        self._token = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> Span:
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        if self.parent_id is None:
+            self.tracer._root_started(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.status = "error"
+            self.error = f"{exc_type.__name__}: {exc_val}"
+        _current.reset(self._token)
+        self._token = None
+        self.tracer._finished(self)
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    """Span that records nothing. Used when tracing is disabled"""
+    __slots__ = ()
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def current_span() -> Span | None:
+    """Span of the current task, None if it is not traced"""
+    return _current.get()
+
+
+def activate(span: Span | None) -> None:
+    """Make span current for the rest of the current task, for example in task that executes request of other task"""
+    if span is not None:
+        _current.set(span)
+
+
+def annotate(**attributes) -> None:
+    """Add attributes to the current span if current task is traced"""
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def span(name: str, **attributes) -> Span | _NullSpan:
+    """
+    Child of the current span. Costs single context variable lookup if current task is not traced
+    :param name: operation name
+    :param attributes: span attributes
+    """
+    parent = _current.get()
+    if parent is None:
+        return NULL_SPAN
+    return Span(parent.tracer, name, parent, attributes)
+
+
+class JsonLinesExporter:
+    """Writes finished spans to file, one JSON object per line"""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def __call__(self, span: Span) -> None:
+        self._file.write(json.dumps(span.as_dict(), separators=(",", ":"), default=str))
+        self._file.write("\n")
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ProfileHook:
+    """
+    Profiles next operations of tracer with cProfile and, optionally, tracemalloc.
+
+    Profiling starts with the next traced operation and stops when given count of operations is finished. Profile is
+    saved as <prefix>.prof (open with pstats or snakeviz), memory report as <prefix>.memory.txt with allocations made
+    during profiling grouped by line.
+    """
+
+    def __init__(self, directory: str | os.PathLike, operations: int = 10, memory: bool = False, top: int = 50):
+        """
+        :param directory: where results are saved
+        :param operations: how many operations are profiled
+        :param memory: trace allocations with tracemalloc. Makes operations much slower
+        :param top: how many lines are written to memory report
+        """
+        self.directory = Path(directory)
+        self.operations = operations
+        self.memory = memory
+        self.top = top
+        self.saved: List[Path] = []
+        """Files written by the hook"""
+        self._profile: cProfile.Profile | None = None
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._stop_tracemalloc = False
+        self._started = 0
+        self._finished = 0
+
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+
+    @property
+    def done(self) -> bool:
+        return self._finished >= self.operations
+
+    def started(self, root: Span) -> None:
+        if self._started >= self.operations:
+            return
+        self._started += 1
+        root.set("profiled", True)
+        if self._profile is not None:
+            return
+
+        if self.memory:
+            self._stop_tracemalloc = not tracemalloc.is_tracing()
+            if self._stop_tracemalloc:
+                tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # other profiler is active in this thread
+            _LOGGER.warning("Could not start profiler: another profiler is active")
+            self._profile = None
+
+    def finished(self, root: Span) -> None:
+        if not root.attributes.get("profiled"):
+            return
+        self._finished += 1
+        if self._finished == self.operations and self._profile is not None:
+            self._save()
+
+    def _save(self) -> None:
+        self._profile.disable()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        prefix = self.directory / f"tion-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+        path = prefix.with_suffix(".prof")
+        self._profile.dump_stats(path)
+        self.saved.append(path)
+        self._profile = None
+
+        if self._snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(self._snapshot, "lineno")
+            if self._stop_tracemalloc:
+                tracemalloc.stop()
+            path = prefix.with_suffix(".memory.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"Allocations during {self.operations} operations\n")
+                for stat in stats[:self.top]:
+                    f.write(f"{stat}\n")
+            self.saved.append(path)
+            self._snapshot = None
+        _LOGGER.info("Saved profile of %d operations: %s", self.operations, ", ".join(map(str, self.saved)))
+
+
+class Tracer:
+    """
+    Creates root spans for public operations of devices and exports finished spans.
+
+    Exporter is any callable that gets finished Span, for example JsonLinesExporter or list.append.
+    """
+
+    def __init__(self, exporter: Callable[[Span], None] | None = None, profile: ProfileHook | None = None):
+        """
+        :param exporter: gets every finished span. Children are exported before their parents
+        :param profile: optional hook that profiles next operations
+        """
+        self.exporter = exporter
+        self.profile = profile
+        self.stats: Dict[str, int] = {"spans": 0, "errors": 0}
+
+    def span(self, name: str, **attributes) -> Span:
+        """
+        Span of this tracer. It is a child of the current span if there is one, root span otherwise
+        :param name: operation name
+        :param attributes: span attributes
+        """
+        parent = _current.get()
+        return Span(self, name, parent if parent is not None and parent.tracer is self else None, attributes)
+
+    def _root_started(self, root: Span) -> None:
+        if self.profile is not None and not self.profile.done:
+            self.profile.started(root)
+
+    def _finished(self, span: Span) -> None:
+        self.stats["spans"] += 1
+        if span.status != "ok":
+            self.stats["errors"] += 1
+        if span.parent_id is None and self.profile is not None:
+            self.profile.finished(span)
+        if self.exporter is not None:
+            try:
+                self.exporter(span)
+            except Exception as e:
+                # tracing must never break the operation
+                _LOGGER.warning("Could not export span %s: %s", span.name, e)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Union
+
+from bleak import BleakClient
+from bleak.backends.device import BLEDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+NotifyCallback = Callable[[int, bytearray], None]
+DEFAULT_MTU = 23
+
+
+class Transport(abc.ABC):
+    """Link to single breezer: what Tion needs from BLE"""
+
+    @property
+    @abc.abstractmethod
+    def is_connected(self) -> bool:
+        pass
+
+    @property
+    def mtu_size(self) -> int:
+        return DEFAULT_MTU
+
+    @abc.abstractmethod
+    async def connect(self) -> bool:
+        pass
+
+    @abc.abstractmethod
+    async def disconnect(self) -> bool:
+        pass
+
+    @abc.abstractmethod
+    async def write(self, char: str, data: bytes | bytearray, response: bool = False) -> None:
+        """
+        Write value of characteristic
+        :param char: characteristic UUID
+        :param data: value
+        :param response: wait for write response
+        """
+        pass
+
+    @abc.abstractmethod
+    async def subscribe(self, char: str, callback: NotifyCallback) -> None:
+        """
+        Enable notifications of characteristic
+        :param char: characteristic UUID
+        :param callback: called with handle and data of each notification
+        """
+        pass
+
+    async def pair(self) -> bool:
+        raise NotImplementedError(f"{type(self).__name__} does not support pairing")
+
+
+TransportFactory = Callable[[Union[str, BLEDevice]], Transport]
+"""Creates transport for MAC-address or BLEDevice"""
+
+
+class BleakTransport(Transport):
+    """Transport over local adapter"""
+
+    def __init__(self, device: str | BLEDevice, adapter: str | None = None):
+        """
+        :param device: MAC-address or BLEDevice
+        :param adapter: Bluetooth adapter, for example "hci1". System default if not provided
+        """
+        if adapter is None:
+            self.client = BleakClient(device)
+        else:
+            if isinstance(device, BLEDevice) and f"/{adapter}/" not in str(device.details):
+                # device was seen by other adapter: its BlueZ object belongs to that adapter
+                device = device.address
+            self.client = BleakClient(device, adapter=adapter)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.client})"
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client.is_connected
+
+    @property
+    def mtu_size(self) -> int:
+        return self.client.mtu_size
+
+    async def connect(self) -> bool:
+        return await self.client.connect()
+
+    async def disconnect(self) -> bool:
+        return await self.client.disconnect()
+
+    async def write(self, char: str, data: bytes | bytearray, response: bool = False) -> None:
+        await self.client.write_gatt_char(char, data, response)
+
+    async def subscribe(self, char: str, callback: NotifyCallback) -> None:
+        await self.client.start_notify(char, callback)
+
+    async def pair(self) -> bool:
+        return await self.client.pair()
+
+
+class FakeTransport(Transport):
+    """
+    In-memory transport for tests and local runs of proxy server.
+
+    Written values are kept in writes. Responder, if provided, gets each written value and returns notifications
+    that are delivered to subscribers of notify_char after the write.
+    """
+
+    def __init__(self, device: str | BLEDevice = "", responder: Callable[[bytes], Iterable[bytes]] | None = None,
+                 mtu_size: int = DEFAULT_MTU, notify_char: str | None = None):
+        self.device = device
+        self.responder = responder
+        self._mtu_size = mtu_size
+        self.notify_char = notify_char
+        self.writes: List[bytes] = []
+        self._callbacks: Dict[str, NotifyCallback] = {}
+        self._connected = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    @property
+    def mtu_size(self) -> int:
+        return self._mtu_size
+
+    async def connect(self) -> bool:
+        self._connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        self._connected = False
+        self._callbacks.clear()
+        return True
+
+    async def write(self, char: str, data: bytes | bytearray, response: bool = False) -> None:
+        self.writes.append(bytes(data))
+        if self.responder is not None:
+            for notification in self.responder(bytes(data)):
+                self.notify(self.notify_char, notification)
+
+    async def subscribe(self, char: str, callback: NotifyCallback) -> None:
+        self._callbacks[char] = callback
+
+    async def pair(self) -> bool:
+        return True
+
+    def notify(self, char: str | None, data: bytes | bytearray):
+        """Deliver notification to subscriber of char (any subscriber if char is None) in the next loop iteration"""
+        callback = self._callbacks.get(char) if char is not None else next(iter(self._callbacks.values()), None)
+        if callback is not None:
+            asyncio.get_running_loop().call_soon(callback, 0, bytearray(data))
+
+
+class LiteResponder:
+    """
+    Responder of FakeTransport that answers Lite requests with fixed state response.
+
+    Response echoes request id, so request matching works as with real breezer. Used by tests and fake proxy.
+    """
+    SINGLE_PACKET_ID = 0x80
+    FIRST_PACKET_ID = 0x00
+    END_PACKET_ID = 0xc0
+
+    STATE = (
+        bytes([0x00, 0x49, 0x00, 0x3a, 0x4e, 0x31, 0x12, 0x0d, 0xd7, 0x1f, 0x8f, 0xbf, 0xc9, 0x40, 0x37, 0xcf, 0xd8, 0x02,
+               0x0f, 0x04]),
+        bytes([0x40, 0x09, 0x0f, 0x1a, 0x80, 0x8e, 0x05, 0x00, 0xe9, 0x8b, 0x05, 0x00, 0x17, 0xc2, 0xe7, 0x00, 0x26, 0x1b,
+               0x18, 0x00]),
+        bytes([0x40, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00, 0x04, 0x02, 0x00, 0x00,
+               0x00, 0x00]),
+        bytes([0xc0, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0a, 0x14, 0x19, 0x02, 0x04, 0x06, 0x06, 0x18, 0x00, 0xb5, 0xad]),
+    )
+    """Packets of state response, same as TionLite._packages"""
+
+    def __init__(self):
+        self._request = bytearray()
+
+    def __call__(self, data: bytes) -> Iterable[bytes]:
+        packet_id = data[0]
+        if packet_id in (self.SINGLE_PACKET_ID, self.FIRST_PACKET_ID):
+            self._request = bytearray(data)
+        else:
+            self._request += data[1:]
+        if packet_id not in (self.SINGLE_PACKET_ID, self.END_PACKET_ID):
+            return []
+
+        packages = [bytearray(p) for p in self.STATE]
+        packages[0][7:11] = self._request[7:11]
+        return packages